@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Google Ads 客户端配置层
+
+原来每次运行都会读取 google-ads.yaml、修改后写回磁盘，然后
+GoogleAdsClient.load_from_storage 在每次重试时再解析一遍；多个进程同时
+运行时还会互相覆盖配置文件。这里只读取一次 YAML（按修改时间缓存解析结果），
+按 YAML < 环境变量 < 命令行 的优先级合并，再通过 load_from_dict 构建客户端，
+从不回写配置文件。
+"""
+
+import os
+import threading
+
+import yaml
+
+# 使用的 Google Ads API 版本
+API_VERSION = "v19"
+
+# 默认请求超时（毫秒），与原来写入配置文件的值一致
+DEFAULT_TIMEOUT = 60000
+
+# 旧版 proxy 配置项中可以使用的代理协议
+PROXY_SCHEMES = ("http://", "https://")
+
+# 环境变量前缀，与 google-ads 库的约定一致
+ENV_PREFIX = "GOOGLE_ADS_"
+
+# 传给 GoogleAdsClient.load_from_dict 的配置项
+CLIENT_KEYS = (
+    "developer_token",
+    "use_proto_plus",
+    "login_customer_id",
+    "linked_customer_id",
+    "endpoint",
+    "logging",
+    "http_proxy",
+    "use_cloud_org_for_api_access",
+    "client_id",
+    "client_secret",
+    "refresh_token",
+    "json_key_file_path",
+    "impersonated_email",
+)
+
+# 本工具额外使用、不传给客户端的配置项；速率限制见 request_scheduler.py，
+# 访问令牌缓存见 token_cache.py，逐 RPC 统计见 rpc_metrics.py
+TOOL_KEYS = (
+    "timeout",
+    "max_requests_per_second",
+    "max_operations_per_second",
+    "rate_limit_file",
+    "token_cache",
+    "token_cache_file",
+    "metrics_file",
+    "slow_rpc_seconds",
+)
+
+_yaml_cache = {}
+_yaml_cache_lock = threading.Lock()
+
+
+def load_yaml_config(path):
+    """读取 YAML 配置；文件未修改时直接返回缓存的解析结果"""
+    mtime = os.path.getmtime(path)
+    with _yaml_cache_lock:
+        cached = _yaml_cache.get(path)
+        if cached and cached[0] == mtime:
+            return dict(cached[1])
+        with open(path, "r") as f:
+            config = yaml.safe_load(f) or {}
+        _yaml_cache[path] = (mtime, config)
+        return dict(config)
+
+
+def load_env_overrides(environ=None):
+    """读取 GOOGLE_ADS_<KEY> 形式的环境变量覆盖项"""
+    environ = os.environ if environ is None else environ
+    overrides = {}
+    for key in CLIENT_KEYS + TOOL_KEYS + ("proxy",):
+        value = environ.get(ENV_PREFIX + key.upper())
+        if value is not None:
+            overrides[key] = value
+    return overrides
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def normalize_config(config, base_dir):
+    """规范化合并后的配置（代理键名、客户ID格式、密钥文件路径等）"""
+    config = dict(config)
+    # 旧版配置文件使用 proxy 键，google-ads 库识别的是 http_proxy；gRPC 和
+    # requests 只支持 http(s) 代理，其他协议（例如 socks5）原来也从未生效
+    proxy = config.pop("proxy", None)
+    if proxy and not config.get("http_proxy"):
+        if str(proxy).lower().startswith(PROXY_SCHEMES):
+            config["http_proxy"] = proxy
+        else:
+            from belk_search_ads_creator import log_message
+            log_message(
+                f"忽略配置项 proxy: {proxy}（只支持 http:// 或 https:// 代理，"
+                "需要时使用 --proxy 或 http_proxy 指定）",
+                "WARNING",
+            )
+    for key in ("login_customer_id", "linked_customer_id"):
+        if config.get(key):
+            config[key] = str(config[key]).replace("-", "")
+    if "use_proto_plus" in config:
+        config["use_proto_plus"] = _to_bool(config["use_proto_plus"])
+    # 相对路径相对于配置文件所在目录，而不是当前工作目录
+    key_file = config.get("json_key_file_path")
+    if key_file and not os.path.isabs(key_file):
+        config["json_key_file_path"] = os.path.normpath(
+            os.path.join(base_dir, key_file)
+        )
+    config["timeout"] = int(config.get("timeout") or DEFAULT_TIMEOUT)
+    for key in (
+        "max_requests_per_second", "max_operations_per_second", "slow_rpc_seconds",
+    ):
+        if config.get(key) is not None:
+            config[key] = float(config[key])
+    config["token_cache"] = _to_bool(config.get("token_cache", True))
+    return config
+
+
+def load_config(yaml_path, proxy=None, timeout=None, environ=None):
+    """
+    合并 YAML、环境变量和命令行覆盖项
+
+    Args:
+        yaml_path: google-ads.yaml 路径
+        proxy: 命令行指定的代理（可选）
+        timeout: 命令行指定的超时毫秒数（可选）
+        environ: 环境变量字典（可选，默认 os.environ）
+
+    Returns:
+        合并并规范化后的配置字典（新对象，修改不会影响缓存）
+    """
+    config = load_yaml_config(yaml_path)
+    config.update(load_env_overrides(environ))
+    if proxy:
+        config["http_proxy"] = proxy
+        config.pop("proxy", None)
+    if timeout:
+        config["timeout"] = timeout
+    return normalize_config(config, os.path.dirname(os.path.abspath(yaml_path)))
+
+
+def build_client(config, version=API_VERSION):
+    """
+    根据内存中的配置构建 GoogleAdsClient，不读写任何配置文件
+
+    默认使用 token_cache.py 的共享访问令牌缓存：构建客户端时不交换令牌，
+    第一次请求时优先使用其他进程已经换到的令牌。配置 token_cache: false
+    时与 GoogleAdsClient.load_from_dict 相同，每次构建都立即交换。
+    """
+    from google.ads.googleads import config as googleads_config
+    from google.ads.googleads.client import GoogleAdsClient
+
+    client_config = {
+        key: config[key] for key in CLIENT_KEYS if config.get(key) is not None
+    }
+    if not config.get("token_cache", True):
+        return GoogleAdsClient.load_from_dict(client_config, version=version)
+
+    from token_cache import TokenCache, cached_credentials
+
+    # 与 load_from_dict 相同的校验和规范化，只是凭据不立即刷新
+    config_data = googleads_config.load_from_dict(client_config)
+    cache = (
+        TokenCache(config["token_cache_file"])
+        if config.get("token_cache_file")
+        else None
+    )
+    return GoogleAdsClient(
+        credentials=cached_credentials(config_data, cache),
+        developer_token=config_data.get("developer_token"),
+        endpoint=config_data.get("endpoint"),
+        login_customer_id=config_data.get("login_customer_id"),
+        logging_config=config_data.get("logging"),
+        linked_customer_id=config_data.get("linked_customer_id"),
+        version=version,
+        http_proxy=config_data.get("http_proxy"),
+        use_proto_plus=config_data.get("use_proto_plus"),
+        use_cloud_org_for_api_access=config_data.get("use_cloud_org_for_api_access"),
+    )
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""
+共享的异步日志子系统
+
+各脚本原来的 log_message 每条消息都要打开、追加、关闭日志文件并同步
+打印，批量创建时每个关键词、每个标准各一行，日志本身就占用可观的运行
+时间。这里的 AsyncLogger 只把事件放入队列，由后台线程批量写入文件和
+控制台；支持日志级别，以及带 run_id、customer_id、step、resource_name
+等字段的 JSONL 结构化格式，便于机器处理。
+"""
+
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# 每批最多写入的事件数和最长等待时间（秒）
+MAX_BATCH_SIZE = 1000
+FLUSH_INTERVAL = 0.2
+
+# 结构化事件中固定包含的上下文字段
+CONTEXT_FIELDS = ("run_id", "customer_id", "step", "resource_name")
+
+_STOP = object()
+
+_global_context = {}
+_thread_context = threading.local()
+
+
+def set_global_context(**fields):
+    """设置所有线程共享的上下文字段，例如 run_id"""
+    _global_context.update(fields)
+
+
+@contextmanager
+def log_context(**fields):
+    """在当前线程内临时附加上下文字段，例如 customer_id、step"""
+    previous = getattr(_thread_context, "fields", {})
+    _thread_context.fields = {**previous, **fields}
+    try:
+        yield
+    finally:
+        _thread_context.fields = previous
+
+
+def _current_context():
+    return {**_global_context, **getattr(_thread_context, "fields", {})}
+
+
+class AsyncLogger:
+    """
+    队列驱动的后台日志写入器
+
+    Args:
+        path: 日志文件路径
+        level: 最低记录级别（DEBUG/INFO/WARNING/ERROR）
+        fmt: "text" 保持原有的 "[时间] 消息" 格式，"jsonl" 每行一个 JSON 事件
+        echo: 是否同时输出到控制台
+    """
+
+    def __init__(self, path, level="INFO", fmt="text", echo=True):
+        self.path = path
+        self.level = LEVELS["INFO"]
+        self.fmt = "text"
+        self.echo = True
+        self.configure(level, fmt, echo)
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="ads-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def configure(self, level=None, fmt=None, echo=None):
+        """修改日志选项，未提供的选项保持不变"""
+        if fmt is not None:
+            if fmt not in ("text", "jsonl"):
+                raise ValueError(f"不支持的日志格式: {fmt}")
+            self.fmt = fmt
+        if level is not None:
+            self.level = LEVELS[level.upper()]
+        if echo is not None:
+            self.echo = echo
+
+    def log(self, message, level="INFO", **fields):
+        """记录一条事件；低于当前级别的事件直接丢弃，不进入队列"""
+        level = level.upper()
+        if LEVELS[level] < self.level:
+            return
+        # 热路径只组装字典并入队，时间格式化和序列化都在后台线程完成
+        event = _current_context()
+        event.update(fields)
+        event["ts"] = time.time()
+        event["level"] = level
+        event["message"] = message
+        if self._closed:
+            # 后台线程已停止（例如进程退出阶段），直接同步写入
+            self._write([event])
+            return
+        self._queue.put(event)
+
+    def flush(self, timeout=None):
+        """等待此前入队的事件全部写入"""
+        if self._closed:
+            return
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        flushed.wait(timeout)
+
+    def close(self):
+        """写完剩余事件并停止后台线程"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _format_file_line(self, event):
+        ts = datetime.fromtimestamp(event["ts"])
+        if self.fmt == "jsonl":
+            record = {
+                "ts": ts.isoformat(timespec="milliseconds"),
+                "level": event["level"],
+                "message": str(event["message"]),
+            }
+            for field in CONTEXT_FIELDS:
+                record[field] = event.get(field)
+            for key, value in event.items():
+                if key not in record:
+                    record[key] = value
+            return json.dumps(record, ensure_ascii=False, default=str)
+        prefix = ts.strftime("%Y-%m-%d %H:%M:%S")
+        if event["level"] != "INFO":
+            return f"[{prefix}] [{event['level']}] {event['message']}"
+        return f"[{prefix}] {event['message']}"
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            markers = []
+            # 收集事件，直到批次已满、队列空闲超过 FLUSH_INTERVAL 或收到停止信号
+            try:
+                item = self._queue.get()
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    if isinstance(item, threading.Event):
+                        markers.append(item)
+                    else:
+                        batch.append(item)
+                    if len(batch) >= MAX_BATCH_SIZE:
+                        break
+                    item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                pass
+            self._write(batch)
+            for marker in markers:
+                marker.set()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            with open(self.path, "a") as f:
+                f.write(
+                    "".join(self._format_file_line(event) + "\n" for event in batch)
+                )
+        except OSError as e:
+            print(f"写入日志文件 {self.path} 失败: {e}", file=sys.stderr)
+        if self.echo:
+            sys.stdout.write(
+                "".join(f"{event['message']}\n" for event in batch)
+            )
+            sys.stdout.flush()
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(path, **options):
+    """返回指定日志文件的共享 AsyncLogger，首次调用时创建"""
+    with _loggers_lock:
+        logger = _loggers.get(path)
+        if logger is None:
+            logger = AsyncLogger(path, **options)
+            _loggers[path] = logger
+        elif options:
+            logger.configure(**options)
+        return logger
+
+
+def shutdown():
+    """写完所有日志并停止后台线程（进程退出时自动调用）"""
+    with _loggers_lock:
+        loggers = list(_loggers.values())
+    for logger in loggers:
+        logger.close()
+
+
+atexit.register(shutdown)
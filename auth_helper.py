@@ -58,11 +58,29 @@ def get_refresh_token(client_secrets_path):
         yaml_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'google-ads.yaml')
         update_yaml_file(yaml_path, client_id, client_secret, credentials.refresh_token)
         
+        # 授权流程已经换到了访问令牌，写入共享缓存，之后的运行无需再次交换
+        seed_token_cache(client_id, credentials)
+        
         return credentials.refresh_token
     except Exception as e:
         print(f"获取刷新令牌时出错: {str(e)}")
         return None
 
+def seed_token_cache(client_id, credentials):
+    """把授权流程得到的访问令牌写入 token_cache.py 的共享缓存"""
+    if not credentials.token or credentials.expiry is None:
+        return
+    try:
+        from token_cache import TokenCache, _to_timestamp, installed_app_identity
+        TokenCache().store(
+            installed_app_identity(client_id, credentials.refresh_token),
+            credentials.token,
+            _to_timestamp(credentials.expiry),
+        )
+        print("访问令牌已写入共享缓存。")
+    except Exception as e:
+        print(f"写入访问令牌缓存时出错（不影响配置）: {str(e)}")
+
 def update_yaml_file(yaml_path, client_id, client_secret, refresh_token):
     """更新 YAML 配置文件中的认证信息。"""
     try:
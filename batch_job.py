@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+BatchJobService 离线批处理提交
+
+数十万个关键词或地理定位标准如果用同步的 mutate_ad_group_criteria 提交，
+会长时间占用工作进程并触及请求大小限制。这里将操作流式地分块追加到
+一个 BatchJob（通过 sequence token 串联），启动作业后以指数退避轮询，
+完成后逐页读取结果，不在内存中保留完整结果集。
+
+调用方可以传入 local_batch_job_service.LocalBatchJobService 代替真实服务，
+以便在没有网络的情况下验证整个流程。
+"""
+
+import itertools
+import time
+
+from belk_search_ads_creator import log_message
+from operation_factory import get_operation_factory
+
+# 单个 AddBatchJobOperations 请求的最大操作数
+MAX_OPERATIONS_PER_ADD_REQUEST = 10000
+
+# 轮询作业状态的退避参数（秒）
+POLL_INITIAL_INTERVAL = 1
+POLL_MAX_INTERVAL = 60
+POLL_TIMEOUT = 24 * 60 * 60
+
+# 逐页读取结果时每页的大小
+RESULTS_PAGE_SIZE = 1000
+
+
+class BatchJobTimeoutError(RuntimeError):
+    """批处理作业在超时时间内未完成"""
+
+
+def get_batch_job_service(client, batch_job_service=None):
+    """返回显式传入的批处理服务（例如本地替身），否则返回真实服务"""
+    return batch_job_service or client.get_service("BatchJobService")
+
+
+def create_batch_job(client, customer_id, batch_job_service=None):
+    """创建一个新的批处理作业并返回其资源名称"""
+    batch_job_service = get_batch_job_service(client, batch_job_service)
+    batch_job_operation = client.get_type("BatchJobOperation")
+    client.copy_from(batch_job_operation.create, client.get_type("BatchJob"))
+    response = batch_job_service.mutate_batch_job(
+        customer_id=customer_id, operation=batch_job_operation
+    )
+    resource_name = response.result.resource_name
+    log_message(f"创建了批处理作业: {resource_name}")
+    return resource_name
+
+
+def add_operations_to_batch_job(
+    client, batch_job_resource_name, operation_field, operations,
+    chunk_size=MAX_OPERATIONS_PER_ADD_REQUEST, batch_job_service=None
+):
+    """
+    将操作流式地分块追加到批处理作业
+
+    operations 可以是任意可迭代对象（包括生成器），每次只在内存中保留一块。
+
+    Returns:
+        追加的操作总数
+    """
+    batch_job_service = get_batch_job_service(client, batch_job_service)
+    operation_factory = get_operation_factory(client)
+    operations = iter(operations)
+    sequence_token = None
+    total_operations = 0
+    while True:
+        chunk = list(itertools.islice(operations, chunk_size))
+        if not chunk:
+            break
+        response = batch_job_service.add_batch_job_operations(
+            resource_name=batch_job_resource_name,
+            sequence_token=sequence_token,
+            mutate_operations=[
+                operation_factory.mutate_operation(operation_field, operation)
+                for operation in chunk
+            ],
+        )
+        sequence_token = response.next_sequence_token
+        total_operations = response.total_operations
+        log_message(
+            f"向批处理作业追加了 {len(chunk)} 个 {operation_field}，"
+            f"累计 {total_operations} 个"
+        )
+    return total_operations
+
+
+def wait_for_batch_job(
+    operation, initial_interval=POLL_INITIAL_INTERVAL,
+    max_interval=POLL_MAX_INTERVAL, timeout=POLL_TIMEOUT
+):
+    """以指数退避轮询长时间运行操作，直到批处理作业完成"""
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+    while not operation.done():
+        if time.monotonic() + interval > deadline:
+            raise BatchJobTimeoutError(f"批处理作业在 {timeout} 秒内未完成")
+        log_message(f"批处理作业尚未完成，{interval} 秒后再次检查")
+        time.sleep(interval)
+        interval = min(interval * 2, max_interval)
+
+
+def iter_batch_job_results(
+    client, batch_job_resource_name, page_size=RESULTS_PAGE_SIZE,
+    batch_job_service=None
+):
+    """逐页读取批处理作业结果的生成器，分页器按需请求下一页"""
+    batch_job_service = get_batch_job_service(client, batch_job_service)
+    request = client.get_type("ListBatchJobResultsRequest")
+    request.resource_name = batch_job_resource_name
+    request.page_size = page_size
+    yield from batch_job_service.list_batch_job_results(request=request)
+
+
+def run_batch_job(
+    client, customer_id, operation_field, operations,
+    chunk_size=MAX_OPERATIONS_PER_ADD_REQUEST, batch_job_service=None,
+    initial_interval=POLL_INITIAL_INTERVAL
+):
+    """
+    通过批处理作业提交大量同类型操作
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID（不带破折号）
+        operation_field: MutateOperation 中的字段名，例如
+            "ad_group_criterion_operation"
+        operations: 具体类型操作的可迭代对象
+        chunk_size: 每个 AddBatchJobOperations 请求的最大操作数
+        batch_job_service: 可选的服务替身（例如 LocalBatchJobService）
+        initial_interval: 首次轮询间隔（秒）
+
+    Returns:
+        {"operations": 提交数, "succeeded": 成功数, "failed": 失败数}
+    """
+    batch_job_service = get_batch_job_service(client, batch_job_service)
+    batch_job_resource_name = create_batch_job(
+        client, customer_id, batch_job_service
+    )
+    total_operations = add_operations_to_batch_job(
+        client, batch_job_resource_name, operation_field, operations,
+        chunk_size, batch_job_service,
+    )
+
+    operation = batch_job_service.run_batch_job(
+        resource_name=batch_job_resource_name
+    )
+    log_message(f"已启动批处理作业 {batch_job_resource_name}")
+    wait_for_batch_job(operation, initial_interval=initial_interval)
+
+    summary = {"operations": total_operations, "succeeded": 0, "failed": 0}
+    for result in iter_batch_job_results(
+        client, batch_job_resource_name, batch_job_service=batch_job_service
+    ):
+        if result.status.code:
+            summary["failed"] += 1
+            log_message(
+                f"批处理操作 {result.operation_index} 失败: "
+                f"{result.status.message}",
+                "WARNING",
+            )
+        else:
+            summary["succeeded"] += 1
+    log_message(
+        f"批处理作业完成: 提交 {summary['operations']} 个操作，"
+        f"成功 {summary['succeeded']} 个，失败 {summary['failed']} 个"
+    )
+    return summary
@@ -2,16 +2,12 @@
 # Belk.com Search Ads Creator for Google Ads API
 
 import argparse
+import json
 import sys
-import uuid
 import os
-import time
-import socket
-import requests
 from datetime import datetime
-from google.ads.googleads.client import GoogleAdsClient
-from google.ads.googleads.errors import GoogleAdsException
-import yaml
+from ads_logging import get_logger, log_context, set_global_context
+from operation_factory import get_operation_factory
 
 # Belk.com 特定的关键字
 KEYWORD_TEXT_EXACT = "belk department store"
@@ -22,6 +18,7 @@ KEYWORD_TEXT_BROAD = "clothing deals belk"
 GEO_LOCATION_1 = "New York"
 GEO_LOCATION_2 = "Los Angeles"
 GEO_LOCATION_3 = "Chicago"
+GEO_LOCATIONS = [GEO_LOCATION_1, GEO_LOCATION_2, GEO_LOCATION_3]
 
 # 设置地理定位的语言和国家代码
 LOCALE = "en"
@@ -34,54 +31,112 @@ LOG_FILE = os.path.join(SAVE_PATH, "ad_creation_log.txt")
 # Belk.com 的最终URL
 FINAL_URL = "https://www.belk.com/?cm_mmc=AFL-Ebates+Performance+Marketing%2C+Inc.+dba+Rakuten+Rewards-11602495-SKUcategory-&cjevent=abd6d59307ed11f0824a010e0a1cb825&click_id=abd6d59307ed11f0824a010e0a1cb825&cjdata=MXxOfDB8WXwxNzQ2NjI1NzgyMDEx&ogmap=AFF%7CRTN%7C46157%7CSTND%7CMULTI%7CSITEWIDE%7C%7C%7C%7C"
 
-def log_message(message):
-    """将消息记录到日志文件"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a") as f:
-        f.write(f"[{timestamp}] {message}\n")
-    print(message)
+# 响应式搜索广告的默认标题，以 (文本, 固定位置) 表示
+# 固定是可选的；如果未设置固定，则标题和描述将轮换，表现最佳的将更频繁使用
+HEADLINES = [
+    ("Shop Belk.com Fashion Deals", "HEADLINE_1"),
+    ("Up to 70% Off Designer Brands", None),
+    ("Free Shipping on Orders $49+", None),
+]
+# 默认描述；使用自定义属性时第二条描述会替换为自定义属性占位符
+DESCRIPTIONS = [
+    "Shop the latest fashion trends, homeware & beauty at Belk.com. Find amazing deals today!",
+    "Belk.com - Discover designer clothing, shoes, accessories & more. Shop now!",
+]
+# 可以附加到广告中URL的文本的第一部分和第二部分
+PATH1 = "fashion"
+PATH2 = "deals"
+
+# 额外的广泛匹配关键词
+ADDITIONAL_KEYWORDS = [
+    "belk coupon codes",
+    "belk designer clothes",
+    "belk online store",
+    "belk home decor",
+    "belk shoes sale"
+]
+# 默认关键词，以 (文本, 匹配类型) 表示
+KEYWORDS = [
+    (KEYWORD_TEXT_EXACT, "EXACT"),
+    (KEYWORD_TEXT_PHRASE, "PHRASE"),
+    (KEYWORD_TEXT_BROAD, "BROAD"),
+] + [(keyword, "BROAD") for keyword in ADDITIONAL_KEYWORDS]
+
+# 默认预算和出价
+BUDGET_AMOUNT_MICROS = 1000000  # $1000
+CPC_BID_MICROS = 2000000  # $2.00
+
+# 默认的稳定名称；重复运行时按名称复用已有的实体，而不是创建重复的实体
+DEFAULT_BUDGET_NAME = "Belk Campaign Budget"
+DEFAULT_CAMPAIGN_NAME = "Belk.com Fashion Campaign"
+DEFAULT_AD_GROUP_NAME = "Belk Fashion Deals"
+
+def log_message(message, level="INFO", **fields):
+    """将消息记录到日志文件（由后台线程批量写入）"""
+    get_logger(LOG_FILE).log(message, level, **fields)
+
+def create_mock_ad(
+    customer_id, customizer_attribute_name=None, campaign_specs=None,
+    atomic=False, chunk_size=10000, latency=None, sleep=False
+):
+    """
+    使用进程内的替身客户端运行真实的创建流水线，不连接 Google Ads API
 
-def modify_config_for_proxy(yaml_path, proxy=None):
-    """修改配置文件以使用代理"""
-    try:
-        # 读取现有配置
-        with open(yaml_path, 'r') as f:
-            config = yaml.safe_load(f)
-            
-        # 添加代理设置
-        if proxy:
-            config['proxy'] = proxy
-            log_message(f"已添加代理设置: {proxy}")
-            
-        # 增加超时设置
-        config['timeout'] = 60000  # 60秒
-        
-        # 写回配置
-        with open(yaml_path, 'w') as f:
-            yaml.dump(config, f)
-            
-        log_message(f"已更新配置文件 {yaml_path} 的网络设置")
-        return True
-    except Exception as e:
-        log_message(f"修改配置文件时出错: {str(e)}")
-        return False
+    Args:
+        customer_id: 客户ID
+        customizer_attribute_name: 自定义属性名称（可选）
+        campaign_specs: 批量规格列表（可选），用于预演整个规格文件
+        atomic: 单个广告系列时是否使用一次 Mutate 原子创建
+        chunk_size: 批量模式下每个 Mutate 请求的最大操作数
+        latency: fake_ads_client.LatencyModel 实例（可选）
+        sleep: 是否真的等待模拟延迟
+
+    Returns:
+        fake_ads_client.RunProfile 运行概况
+    """
+    from fake_ads_client import FakeGoogleAdsClient
+
+    log_message("⚠️ 使用模拟模式 - 不会实际连接到 Google Ads API ⚠️")
+    client = FakeGoogleAdsClient(latency, sleep=sleep)
+    run_creation(
+        client, customer_id.replace("-", ""), customizer_attribute_name,
+        campaign_specs, atomic=atomic, chunk_size=chunk_size,
+        reuse_existing=True,
+    )
 
-def create_mock_ad(customer_id):
-    """创建模拟广告数据用于测试"""
-    log_message("⚠️ 使用模拟模式 - 仅用于测试 ⚠️")
-    log_message(f"为客户 ID {customer_id} 创建模拟广告")
-    
-    log_message("✓ 已创建模拟预算: campaign_budget/1234567890")
-    log_message("✓ 已创建模拟广告系列: campaign/1234567890")
-    log_message("✓ 已创建模拟广告组: ad_group/1234567890")
-    log_message("✓ 已创建模拟广告: ad_group_ad/1234567890")
-    log_message("✓ 已添加3个模拟关键词")
-    log_message("✓ 已添加模拟地理定位")
-    
-    log_message("\n模拟广告创建完成。真实广告将在网络连接恢复后创建。")
-    log_message("\n⚠️ 这只是模拟数据，未实际提交到 Google Ads API ⚠️")
+    log_message("模拟运行概况:")
+    for line in client.profile.report_lines():
+        log_message(line)
+    log_message("⚠️ 这只是模拟数据，未实际提交到 Google Ads API ⚠️")
+    return client.profile
+
+def validate_default_ad():
+    """预检默认广告和关键词，未通过时在发送任何请求之前抛出 AdValidationError"""
+    from ad_validator import validate_ad
+    validate_ad(
+        {
+            "headlines": HEADLINES,
+            "descriptions": DESCRIPTIONS,
+            "final_url": FINAL_URL,
+            "path1": PATH1,
+            "path2": PATH2,
+        },
+        KEYWORDS,
+    )
 
-def main(client, customer_id, customizer_attribute_name=None):
+def run_journaled_step(journal, customer_id, step, fn, *args, **kwargs):
+    """没有步骤日志时直接执行 fn，否则通过日志跳过已完成的步骤"""
+    with log_context(step=step):
+        if journal is None:
+            return fn(*args, **kwargs)
+        return journal.run_step(customer_id, step, lambda: fn(*args, **kwargs))
+
+
+def main(
+    client, customer_id, customizer_attribute_name=None, journal=None,
+    geo_resolver=None, partial_failure=False, rejected_log=None,
+    entity_index=None
+):
     """
     创建完整的搜索广告系列
     
@@ -89,76 +144,133 @@ def main(client, customer_id, customizer_attribute_name=None):
         client: 初始化的GoogleAdsClient实例
         customer_id: 客户ID
         customizer_attribute_name: 自定义属性名称（可选）
+        journal: run_journal.RunJournal 实例（可选），用于跳过已完成的步骤
+        geo_resolver: geo_target_cache.CachedGeoTargetResolver 实例（可选）
+        partial_failure: 广告、关键词和地理定位是否以部分失败模式提交
+        rejected_log: partial_failure.RejectedOperationLog 实例（可选）
+        entity_index: entity_index.EntityIndex 实例（可选），已存在的同名实体
+            直接复用，只创建缺失的实体
     """
     log_message(f"开始为客户 ID {customer_id} 创建广告")
+    validate_default_ad()
+    # 步骤日志的键使用不带破折号的客户ID，与原子模式和批量模式一致
+    customer_id = customer_id.replace("-", "")
     
     # 如果提供了自定义属性名称，创建并链接自定义属性
     if customizer_attribute_name:
-        customizer_attribute_resource_name = create_customizer_attribute(
-            client, customer_id, customizer_attribute_name
+        customizer_attribute_resource_name = run_journaled_step(
+            journal, customer_id, "customizer_attribute",
+            create_customizer_attribute,
+            client, customer_id, customizer_attribute_name, entity_index,
         )
-        link_customizer_attribute_to_customer(
-            client, customer_id, customizer_attribute_resource_name
+        run_journaled_step(
+            journal, customer_id, "customer_customizer",
+            link_customizer_attribute_to_customer,
+            client, customer_id, customizer_attribute_resource_name,
+            entity_index,
         )
 
     # 创建预算（可以由多个广告系列共享）
-    campaign_budget = create_campaign_budget(client, customer_id)
-    log_message(f"创建了预算: {campaign_budget}")
+    campaign_budget = run_journaled_step(
+        journal, customer_id, "campaign_budget",
+        create_campaign_budget, client, customer_id, entity_index,
+    )
+    log_message(f"使用预算: {campaign_budget}")
 
     # 创建广告系列
-    campaign_resource_name = create_campaign(
-        client, customer_id, campaign_budget
+    campaign_resource_name = run_journaled_step(
+        journal, customer_id, "campaign",
+        create_campaign, client, customer_id, campaign_budget, entity_index,
     )
-    log_message(f"创建了广告系列: {campaign_resource_name}")
+    log_message(f"使用广告系列: {campaign_resource_name}")
 
     # 创建广告组
-    ad_group_resource_name = create_ad_group(
-        client, customer_id, campaign_resource_name
+    ad_group_resource_name = run_journaled_step(
+        journal, customer_id, "ad_group",
+        create_ad_group, client, customer_id, campaign_resource_name,
+        entity_index,
     )
-    log_message(f"创建了广告组: {ad_group_resource_name}")
+    log_message(f"使用广告组: {ad_group_resource_name}")
 
     # 创建广告
-    create_ad_group_ad(
-        client, customer_id, ad_group_resource_name, customizer_attribute_name
+    run_journaled_step(
+        journal, customer_id, "ad_group_ad",
+        create_ad_group_ad,
+        client, customer_id, ad_group_resource_name, customizer_attribute_name,
+        partial_failure=partial_failure, rejected_log=rejected_log,
+        entity_index=entity_index,
     )
 
     # 添加关键词
-    add_keywords(client, customer_id, ad_group_resource_name)
+    run_journaled_step(
+        journal, customer_id, "keywords",
+        add_keywords, client, customer_id, ad_group_resource_name,
+        partial_failure=partial_failure, rejected_log=rejected_log,
+        entity_index=entity_index,
+    )
 
     # 添加地理定位
-    add_geo_targeting(client, customer_id, campaign_resource_name)
+    run_journaled_step(
+        journal, customer_id, "geo_targeting",
+        add_geo_targeting, client, customer_id, campaign_resource_name,
+        geo_resolver=geo_resolver, partial_failure=partial_failure,
+        rejected_log=rejected_log, entity_index=entity_index,
+    )
     
     log_message("广告创建完成")
 
 
-def create_customizer_attribute(client, customer_id, customizer_attribute_name):
-    """创建自定义属性"""
+def build_customizer_attribute_operation(
+    client, customizer_attribute_name, resource_name=None
+):
+    """构建创建自定义属性的操作（不发送请求）"""
     # 创建自定义属性操作
     operation = client.get_type("CustomizerAttributeOperation")
     # 创建指定名称的自定义属性
     customizer_attribute = operation.create
+    if resource_name:
+        customizer_attribute.resource_name = resource_name
     customizer_attribute.name = customizer_attribute_name
     # 指定类型为"PRICE"，以便我们可以动态自定义广告描述中的产品/服务价格
     customizer_attribute.type_ = client.enums.CustomizerAttributeTypeEnum.PRICE
+    return operation
 
-    # 发送请求以添加自定义属性并打印其信息
-    customizer_attribute_service = client.get_service(
-        "CustomizerAttributeService"
-    )
-    response = customizer_attribute_service.mutate_customizer_attributes(
-        customer_id=customer_id, operations=[operation]
+
+def create_customizer_attribute(
+    client, customer_id, customizer_attribute_name, entity_index=None
+):
+    """创建自定义属性；提供 entity_index 时复用已存在的同名自定义属性"""
+    from entity_index import create_if_missing
+
+    operation = build_customizer_attribute_operation(
+        client, customizer_attribute_name
     )
-    resource_name = response.results[0].resource_name
 
-    log_message(f"添加了自定义属性，资源名称: '{resource_name}'")
+    def create():
+        # 发送请求以添加自定义属性并打印其信息
+        customizer_attribute_service = client.get_service(
+            "CustomizerAttributeService"
+        )
+        response = customizer_attribute_service.mutate_customizer_attributes(
+            customer_id=customer_id, operations=[operation]
+        )
+        resource_name = response.results[0].resource_name
 
-    return resource_name
+        log_message(
+            f"添加了自定义属性，资源名称: '{resource_name}'",
+            resource_name=resource_name,
+        )
+        return resource_name
 
+    return create_if_missing(
+        entity_index, "customizer_attribute", operation.create, create
+    )
 
-def link_customizer_attribute_to_customer(
-    client, customer_id, customizer_attribute_resource_name
+
+def build_customer_customizer_operation(
+    client, customizer_attribute_resource_name
 ):
-    """将自定义属性链接到客户"""
+    """构建将自定义属性链接到客户的操作（不发送请求）"""
     # 创建客户自定义操作
     operation = client.get_type("CustomerCustomizerOperation")
     # 创建带有要在响应式搜索广告中使用的值的客户自定义器
@@ -171,18 +283,37 @@ def link_customizer_attribute_to_customer(
     )
     # 广告自定义器在投放广告时将用此值动态替换占位符
     customer_customizer.value.string_value = "Up to 70% OFF"
+    return operation
 
-    customer_customizer_service = client.get_service(
-        "CustomerCustomizerService"
-    )
-    # 发送请求以创建客户自定义器并打印其信息
-    response = customer_customizer_service.mutate_customer_customizers(
-        customer_id=customer_id, operations=[operation]
+
+def link_customizer_attribute_to_customer(
+    client, customer_id, customizer_attribute_resource_name, entity_index=None
+):
+    """将自定义属性链接到客户；提供 entity_index 时已链接的不再重复链接"""
+    from entity_index import create_if_missing
+
+    operation = build_customer_customizer_operation(
+        client, customizer_attribute_resource_name
     )
-    resource_name = response.results[0].resource_name
 
-    log_message(
-        f"为客户添加了自定义属性，资源名称: '{resource_name}'"
+    def create():
+        customer_customizer_service = client.get_service(
+            "CustomerCustomizerService"
+        )
+        # 发送请求以创建客户自定义器并打印其信息
+        response = customer_customizer_service.mutate_customer_customizers(
+            customer_id=customer_id, operations=[operation]
+        )
+        resource_name = response.results[0].resource_name
+
+        log_message(
+            f"为客户添加了自定义属性，资源名称: '{resource_name}'",
+            resource_name=resource_name,
+        )
+        return resource_name
+
+    return create_if_missing(
+        entity_index, "customer_customizer", operation.create, create
     )
 
 
@@ -206,31 +337,53 @@ def create_ad_text_asset_with_customizer(
     return ad_text_asset
 
 
-def create_campaign_budget(client, customer_id):
-    """创建广告系列预算"""
-    campaign_budget_service = client.get_service("CampaignBudgetService")
+def build_campaign_budget_operation(
+    client, resource_name=None, name=None,
+    amount_micros=BUDGET_AMOUNT_MICROS
+):
+    """构建创建广告系列预算的操作（不发送请求）"""
     campaign_budget_operation = client.get_type("CampaignBudgetOperation")
     campaign_budget = campaign_budget_operation.create
-    campaign_budget.name = f"Belk Campaign Budget {uuid.uuid4()}"
+    if resource_name:
+        campaign_budget.resource_name = resource_name
+    campaign_budget.name = name or DEFAULT_BUDGET_NAME
     campaign_budget.delivery_method = (
         client.enums.BudgetDeliveryMethodEnum.STANDARD
     )
-    campaign_budget.amount_micros = 1000000  # $1000
+    campaign_budget.amount_micros = amount_micros
+    return campaign_budget_operation
 
-    # 添加预算
-    campaign_budget_response = campaign_budget_service.mutate_campaign_budgets(
-        customer_id=customer_id, operations=[campaign_budget_operation]
-    )
 
-    return campaign_budget_response.results[0].resource_name
+def create_campaign_budget(client, customer_id, entity_index=None):
+    """创建广告系列预算；提供 entity_index 时复用已存在的同名预算"""
+    from entity_index import create_if_missing
 
+    campaign_budget_service = client.get_service("CampaignBudgetService")
+    campaign_budget_operation = build_campaign_budget_operation(client)
 
-def create_campaign(client, customer_id, campaign_budget):
-    """创建广告系列"""
-    campaign_service = client.get_service("CampaignService")
+    def create():
+        # 添加预算
+        campaign_budget_response = campaign_budget_service.mutate_campaign_budgets(
+            customer_id=customer_id, operations=[campaign_budget_operation]
+        )
+        resource_name = campaign_budget_response.results[0].resource_name
+        log_message(f"创建了预算 {resource_name}", resource_name=resource_name)
+        return resource_name
+
+    return create_if_missing(
+        entity_index, "campaign_budget", campaign_budget_operation.create, create
+    )
+
+
+def build_campaign_operation(
+    client, campaign_budget, resource_name=None, name=None
+):
+    """构建创建广告系列的操作（不发送请求）"""
     campaign_operation = client.get_type("CampaignOperation")
     campaign = campaign_operation.create
-    campaign.name = f"Belk.com Fashion Campaign {uuid.uuid4()}"
+    if resource_name:
+        campaign.resource_name = resource_name
+    campaign.name = name or DEFAULT_CAMPAIGN_NAME
     campaign.advertising_channel_type = (
         client.enums.AdvertisingChannelTypeEnum.SEARCH
     )
@@ -248,45 +401,86 @@ def create_campaign(client, customer_id, campaign_budget):
     campaign.network_settings.target_search_network = True
     campaign.network_settings.target_partner_search_network = False
     campaign.network_settings.target_content_network = True
+    return campaign_operation
 
-    # 添加广告系列
-    campaign_response = campaign_service.mutate_campaigns(
-        customer_id=customer_id, operations=[campaign_operation]
-    )
-    resource_name = campaign_response.results[0].resource_name
-    log_message(f"创建了广告系列 {resource_name}")
-    return resource_name
 
+def create_campaign(client, customer_id, campaign_budget, entity_index=None):
+    """创建广告系列；提供 entity_index 时复用已存在的同名广告系列"""
+    from entity_index import create_if_missing
 
-def create_ad_group(client, customer_id, campaign_resource_name):
-    """创建广告组"""
-    ad_group_service = client.get_service("AdGroupService")
+    campaign_service = client.get_service("CampaignService")
+    campaign_operation = build_campaign_operation(client, campaign_budget)
 
+    def create():
+        # 添加广告系列
+        campaign_response = campaign_service.mutate_campaigns(
+            customer_id=customer_id, operations=[campaign_operation]
+        )
+        resource_name = campaign_response.results[0].resource_name
+        log_message(f"创建了广告系列 {resource_name}", resource_name=resource_name)
+        return resource_name
+
+    return create_if_missing(
+        entity_index, "campaign", campaign_operation.create, create
+    )
+
+
+def build_ad_group_operation(
+    client, campaign_resource_name, resource_name=None, name=None,
+    cpc_bid_micros=CPC_BID_MICROS
+):
+    """构建创建广告组的操作（不发送请求）"""
     ad_group_operation = client.get_type("AdGroupOperation")
     ad_group = ad_group_operation.create
-    ad_group.name = f"Belk Fashion Deals {uuid.uuid4()}"
+    if resource_name:
+        ad_group.resource_name = resource_name
+    ad_group.name = name or DEFAULT_AD_GROUP_NAME
     ad_group.status = client.enums.AdGroupStatusEnum.ENABLED
     ad_group.campaign = campaign_resource_name
     ad_group.type_ = client.enums.AdGroupTypeEnum.SEARCH_STANDARD
 
     # 如果要设置最高CPC出价，请取消注释下面的行
-    ad_group.cpc_bid_micros = 2000000  # $2.00
+    ad_group.cpc_bid_micros = cpc_bid_micros
+    return ad_group_operation
+
 
-    # 添加广告组
-    ad_group_response = ad_group_service.mutate_ad_groups(
-        customer_id=customer_id, operations=[ad_group_operation]
+def create_ad_group(
+    client, customer_id, campaign_resource_name, entity_index=None
+):
+    """创建广告组；提供 entity_index 时复用广告系列中已存在的同名广告组"""
+    from entity_index import create_if_missing
+
+    ad_group_service = client.get_service("AdGroupService")
+    ad_group_operation = build_ad_group_operation(client, campaign_resource_name)
+
+    def create():
+        # 添加广告组
+        ad_group_response = ad_group_service.mutate_ad_groups(
+            customer_id=customer_id, operations=[ad_group_operation]
+        )
+        ad_group_resource_name = ad_group_response.results[0].resource_name
+        log_message(
+            f"创建了广告组 {ad_group_resource_name}",
+            resource_name=ad_group_resource_name,
+        )
+        return ad_group_resource_name
+
+    return create_if_missing(
+        entity_index, "ad_group", ad_group_operation.create, create
     )
-    ad_group_resource_name = ad_group_response.results[0].resource_name
-    log_message(f"创建了广告组 {ad_group_resource_name}")
-    return ad_group_resource_name
 
 
-def create_ad_group_ad(
-    client, customer_id, ad_group_resource_name, customizer_attribute_name
+def build_ad_group_ad_operation(
+    client, ad_group_resource_name, customizer_attribute_name,
+    headlines=None, descriptions=None, final_url=FINAL_URL,
+    path1=PATH1, path2=PATH2
 ):
-    """创建广告组广告（响应式搜索广告）"""
-    ad_group_ad_service = client.get_service("AdGroupAdService")
+    """
+    构建创建响应式搜索广告的操作（不发送请求）
 
+    headlines 为 (文本, 固定位置名称) 列表，descriptions 为文本列表；
+    未提供时使用模块默认值，且第二条描述在有自定义属性时替换为占位符。
+    """
     ad_group_ad_operation = client.get_type("AdGroupAdOperation")
     ad_group_ad = ad_group_ad_operation.create
     ad_group_ad.status = client.enums.AdGroupAdStatusEnum.ENABLED
@@ -294,129 +488,183 @@ def create_ad_group_ad(
 
     # 设置响应式搜索广告信息
     # 广告的最终URL
-    ad_group_ad.ad.final_urls.append(FINAL_URL)
-
-    # 设置固定位置，始终选择此资产作为HEADLINE_1
-    # 固定是可选的；如果未设置固定，则标题和描述将轮换，表现最佳的将更频繁使用
-    served_asset_enum = client.enums.ServedAssetFieldTypeEnum.HEADLINE_1
-    pinned_headline = create_ad_text_asset(
-        client, "Shop Belk.com Fashion Deals", served_asset_enum
-    )
+    ad_group_ad.ad.final_urls.append(final_url)
 
-    # 标题2和3
+    # 标题，可选地固定到指定位置（例如始终选择第一个资产作为HEADLINE_1）
+    served_asset_enum = client.enums.ServedAssetFieldTypeEnum
     ad_group_ad.ad.responsive_search_ad.headlines.extend(
         [
-            pinned_headline,
-            create_ad_text_asset(client, "Up to 70% Off Designer Brands"),
-            create_ad_text_asset(client, "Free Shipping on Orders $49+"),
+            create_ad_text_asset(
+                client,
+                text,
+                getattr(served_asset_enum, pinned_field) if pinned_field else None,
+            )
+            for text, pinned_field in (headlines or HEADLINES)
         ]
     )
 
-    # 描述1和2
-    description_1 = create_ad_text_asset(client, "Shop the latest fashion trends, homeware & beauty at Belk.com. Find amazing deals today!")
-    description_2 = None
-
-    if customizer_attribute_name:
-        description_2 = create_ad_text_asset_with_customizer(
-            client, customizer_attribute_name
-        )
+    # 描述
+    if descriptions is None:
+        description_assets = [create_ad_text_asset(client, DESCRIPTIONS[0])]
+        if customizer_attribute_name:
+            description_assets.append(
+                create_ad_text_asset_with_customizer(
+                    client, customizer_attribute_name
+                )
+            )
+        else:
+            description_assets.append(
+                create_ad_text_asset(client, DESCRIPTIONS[1])
+            )
     else:
-        description_2 = create_ad_text_asset(client, "Belk.com - Discover designer clothing, shoes, accessories & more. Shop now!")
+        description_assets = [
+            create_ad_text_asset(client, text) for text in descriptions
+        ]
 
-    ad_group_ad.ad.responsive_search_ad.descriptions.extend(
-        [description_1, description_2]
-    )
+    ad_group_ad.ad.responsive_search_ad.descriptions.extend(description_assets)
 
     # 路径
-    # 可以附加到广告中URL的文本的第一部分和第二部分
-    # 如果使用以下示例，广告将显示
-    # https://www.belk.com/fashion/deals
-    ad_group_ad.ad.responsive_search_ad.path1 = "fashion"
-    ad_group_ad.ad.responsive_search_ad.path2 = "deals"
+    # 如果使用默认值，广告将显示 https://www.belk.com/fashion/deals
+    ad_group_ad.ad.responsive_search_ad.path1 = path1
+    ad_group_ad.ad.responsive_search_ad.path2 = path2
+    return ad_group_ad_operation
+
+
+def create_ad_group_ad(
+    client, customer_id, ad_group_resource_name, customizer_attribute_name,
+    partial_failure=False, rejected_log=None, entity_index=None
+):
+    """创建广告组广告（响应式搜索广告）；提供 entity_index 时已有广告的广告组跳过"""
+    ad_group_ad_service = client.get_service("AdGroupAdService")
+    ad_group_ad_operation = build_ad_group_ad_operation(
+        client, ad_group_resource_name, customizer_attribute_name
+    )
+    if entity_index is not None:
+        resource_name = entity_index.existing(
+            "ad_group_ad", ad_group_ad_operation.create
+        )
+        if resource_name:
+            return resource_name
 
     # 发送请求以添加响应式搜索广告
     ad_group_ad_response = ad_group_ad_service.mutate_ad_group_ads(
-        customer_id=customer_id, operations=[ad_group_ad_operation]
+        request=build_mutate_request(
+            client, "MutateAdGroupAdsRequest", customer_id,
+            [ad_group_ad_operation], partial_failure,
+        )
     )
+    if partial_failure:
+        from partial_failure import handle_partial_failure
+        handle_partial_failure(
+            client, customer_id, "ad_group_ad_operation",
+            ad_group_ad_response, [ad_group_ad_operation], rejected_log,
+        )
 
-    for result in ad_group_ad_response.results:
+    resource_names = succeeded_resource_names(ad_group_ad_response)
+    for resource_name in resource_names:
         log_message(
-            f"创建了响应式搜索广告，资源名称: \"{result.resource_name}\""
+            f"创建了响应式搜索广告，资源名称: \"{resource_name}\"",
+            resource_name=resource_name,
         )
+        if entity_index is not None:
+            entity_index.add(
+                "ad_group_ad", ad_group_ad_operation.create, resource_name
+            )
+    return resource_names[0] if resource_names else None
 
 
-def add_keywords(client, customer_id, ad_group_resource_name):
-    """添加关键词"""
-    ad_group_criterion_service = client.get_service("AdGroupCriterionService")
-
-    operations = []
-    # 创建关键词1 - 精确匹配
+def build_keyword_operation(client, ad_group_resource_name, text, match_type):
+    """构建单个关键词的广告组标准操作（不发送请求）"""
     ad_group_criterion_operation = client.get_type("AdGroupCriterionOperation")
     ad_group_criterion = ad_group_criterion_operation.create
     ad_group_criterion.ad_group = ad_group_resource_name
     ad_group_criterion.status = client.enums.AdGroupCriterionStatusEnum.ENABLED
-    ad_group_criterion.keyword.text = KEYWORD_TEXT_EXACT
-    ad_group_criterion.keyword.match_type = (
-        client.enums.KeywordMatchTypeEnum.EXACT
-    )
-    operations.append(ad_group_criterion_operation)
+    ad_group_criterion.keyword.text = text
+    ad_group_criterion.keyword.match_type = match_type
+    return ad_group_criterion_operation
 
-    # 创建关键词2 - 短语匹配
-    ad_group_criterion_operation = client.get_type("AdGroupCriterionOperation")
-    ad_group_criterion = ad_group_criterion_operation.create
-    ad_group_criterion.ad_group = ad_group_resource_name
-    ad_group_criterion.status = client.enums.AdGroupCriterionStatusEnum.ENABLED
-    ad_group_criterion.keyword.text = KEYWORD_TEXT_PHRASE
-    ad_group_criterion.keyword.match_type = (
-        client.enums.KeywordMatchTypeEnum.PHRASE
-    )
-    operations.append(ad_group_criterion_operation)
 
-    # 创建关键词3 - 广泛匹配
-    ad_group_criterion_operation = client.get_type("AdGroupCriterionOperation")
-    ad_group_criterion = ad_group_criterion_operation.create
-    ad_group_criterion.ad_group = ad_group_resource_name
-    ad_group_criterion.status = client.enums.AdGroupCriterionStatusEnum.ENABLED
-    ad_group_criterion.keyword.text = KEYWORD_TEXT_BROAD
-    ad_group_criterion.keyword.match_type = (
-        client.enums.KeywordMatchTypeEnum.BROAD
-    )
-    operations.append(ad_group_criterion_operation)
-
-    # 添加额外的关键词 - 广泛匹配
-    additional_keywords = [
-        "belk coupon codes",
-        "belk designer clothes",
-        "belk online store",
-        "belk home decor",
-        "belk shoes sale"
-    ]
-    
-    for keyword in additional_keywords:
-        ad_group_criterion_operation = client.get_type("AdGroupCriterionOperation")
-        ad_group_criterion = ad_group_criterion_operation.create
-        ad_group_criterion.ad_group = ad_group_resource_name
-        ad_group_criterion.status = client.enums.AdGroupCriterionStatusEnum.ENABLED
-        ad_group_criterion.keyword.text = keyword
-        ad_group_criterion.keyword.match_type = (
-            client.enums.KeywordMatchTypeEnum.BROAD
+def build_keyword_operations(client, ad_group_resource_name, keywords=None):
+    """
+    构建所有关键词的广告组标准操作（不发送请求）
+
+    keywords 为 (文本, 匹配类型名称) 列表，未提供时使用模块默认关键词。
+    返回原生 protobuf 操作，由 OperationFactory 从原型克隆，不经过 proto-plus。
+    """
+    return list(
+        get_operation_factory(client).keyword_operations(
+            ad_group_resource_name, keywords or KEYWORDS
         )
-        operations.append(ad_group_criterion_operation)
+    )
 
-    # 添加关键词
+
+def add_keywords(
+    client, customer_id, ad_group_resource_name, partial_failure=False,
+    rejected_log=None, entity_index=None
+):
+    """添加关键词；提供 entity_index 时只添加广告组中还没有的关键词"""
+    ad_group_criterion_service = client.get_service("AdGroupCriterionService")
+    operations = build_keyword_operations(client, ad_group_resource_name)
+    if entity_index is not None:
+        operations = list(entity_index.missing_operations("keyword", operations))
+        if not operations:
+            return []
+
+    # 添加关键词；部分失败模式下被拒绝的关键词不影响其余关键词
     ad_group_criterion_response = (
         ad_group_criterion_service.mutate_ad_group_criteria(
-            customer_id=customer_id,
-            operations=operations,
+            request=build_mutate_request(
+                client, "MutateAdGroupCriteriaRequest", customer_id,
+                operations, partial_failure,
+            )
         )
     )
-    log_message(f"添加了 {len(operations)} 个关键词")
-    for result in ad_group_criterion_response.results:
-        log_message(f"创建了关键词 {result.resource_name}")
+    if partial_failure:
+        from partial_failure import handle_partial_failure
+        handle_partial_failure(
+            client, customer_id, "ad_group_criterion_operation",
+            ad_group_criterion_response, operations, rejected_log,
+        )
+
+    resource_names = succeeded_resource_names(ad_group_criterion_response)
+    log_message(f"添加了 {len(resource_names)} 个关键词")
+    for operation, result in zip(operations, ad_group_criterion_response.results):
+        if not result.resource_name:
+            continue
+        log_message(
+            f"创建了关键词 {result.resource_name}", "DEBUG",
+            resource_name=result.resource_name,
+        )
+        if entity_index is not None:
+            entity_index.add("keyword", operation.create, result.resource_name)
+    return resource_names
+
+
+def resolve_geo_target_constants(client, location_names=None, geo_resolver=None):
+    """
+    通过位置名称解析地理目标常量
+
+    返回 {位置名称: [地理目标常量资源名称, ...]}。提供 geo_resolver
+    （geo_target_cache.CachedGeoTargetResolver）时优先使用离线索引和本地缓存，
+    只对未命中的名称发起请求。
+    """
+    location_names = location_names or GEO_LOCATIONS
+    if geo_resolver is None:
+        return fetch_geo_target_constants(client, location_names)
+    return geo_resolver.resolve(
+        LOCALE,
+        COUNTRY_CODE,
+        location_names,
+        lambda names: fetch_geo_target_constants(client, names),
+    )
+
 
+def fetch_geo_target_constants(client, location_names):
+    """
+    通过 GeoTargetConstantService 查询地理目标常量
 
-def add_geo_targeting(client, customer_id, campaign_resource_name):
-    """添加地理定位"""
+    返回 {搜索词: [地理目标常量资源名称, ...]}，保持服务器返回的建议顺序。
+    """
     geo_target_constant_service = client.get_service("GeoTargetConstantService")
 
     # 通过位置名称搜索
@@ -425,49 +673,487 @@ def add_geo_targeting(client, customer_id, campaign_resource_name):
     gtc_request.country_code = COUNTRY_CODE
 
     # 获取建议的地理目标常量的位置名称
-    gtc_request.location_names.names.extend(
-        [GEO_LOCATION_1, GEO_LOCATION_2, GEO_LOCATION_3]
-    )
+    gtc_request.location_names.names.extend(location_names)
 
     results = geo_target_constant_service.suggest_geo_target_constants(
         gtc_request
     )
 
-    operations = []
+    geo_target_constants = {}
     for suggestion in results.geo_target_constant_suggestions:
         log_message(
             f"地理目标常量: {suggestion.geo_target_constant.resource_name} "
             f"在LOCALE ({suggestion.locale})中找到 "
             f"覆盖范围 ({suggestion.reach}) "
-            f"搜索词 ({suggestion.search_term})."
+            f"搜索词 ({suggestion.search_term}).",
+            "DEBUG",
+            resource_name=suggestion.geo_target_constant.resource_name,
         )
-        # 为位置定位创建广告系列标准
-        campaign_criterion_operation = client.get_type(
-            "CampaignCriterionOperation"
-        )
-        campaign_criterion = campaign_criterion_operation.create
-        campaign_criterion.campaign = campaign_resource_name
-        campaign_criterion.location.geo_target_constant = (
+        geo_target_constants.setdefault(suggestion.search_term, []).append(
             suggestion.geo_target_constant.resource_name
         )
-        operations.append(campaign_criterion_operation)
+    return geo_target_constants
+
+
+def suggest_geo_target_constants(client, location_names=None, geo_resolver=None):
+    """通过位置名称查询地理目标常量，返回其资源名称列表"""
+    return [
+        resource_name
+        for resource_names in resolve_geo_target_constants(
+            client, location_names, geo_resolver
+        ).values()
+        for resource_name in resource_names
+    ]
+
+
+def build_geo_targeting_operations(
+    client, campaign_resource_name, geo_target_constants
+):
+    """为每个地理目标常量构建广告系列标准操作（不发送请求，原生 protobuf）"""
+    return list(
+        get_operation_factory(client).geo_targeting_operations(
+            campaign_resource_name, geo_target_constants
+        )
+    )
+
+
+def add_geo_targeting(
+    client, customer_id, campaign_resource_name, geo_resolver=None,
+    partial_failure=False, rejected_log=None, entity_index=None
+):
+    """添加地理定位；提供 entity_index 时只添加广告系列中还没有的地点"""
+    geo_target_constants = suggest_geo_target_constants(
+        client, geo_resolver=geo_resolver
+    )
+    operations = build_geo_targeting_operations(
+        client, campaign_resource_name, geo_target_constants
+    )
+    if entity_index is not None:
+        operations = list(
+            entity_index.missing_operations("geo_target", operations)
+        )
+        if not operations:
+            return []
 
     campaign_criterion_service = client.get_service("CampaignCriterionService")
     campaign_criterion_response = (
         campaign_criterion_service.mutate_campaign_criteria(
-            customer_id=customer_id, operations=[*operations]
+            request=build_mutate_request(
+                client, "MutateCampaignCriteriaRequest", customer_id,
+                operations, partial_failure,
+            )
         )
     )
+    if partial_failure:
+        from partial_failure import handle_partial_failure
+        handle_partial_failure(
+            client, customer_id, "campaign_criterion_operation",
+            campaign_criterion_response, operations, rejected_log,
+        )
 
-    for result in campaign_criterion_response.results:
-        log_message(f'添加了广告系列标准 "{result.resource_name}"')
+    resource_names = succeeded_resource_names(campaign_criterion_response)
+    for operation, result in zip(operations, campaign_criterion_response.results):
+        if not result.resource_name:
+            continue
+        log_message(
+            f'添加了广告系列标准 "{result.resource_name}"', "DEBUG",
+            resource_name=result.resource_name,
+        )
+        if entity_index is not None:
+            entity_index.add("geo_target", operation.create, result.resource_name)
+    return resource_names
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(
-        description="为Belk.com创建响应式搜索广告"
+def build_mutate_request(
+    client, request_type, customer_id, operations, partial_failure=False
+):
+    """构建服务专用的 mutate 请求，partial_failure 为 True 时只拒绝无效的操作"""
+    return get_operation_factory(client).mutate_request(
+        request_type, customer_id, operations, partial_failure
     )
-    # 以下参数应提供以运行示例
+
+
+def succeeded_resource_names(response):
+    """返回 mutate 响应中成功的资源名称；部分失败时被拒绝的操作结果为空"""
+    return [
+        result.resource_name for result in response.results if result.resource_name
+    ]
+
+
+def wrap_mutate_operation(client, operation_field, operation):
+    """将具体类型的操作包装为 GoogleAdsService 使用的 MutateOperation（原生 protobuf）"""
+    return get_operation_factory(client).mutate_operation(operation_field, operation)
+
+
+def build_mutate_operations(
+    client, customer_id, geo_target_constants, customizer_attribute_name=None,
+    entity_index=None
+):
+    """
+    使用负数临时资源ID构建整条创建流水线的 MutateOperation 列表
+
+    后续操作通过临时资源名称引用前面尚未创建的资源，服务器在同一请求内解析，
+    因此列表中的顺序必须满足依赖关系。
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID（不带破折号）
+        geo_target_constants: 已解析的地理目标常量资源名称列表
+        customizer_attribute_name: 自定义属性名称（可选）
+        entity_index: entity_index.EntityIndex 实例（可选）；已存在的实体
+            使用其真实资源名称，不再包含创建操作
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    mutate_operations = []
+
+    def add(entity_type, operation_field, operation):
+        """
+        已存在时返回其真实资源名称，否则加入操作列表并返回操作中的临时资源名称
+        """
+        if entity_index is not None:
+            resource_name = entity_index.existing(entity_type, operation.create)
+            if resource_name:
+                return resource_name
+        mutate_operations.append(
+            wrap_mutate_operation(client, operation_field, operation)
+        )
+        return operation.create.resource_name
+
+    def is_temporary(resource_name):
+        return resource_name.rsplit("/", 1)[-1].startswith("-")
+
+    if customizer_attribute_name:
+        customizer_attribute_resource_name = add(
+            "customizer_attribute",
+            "customizer_attribute_operation",
+            build_customizer_attribute_operation(
+                client,
+                customizer_attribute_name,
+                googleads_service.customizer_attribute_path(customer_id, -4),
+            ),
+        )
+        add(
+            "customer_customizer",
+            "customer_customizer_operation",
+            build_customer_customizer_operation(
+                client, customizer_attribute_resource_name
+            ),
+        )
+
+    budget_resource_name = add(
+        "campaign_budget",
+        "campaign_budget_operation",
+        build_campaign_budget_operation(
+            client, googleads_service.campaign_budget_path(customer_id, -1)
+        ),
+    )
+    campaign_resource_name = add(
+        "campaign",
+        "campaign_operation",
+        build_campaign_operation(
+            client, budget_resource_name,
+            googleads_service.campaign_path(customer_id, -2),
+        ),
+    )
+    ad_group_resource_name = add(
+        "ad_group",
+        "ad_group_operation",
+        build_ad_group_operation(
+            client, campaign_resource_name,
+            googleads_service.ad_group_path(customer_id, -3),
+        ),
+    )
+    # 新建的广告组和广告系列下不可能已有广告、关键词和地点，不需要查询索引
+    ad_group_index = None if is_temporary(ad_group_resource_name) else entity_index
+    campaign_index = None if is_temporary(campaign_resource_name) else entity_index
+
+    ad_group_ad_operation = build_ad_group_ad_operation(
+        client, ad_group_resource_name, customizer_attribute_name
+    )
+    if ad_group_index is None or not ad_group_index.existing(
+        "ad_group_ad", ad_group_ad_operation.create
+    ):
+        mutate_operations.append(
+            wrap_mutate_operation(
+                client, "ad_group_ad_operation", ad_group_ad_operation
+            )
+        )
+    keyword_operations = build_keyword_operations(client, ad_group_resource_name)
+    if ad_group_index is not None:
+        keyword_operations = ad_group_index.missing_operations(
+            "keyword", keyword_operations
+        )
+    for operation in keyword_operations:
+        mutate_operations.append(
+            wrap_mutate_operation(
+                client, "ad_group_criterion_operation", operation
+            )
+        )
+    geo_targeting_operations = build_geo_targeting_operations(
+        client, campaign_resource_name, geo_target_constants
+    )
+    if campaign_index is not None:
+        geo_targeting_operations = campaign_index.missing_operations(
+            "geo_target", geo_targeting_operations
+        )
+    for operation in geo_targeting_operations:
+        mutate_operations.append(
+            wrap_mutate_operation(
+                client, "campaign_criterion_operation", operation
+            )
+        )
+    return mutate_operations
+
+
+def main_atomic(
+    client, customer_id, customizer_attribute_name=None, journal=None,
+    geo_resolver=None, entity_index=None
+):
+    """
+    通过一次 GoogleAdsService.Mutate 调用原子地创建完整的搜索广告系列
+
+    与 main() 逐步等待上一步返回的资源名称不同，此模式将所有创建操作
+    合并到一个请求中：要么全部成功，要么全部回滚。地理目标常量查询是只读
+    请求，需要在提交前单独完成。
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        customizer_attribute_name: 自定义属性名称（可选）
+        journal: run_journal.RunJournal 实例（可选），请求已成功时不再重复提交
+        geo_resolver: geo_target_cache.CachedGeoTargetResolver 实例（可选）
+        entity_index: entity_index.EntityIndex 实例（可选），请求中只包含
+            缺失实体的创建操作
+    """
+    log_message(f"开始为客户 ID {customer_id} 原子地创建广告")
+    validate_default_ad()
+    customer_id = customer_id.replace("-", "")
+
+    def submit():
+        geo_target_constants = suggest_geo_target_constants(
+            client, geo_resolver=geo_resolver
+        )
+        mutate_operations = build_mutate_operations(
+            client, customer_id, geo_target_constants, customizer_attribute_name,
+            entity_index,
+        )
+        if not mutate_operations:
+            log_message("所有资源都已存在，无需创建")
+            return []
+
+        googleads_service = client.get_service("GoogleAdsService")
+        response = googleads_service.mutate(
+            customer_id=customer_id, mutate_operations=mutate_operations
+        )
+        if entity_index is not None:
+            # 请求中的引用使用临时资源名称，直接使创建过的类型失效更简单可靠
+            entity_index.invalidate()
+
+        resource_names = []
+        for operation_response in response.mutate_operation_responses:
+            result_field = type(operation_response).pb(
+                operation_response
+            ).WhichOneof("response")
+            result = getattr(operation_response, result_field)
+            log_message(
+                f"创建了资源 {result.resource_name}", "DEBUG",
+                resource_name=result.resource_name,
+            )
+            resource_names.append(result.resource_name)
+        log_message(
+            f"广告创建完成，共 {len(mutate_operations)} 个操作在一次请求中提交"
+        )
+        return resource_names
+
+    return run_journaled_step(journal, customer_id, "atomic_mutate", submit)
+
+
+def run_creation(
+    client, customer_id, customizer_attribute_name=None, campaign_specs=None,
+    atomic=False, chunk_size=10000, use_batch_job=False, journal=None,
+    geo_resolver=None, partial_failure=False, rejected_log=None,
+    reuse_existing=False, entity_index_cache=None
+):
+    """
+    按选定的模式为一个客户账号执行创建流水线
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        customizer_attribute_name: 自定义属性名称（可选）
+        campaign_specs: 批量规格列表；提供时走批量引擎
+        atomic: 单个广告系列时是否使用一次 Mutate 原子创建
+        chunk_size: 批量模式下每个 Mutate 请求的最大操作数
+        use_batch_job: 批量模式下是否通过 BatchJobService 提交关键词和地理定位
+        journal: run_journal.RunJournal 实例（可选），用于跳过已完成的步骤
+        geo_resolver: geo_target_cache.CachedGeoTargetResolver 实例（可选）
+        partial_failure: 广告、关键词和地理定位是否以部分失败模式提交；
+            原子模式下整个请求必须全部成功，此选项不适用
+        rejected_log: partial_failure.RejectedOperationLog 实例（可选）
+        reuse_existing: 是否按稳定名称复用账号中已存在的实体，只创建缺失的实体
+        entity_index_cache: entity_index.EntityIndexCache 实例（可选），
+            reuse_existing 时缓存已有实体的索引
+    """
+    customer_id = customer_id.replace("-", "")
+    with log_context(customer_id=customer_id):
+        entity_index = None
+        if reuse_existing:
+            from entity_index import EntityIndex
+            entity_index = EntityIndex(client, customer_id, entity_index_cache)
+        try:
+            if campaign_specs is not None:
+                from bulk_creator import create_campaigns_from_specs
+                return create_campaigns_from_specs(
+                    client,
+                    customer_id,
+                    campaign_specs,
+                    customizer_attribute_name,
+                    chunk_size,
+                    use_batch_job=use_batch_job,
+                    journal=journal,
+                    geo_resolver=geo_resolver,
+                    partial_failure=partial_failure,
+                    rejected_log=rejected_log,
+                    entity_index=entity_index,
+                )
+            if atomic:
+                return main_atomic(
+                    client, customer_id, customizer_attribute_name,
+                    journal=journal, geo_resolver=geo_resolver,
+                    entity_index=entity_index,
+                )
+            return main(
+                client, customer_id, customizer_attribute_name, journal=journal,
+                geo_resolver=geo_resolver, partial_failure=partial_failure,
+                rejected_log=rejected_log, entity_index=entity_index,
+            )
+        except Exception:
+            # 失败时账号中已创建了哪些实体不确定，下次运行从账号重新加载
+            if entity_index is not None:
+                entity_index.invalidate()
+            raise
+
+
+def offer_mock_fallback(customer_id):
+    """重试耗尽后，仅在交互式终端中询问是否改用模拟模式"""
+    log_message("重试次数已用完。网络连接问题可能持续存在。", "ERROR")
+    if not sys.stdin.isatty():
+        return
+    get_logger(LOG_FILE).flush()
+    use_mock = input("网络连接失败。是否使用模拟模式继续？(y/n): ").lower() == 'y'
+    if use_mock:
+        create_mock_ad(customer_id)
+
+
+# 子命令；不带子命令的旧用法（包括 --mock）视为 create
+COMMANDS = ("create", "mock", "report", "validate", "sync", "daemon", "ingest")
+
+# 直接交给对应模块命令行入口的子命令，参数原样传递
+DELEGATED_COMMANDS = {
+    "report": "report_export",
+    "validate": "ad_validator",
+    "sync": "state_diff",
+    "daemon": "creation_daemon",
+    "ingest": "jsonl_ingest",
+}
+
+# 各子命令在执行时才导入的模块；--profile_startup 和 benchmark_startup.py
+# 按此测量启动耗时，子命令中新增延迟导入时需要同步更新
+COMMAND_MODULES = {
+    "create": (
+        "google.ads.googleads.client",
+        "google.ads.googleads.errors",
+        "ads_config",
+        "token_cache",
+        "request_scheduler",
+        "rpc_metrics",
+        "retry_policy",
+        "run_journal",
+        "geo_target_cache",
+        "entity_index",
+        "partial_failure",
+        "multi_customer",
+        "campaign_spec",
+        "ad_validator",
+        "bulk_creator",
+    ),
+    "mock": (
+        "google.ads.googleads.client",
+        "fake_ads_client",
+        "entity_index",
+        "campaign_spec",
+        "ad_validator",
+        "bulk_creator",
+    ),
+    "report": (
+        "google.ads.googleads.client",
+        "report_export",
+        "ads_config",
+        "token_cache",
+        "request_scheduler",
+        "rpc_metrics",
+        "retry_policy",
+        "multi_customer",
+    ),
+    "validate": ("campaign_spec", "ad_validator"),
+    "sync": (
+        "google.ads.googleads.client",
+        "state_diff",
+        "campaign_spec",
+        "ads_config",
+        "token_cache",
+        "request_scheduler",
+        "rpc_metrics",
+        "retry_policy",
+    ),
+    "daemon": (
+        "google.ads.googleads.client",
+        "creation_daemon",
+        "ads_config",
+        "token_cache",
+        "request_scheduler",
+        "rpc_metrics",
+        "retry_policy",
+        "multi_customer",
+        "run_journal",
+        "geo_target_cache",
+        "entity_index",
+        "partial_failure",
+        "campaign_spec",
+        "ad_validator",
+        "bulk_creator",
+    ),
+    "ingest": (
+        "google.ads.googleads.client",
+        "jsonl_ingest",
+        "creation_daemon",
+        "ads_config",
+        "token_cache",
+        "request_scheduler",
+        "rpc_metrics",
+        "retry_policy",
+        "multi_customer",
+        "run_journal",
+        "geo_target_cache",
+        "entity_index",
+        "partial_failure",
+        "campaign_spec",
+        "ad_validator",
+        "bulk_creator",
+    ),
+}
+
+
+def import_command_modules(command):
+    """导入子命令用到的全部模块（用于测量启动耗时）"""
+    import importlib
+
+    for module in COMMAND_MODULES[command]:
+        importlib.import_module(module)
+
+
+def add_common_arguments(parser):
+    """create 和 mock 共用的参数"""
     parser.add_argument(
         "-c",
         "--customer_id",
@@ -475,7 +1161,6 @@ if __name__ == "__main__":
         default="278-639-3017",  # 默认设置为提供的客户ID
         help="Google Ads客户ID",
     )
-
     # 自定义属性名称是可选的
     parser.add_argument(
         "-n",
@@ -484,50 +1169,289 @@ if __name__ == "__main__":
         default="BelkSalePrice",  # 默认值
         help="要创建的自定义属性的名称",
     )
-    
+    parser.add_argument(
+        "--atomic",
+        action="store_true",
+        help="通过一次 GoogleAdsService.Mutate 请求原子地创建全部资源"
+    )
+    parser.add_argument(
+        "--spec",
+        type=str,
+        help="描述多个广告系列的 YAML/JSONL 规格文件，提供时批量创建"
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=10000,
+        help="批量模式下每个 Mutate 请求的最大操作数"
+    )
+    parser.add_argument(
+        "--log_level",
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="日志级别；DEBUG 会记录每个关键词和地理定位的资源名称"
+    )
+    parser.add_argument(
+        "--log_format",
+        type=str,
+        default="text",
+        choices=["text", "jsonl"],
+        help="日志文件格式：text 为原有格式，jsonl 为结构化事件"
+    )
+
+
+def add_mock_arguments(parser):
+    """模拟模式的延迟参数"""
+    parser.add_argument(
+        "--mock_latency_ms",
+        type=float,
+        default=150,
+        help="模拟模式下每次调用的基础延迟（毫秒）"
+    )
+    parser.add_argument(
+        "--mock_latency_jitter",
+        type=float,
+        default=0.5,
+        help="模拟延迟的对数正态抖动系数，0 表示固定延迟"
+    )
+    parser.add_argument(
+        "--mock_per_operation_ms",
+        type=float,
+        default=0.1,
+        help="模拟模式下每个操作增加的延迟（毫秒）"
+    )
+    parser.add_argument(
+        "--mock_sleep",
+        action="store_true",
+        help="模拟模式下真的等待模拟延迟（默认只累计并估算总耗时）"
+    )
+    parser.add_argument(
+        "--mock_profile_file",
+        type=str,
+        help="将模拟运行概况保存为 JSON 文件"
+    )
+
+
+def add_create_arguments(parser):
+    """create 子命令的参数"""
+    add_common_arguments(parser)
+
+    # 多账号模式参数
+    parser.add_argument(
+        "--customer_ids",
+        type=str,
+        help="逗号分隔的多个客户ID，并发为每个账号创建广告"
+    )
+    parser.add_argument(
+        "--customer_file",
+        type=str,
+        help="每行一个客户ID的文件，并发为每个账号创建广告"
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=8,
+        help="多账号模式下的最大并发账号数"
+    )
+
     # 添加代理参数
     parser.add_argument(
         "--proxy",
         type=str,
         help="HTTP代理，格式为 http://host:port"
     )
-    
-    # 添加模拟模式参数
+
+    # 添加超时参数
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        help="请求超时（毫秒），覆盖配置文件中的 timeout"
+    )
+
+    # 兼容原来的 --mock 参数，等同于 mock 子命令
     parser.add_argument(
         "--mock",
         action="store_true",
-        help="使用模拟模式，不实际连接 API（用于测试）"
+        help="使用模拟模式：用进程内替身客户端运行真实流水线，不实际连接 API"
     )
-    
+    add_mock_arguments(parser)
+
+    parser.add_argument(
+        "--batch_job",
+        action="store_true",
+        help="批量模式下通过 BatchJobService 离线提交关键词和地理定位"
+    )
+
+    # 步骤日志参数
+    parser.add_argument(
+        "--resume",
+        type=str,
+        help="要继续的运行 ID，跳过该运行中已完成的步骤"
+    )
+    parser.add_argument(
+        "--journal_file",
+        type=str,
+        help="步骤日志 SQLite 文件路径（默认保存在日志目录）"
+    )
+
+    # 地理目标常量缓存参数
+    parser.add_argument(
+        "--geo_cache_file",
+        type=str,
+        help="地理目标常量缓存 SQLite 文件路径（默认保存在日志目录）"
+    )
+    parser.add_argument(
+        "--geo_cache_ttl_days",
+        type=float,
+        default=30,
+        help="地理目标常量缓存有效期（天），0 表示不使用缓存"
+    )
+    parser.add_argument(
+        "--geo_targets_csv",
+        type=str,
+        help="Google 发布的 geotargets CSV，加载后离线解析位置名称"
+    )
+
+    # 已有实体索引参数
+    parser.add_argument(
+        "--entity_index_file",
+        type=str,
+        help="已有实体索引的 SQLite 缓存文件路径（默认保存在日志目录）"
+    )
+    parser.add_argument(
+        "--entity_index_ttl_minutes",
+        type=float,
+        default=60,
+        help="已有实体索引缓存有效期（分钟），0 表示每次运行都从账号查询"
+    )
+
+    # 部分失败模式参数
+    parser.add_argument(
+        "--partial_failure",
+        action="store_true",
+        help="广告、关键词和地理定位以部分失败模式提交，只拒绝无效的操作"
+    )
+    parser.add_argument(
+        "--rejected_file",
+        type=str,
+        help="被拒绝操作的 JSONL 记录文件（默认保存在日志目录）"
+    )
+
     # 添加重试次数参数
     parser.add_argument(
         "--retries",
         type=int,
         default=3,
-        help="API 连接失败时的重试次数"
+        help="单个 API 调用遇到可重试错误（UNAVAILABLE、DEADLINE_EXCEEDED 等）时的最大重试次数"
     )
-    
+
     # 添加重试间隔参数
     parser.add_argument(
         "--retry_interval",
-        type=int,
+        type=float,
         default=5,
-        help="重试间隔（秒）"
+        help="首次重试的退避上限（秒），之后按指数增长并加入随机抖动"
+    )
+    parser.add_argument(
+        "--max_retry_delay",
+        type=float,
+        default=60,
+        help="单次重试退避的最大值（秒）"
     )
 
-    args = parser.parse_args()
+    # 跨进程共享的速率限制参数（覆盖 google-ads.yaml 中的设置）
+    parser.add_argument(
+        "--max_requests_per_second",
+        type=float,
+        help="使用同一开发者令牌的所有进程合计每秒最多发送的请求数"
+    )
+    parser.add_argument(
+        "--max_operations_per_second",
+        type=float,
+        help="使用同一开发者令牌的所有进程合计每秒最多提交的操作数"
+    )
+    parser.add_argument(
+        "--rate_limit_file",
+        type=str,
+        help="共享令牌桶的 SQLite 文件路径（默认保存在日志目录）"
+    )
+    parser.add_argument(
+        "--metrics_file",
+        type=str,
+        help="逐 RPC 统计的 Prometheus 文本文件路径，退出时和收到 SIGUSR1 时写出（同名 .json 为汇总）"
+    )
 
+
+def build_argument_parser():
+    """构建带子命令的命令行解析器"""
+    parser = argparse.ArgumentParser(
+        description="为Belk.com创建响应式搜索广告",
+        epilog="不指定子命令时默认为 create，与原来的用法相同",
+    )
+    parser.add_argument(
+        "--profile_startup",
+        "--profile-startup",
+        action="store_true",
+        help="按模块报告所选子命令的启动导入耗时，不执行命令"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+    add_create_arguments(
+        subparsers.add_parser("create", help="连接 Google Ads API 创建广告（默认）")
+    )
+    mock_parser = subparsers.add_parser(
+        "mock", help="用进程内替身客户端运行真实流水线，不连接 API"
+    )
+    add_common_arguments(mock_parser)
+    add_mock_arguments(mock_parser)
+    for command, module in DELEGATED_COMMANDS.items():
+        subparsers.add_parser(
+            command, add_help=False, help=f"等同于 python {module}.py，参数原样传递"
+        )
+    return parser
+
+
+def init_log_file(args):
+    """初始化日志文件"""
     # 确保目录存在
     os.makedirs(SAVE_PATH, exist_ok=True)
-    
-    # 初始化日志文件
     with open(LOG_FILE, "w") as f:
         f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始Belk.com搜索广告创建日志\n")
+    get_logger(LOG_FILE, level=args.log_level, fmt=args.log_format)
+
+
+def run_mock_command(args):
+    """mock 子命令：用替身客户端运行真实流水线而不连接API"""
+    from fake_ads_client import LatencyModel
+
+    init_log_file(args)
+    campaign_specs = None
+    if args.spec:
+        from campaign_spec import load_campaign_specs
+        campaign_specs = load_campaign_specs(args.spec)
+        log_message(f"从 {args.spec} 加载了 {len(campaign_specs)} 个广告系列规格")
+    profile = create_mock_ad(
+        args.customer_id,
+        args.customizer_attribute_name,
+        campaign_specs,
+        atomic=args.atomic,
+        chunk_size=args.chunk_size,
+        latency=LatencyModel(
+            args.mock_latency_ms,
+            args.mock_latency_jitter,
+            args.mock_per_operation_ms,
+        ),
+        sleep=args.mock_sleep,
+    )
+    if args.mock_profile_file:
+        with open(args.mock_profile_file, "w", encoding="utf-8") as f:
+            json.dump(profile.summary(), f, ensure_ascii=False, indent=2)
+        log_message(f"运行概况已保存到 {args.mock_profile_file}")
+
 
-    # 如果是模拟模式，直接运行模拟而不连接API
-    if args.mock:
-        create_mock_ad(args.customer_id)
-        sys.exit(0)
+def run_create_command(args):
+    """create 子命令：连接 Google Ads API 创建广告"""
+    init_log_file(args)
 
     # 使用服务账号加载配置文件
     try:
@@ -535,77 +1459,241 @@ if __name__ == "__main__":
         current_dir = os.path.dirname(os.path.abspath(__file__))
         # 构建配置文件的完整路径
         yaml_path = os.path.join(current_dir, "google-ads.yaml")
-        
+
         # 确认配置文件存在
         if not os.path.exists(yaml_path):
             log_message(f"错误: 配置文件不存在: {yaml_path}")
             log_message("请先运行 service_account_helper.py 设置服务账号")
             sys.exit(1)
-        
-        # 如果指定了代理，修改配置文件
-        if args.proxy:
-            modify_config_for_proxy(yaml_path, args.proxy)
+
+        # 在内存中合并配置文件、环境变量和命令行的代理/超时设置，不回写配置文件
+        from ads_config import build_client, load_config
+        config = load_config(yaml_path, proxy=args.proxy, timeout=args.timeout)
+        if config.get("http_proxy"):
+            log_message(f"使用代理: {config['http_proxy']}")
+        for key in (
+            "max_requests_per_second", "max_operations_per_second",
+            "rate_limit_file", "metrics_file",
+        ):
+            if getattr(args, key):
+                config[key] = getattr(args, key)
+
+        # 批量模式下先解析规格文件，规格错误无需重试
+        campaign_specs = None
+        if args.spec:
+            from campaign_spec import load_campaign_specs
+            campaign_specs = load_campaign_specs(args.spec)
+            log_message(f"从 {args.spec} 加载了 {len(campaign_specs)} 个广告系列规格")
+
+        # 客户ID统一去掉破折号后再打开步骤日志，带与不带破折号的重新运行
+        # 使用相同的步骤键
+        args.customer_id = args.customer_id.replace("-", "")
+
+        # 多账号模式下的客户ID列表
+        customer_ids = None
+        if args.customer_ids or args.customer_file:
+            from multi_customer import read_customer_ids
+            customer_ids = read_customer_ids(
+                args.customer_ids, args.customer_file
+            )
+            log_message(f"共 {len(customer_ids)} 个客户账号待处理")
+
+        # 步骤日志：重试和 --resume 时跳过已完成的步骤
+        from run_journal import RunJournal
+        journal = RunJournal(
+            args.journal_file or os.path.join(SAVE_PATH, "run_journal.sqlite3"),
+            args.resume,
+        )
+        set_global_context(run_id=journal.run_id)
+        if args.resume:
+            log_message(f"继续运行 {journal.run_id}")
         else:
-            # 即使没有代理也增加超时设置
-            modify_config_for_proxy(yaml_path)
-        
-        # 使用重试机制加载客户端和执行操作
-        retries = args.retries
-        while retries >= 0:
-            try:
-                log_message(f"使用服务账号配置文件: {yaml_path}")
-                googleads_client = GoogleAdsClient.load_from_storage(path=yaml_path, version="v19")
-                log_message("成功通过服务账号加载Google Ads客户端")
-                
-                main(
+            log_message(
+                f"运行 ID: {journal.run_id}（失败后可使用 --resume {journal.run_id} 继续）"
+            )
+
+        # 地理目标常量：离线索引 → 本地缓存 → 远程请求
+        from geo_target_cache import (
+            CachedGeoTargetResolver,
+            GeoTargetCache,
+            GeoTargetIndex,
+        )
+        geo_cache = None
+        if args.geo_cache_ttl_days > 0:
+            geo_cache = GeoTargetCache(
+                args.geo_cache_file
+                or os.path.join(SAVE_PATH, "geo_target_cache.sqlite3"),
+                ttl=args.geo_cache_ttl_days * 24 * 60 * 60,
+            )
+        geo_index = None
+        if args.geo_targets_csv:
+            geo_index = GeoTargetIndex.from_csv(args.geo_targets_csv)
+            log_message(f"从 {args.geo_targets_csv} 加载了 {len(geo_index)} 个地点")
+        geo_resolver = CachedGeoTargetResolver(geo_cache, geo_index)
+
+        # 已有实体索引：按稳定名称复用已存在的实体，只创建缺失的实体
+        entity_index_cache = None
+        if args.entity_index_ttl_minutes > 0:
+            from entity_index import EntityIndexCache
+            entity_index_cache = EntityIndexCache(
+                args.entity_index_file
+                or os.path.join(SAVE_PATH, "entity_index.sqlite3"),
+                ttl=args.entity_index_ttl_minutes * 60,
+            )
+
+        # 部分失败模式：被拒绝的操作记录到 JSONL 文件供检查
+        rejected_log = None
+        if args.partial_failure:
+            from partial_failure import RejectedOperationLog
+            rejected_log = RejectedOperationLog(
+                args.rejected_file
+                or os.path.join(SAVE_PATH, "rejected_operations.jsonl")
+            )
+
+        # 重试策略：按 gRPC 状态码逐个重试服务调用，而不是重新运行整个流程
+        from retry_policy import RetryPolicy, RetryingClient, request_timeout
+        retry_policy = RetryPolicy(
+            max_attempts=args.retries + 1,
+            initial_delay=args.retry_interval,
+            max_delay=args.max_retry_delay,
+        )
+        # google-ads 库只在真正连接 API 时才导入
+        from google.ads.googleads.errors import GoogleAdsException
+
+        try:
+            log_message(f"使用服务账号配置文件: {yaml_path}")
+            # 共享速率限制在重试之内：每次重试都重新从令牌桶取令牌
+            # 所有服务共用一个 gRPC 通道
+            from multi_customer import SharedServiceClient
+            from request_scheduler import rate_limited
+            from rpc_metrics import instrumented
+            googleads_client = rate_limited(
+                instrumented(SharedServiceClient(build_client(config)), config),
+                config,
+            )
+            log_message("成功通过服务账号加载Google Ads客户端")
+
+            def run_for_customer(customer_id, client):
+                return run_creation(
+                    client,
+                    customer_id,
+                    args.customizer_attribute_name,
+                    campaign_specs,
+                    atomic=args.atomic,
+                    chunk_size=args.chunk_size,
+                    use_batch_job=args.batch_job,
+                    journal=journal,
+                    geo_resolver=geo_resolver,
+                    partial_failure=args.partial_failure,
+                    rejected_log=rejected_log,
+                    reuse_existing=True,
+                    entity_index_cache=entity_index_cache,
+                )
+
+            if customer_ids:
+                # 多账号模式：共享一个客户端，单个账号失败不影响其他账号
+                from multi_customer import (
+                    log_summary,
+                    preload_api_types,
+                    run_for_customers,
+                )
+                shared_client = RetryingClient(
                     googleads_client,
+                    retry_policy,
+                    request_timeout(config),
+                )
+                preload_api_types(shared_client)
+                results = run_for_customers(
+                    customer_ids,
+                    lambda customer_id: run_for_customer(
+                        customer_id, shared_client
+                    ),
+                    args.max_workers,
+                )
+                if log_summary(results):
+                    sys.exit(1)
+            else:
+                run_for_customer(
                     args.customer_id,
-                    args.customizer_attribute_name,
+                    RetryingClient(
+                        googleads_client, retry_policy, request_timeout(config)
+                    ),
                 )
-                # 如果成功完成，跳出循环
-                break
-                
-            except GoogleAdsException as ex:
+            if rejected_log is not None and rejected_log.count:
                 log_message(
-                    f'请求ID "{ex.request_id}" 失败，状态"{ex.error.code().name}"，包含以下错误:'
+                    f"共有 {rejected_log.count} 个操作被拒绝，"
+                    f"详情见 {rejected_log.path}",
+                    "WARNING",
                 )
-                for error in ex.failure.errors:
-                    log_message(f'错误消息 "{error.message}"')
-                    if error.location:
-                        for field_path_element in error.location.field_path_elements:
-                            log_message(f"\t\t字段: {field_path_element.field_name}")
-                
-                # 检查是否有连接问题
-                if "failed to connect" in str(ex) or "timeout" in str(ex).lower():
-                    if retries > 0:
-                        retries -= 1
-                        log_message(f"连接失败。将在 {args.retry_interval} 秒后重试。剩余重试次数: {retries}")
-                        time.sleep(args.retry_interval)
-                        continue
-                    else:
-                        log_message("重试次数已用完。网络连接问题可能持续存在。")
-                        use_mock = input("网络连接失败。是否使用模拟模式继续？(y/n): ").lower() == 'y'
-                        if use_mock:
-                            create_mock_ad(args.customer_id)
-                        sys.exit(1)
-                else:
-                    # 非连接问题，直接退出
-                    sys.exit(1)
-                    
-            except Exception as e:
-                log_message(f"发生错误: {str(e)}")
-                if "failed to connect" in str(e).lower() or "timeout" in str(e).lower():
-                    if retries > 0:
-                        retries -= 1
-                        log_message(f"连接失败。将在 {args.retry_interval} 秒后重试。剩余重试次数: {retries}")
-                        time.sleep(args.retry_interval)
-                        continue
-                    else:
-                        log_message("重试次数已用完。网络连接问题可能持续存在。")
-                        use_mock = input("网络连接失败。是否使用模拟模式继续？(y/n): ").lower() == 'y'
-                        if use_mock:
-                            create_mock_ad(args.customer_id)
-                sys.exit(1)
+
+        except GoogleAdsException as ex:
+            log_message(
+                f'请求ID "{ex.request_id}" 失败，状态"{ex.error.code().name}"，包含以下错误:',
+                "ERROR",
+            )
+            for error in ex.failure.errors:
+                log_message(f'错误消息 "{error.message}"', "ERROR")
+                if error.location:
+                    for field_path_element in error.location.field_path_elements:
+                        log_message(f"\t\t字段: {field_path_element.field_name}", "ERROR")
+            if retry_policy.is_retryable(ex):
+                offer_mock_fallback(args.customer_id)
+            sys.exit(1)
+
+        except Exception as e:
+            log_message(f"发生错误: {str(e)}", "ERROR")
+            if retry_policy.is_retryable(e):
+                offer_mock_fallback(args.customer_id)
+            sys.exit(1)
     except Exception as e:
         log_message(f"程序异常: {str(e)}")
         sys.exit(1)
+
+
+def run_delegated_command(command, argv):
+    """以 __main__ 运行对应模块的命令行入口"""
+    import runpy
+
+    module = DELEGATED_COMMANDS[command]
+    sys.argv = [f"{module}.py"] + list(argv)
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+def run_command_line(argv=None):
+    """
+    解析命令行并执行子命令
+
+    子命令只在执行时导入自己用到的模块：--help、validate 不加载 google-ads
+    库，mock 不加载凭据、速率限制等连接 API 才用到的模块。
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    profile_startup = False
+    while argv and argv[0] in ("--profile_startup", "--profile-startup"):
+        profile_startup = True
+        argv.pop(0)
+    # 兼容原来不带子命令的用法
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        argv.insert(0, "create")
+
+    command = argv[0]
+    if profile_startup and command in COMMANDS:
+        from startup_profile import profile_command
+
+        if command == "create" and "--mock" in argv:
+            command = "mock"
+        for line in profile_command(command):
+            print(line)
+        return
+    if command in DELEGATED_COMMANDS:
+        run_delegated_command(command, argv[1:])
+        return
+
+    args = build_argument_parser().parse_args(argv)
+    if args.command == "mock" or args.mock:
+        run_mock_command(args)
+    else:
+        run_create_command(args)
+
+
+if __name__ == "__main__":
+    run_command_line()
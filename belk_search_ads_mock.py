@@ -2,102 +2,37 @@
 # Belk.com Search Ads Creator for Google Ads API (模拟版本)
 
 import argparse
-import sys
-import uuid
 import os
 from datetime import datetime
 
+from ads_logging import get_logger
+
 # 保存路径
 SAVE_PATH = "/Users/mac/Documents/media buy/google Ads"
 LOG_FILE = os.path.join(SAVE_PATH, "ad_creation_mock_log.txt")
 
-# Belk.com 的最终URL
-FINAL_URL = "https://www.belk.com/?cm_mmc=AFL-Ebates+Performance+Marketing%2C+Inc.+dba+Rakuten+Rewards-11602495-SKUcategory-&cjevent=abd6d59307ed11f0824a010e0a1cb825&click_id=abd6d59307ed11f0824a010e0a1cb825&cjdata=MXxOfDB8WXwxNzQ2NjI1NzgyMDEx&ogmap=AFF%7CRTN%7C46157%7CSTND%7CMULTI%7CSITEWIDE%7C%7C%7C%7C"
-
-def log_message(message):
-    """将消息记录到日志文件"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a") as f:
-        f.write(f"[{timestamp}] {message}\n")
-    print(message)
+def log_message(message, level="INFO", **fields):
+    """将消息记录到日志文件（由后台线程批量写入）"""
+    get_logger(LOG_FILE).log(message, level, **fields)
 
-def create_mock_ad(customer_id, customizer_attribute_name=None):
+def create_mock_ad(
+    customer_id, customizer_attribute_name=None, campaign_specs=None,
+    latency=None
+):
     """
-    创建模拟广告数据用于测试
+    创建模拟广告：用进程内替身客户端运行真实的创建代码，不连接 API
+
+    流水线中的日志同样写入模拟日志文件，结束时记录运行概况。
     """
+    import belk_search_ads_creator
+
     log_message("=" * 60)
-    log_message("⚠️ 模拟模式 - 不会实际连接到 Google Ads API ⚠️")
-    log_message("=" * 60)
-    log_message(f"开始为客户 ID {customer_id} 创建模拟广告")
-    
-    # 模拟创建自定义属性（如果指定）
-    if customizer_attribute_name:
-        mock_resource_name = f"customizer_attributes/{uuid.uuid4()}"
-        log_message(f"✓ 创建了自定义属性 '{customizer_attribute_name}'，资源名称: '{mock_resource_name}'")
-        log_message(f"✓ 将自定义属性 '{customizer_attribute_name}' 链接到客户，值: 'Up to 70% OFF'")
-    
-    # 模拟创建预算
-    budget_id = uuid.uuid4()
-    log_message(f"✓ 创建了预算: campaign_budgets/{budget_id}")
-    
-    # 模拟创建广告系列
-    campaign_id = uuid.uuid4()
-    log_message(f"✓ 创建了广告系列: campaigns/{campaign_id}")
-    
-    # 模拟创建广告组
-    ad_group_id = uuid.uuid4()
-    log_message(f"✓ 创建了广告组: ad_groups/{ad_group_id}")
-    
-    # 模拟创建广告
-    ad_id = uuid.uuid4()
-    log_message(f"✓ 创建了响应式搜索广告，资源名称: \"ad_group_ads/{ad_id}\"")
-    
-    # 模拟标题和描述
-    headlines = [
-        "Shop Belk.com Fashion Deals",
-        "Up to 70% Off Designer Brands",
-        "Free Shipping on Orders $49+"
-    ]
-    descriptions = [
-        "Shop the latest fashion trends, homeware & beauty at Belk.com. Find amazing deals today!",
-        "Belk.com - Discover designer clothing, shoes, accessories & more. Shop now!"
-    ]
-    
-    log_message("\n📝 广告内容摘要:")
-    log_message(f"  最终 URL: {FINAL_URL}")
-    log_message("  标题:")
-    for i, headline in enumerate(headlines, 1):
-        log_message(f"    {i}. {headline}")
-    log_message("  描述:")
-    for i, desc in enumerate(descriptions, 1):
-        log_message(f"    {i}. {desc}")
-    log_message("  显示路径: belk.com/fashion/deals")
-    
-    # 模拟关键词
-    keywords = [
-        "belk department store",
-        "belk online shopping",
-        "clothing deals belk",
-        "belk coupon codes",
-        "belk designer clothes",
-        "belk online store",
-        "belk home decor",
-        "belk shoes sale"
-    ]
-    
-    log_message(f"\n✓ 添加了 {len(keywords)} 个关键词:")
-    for i, keyword in enumerate(keywords, 1):
-        log_message(f"  {i}. {keyword}")
-    
-    # 模拟地理定位
-    locations = ["New York", "Los Angeles", "Chicago"]
-    log_message(f"\n✓ 添加了地理定位: {', '.join(locations)}")
-    
-    log_message("\n✅ 模拟广告创建完成")
-    log_message("=" * 60)
-    log_message("⚠️ 这只是模拟数据，未实际提交到 Google Ads API")
-    log_message("⚠️ 真实广告将在网络连接恢复后创建")
+    belk_search_ads_creator.LOG_FILE = LOG_FILE
+    profile = belk_search_ads_creator.create_mock_ad(
+        customer_id, customizer_attribute_name, campaign_specs, latency=latency
+    )
     log_message("=" * 60)
+    return profile
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -121,6 +56,18 @@ if __name__ == "__main__":
         help="要创建的自定义属性的名称",
     )
 
+    parser.add_argument(
+        "--spec",
+        type=str,
+        help="描述多个广告系列的 YAML/JSONL 规格文件，用于预演批量创建"
+    )
+    parser.add_argument(
+        "--latency_ms",
+        type=float,
+        default=150,
+        help="每次调用的模拟延迟（毫秒），用于估算总耗时"
+    )
+
     args = parser.parse_args()
 
     # 确保目录存在
@@ -130,4 +77,15 @@ if __name__ == "__main__":
     with open(LOG_FILE, "w") as f:
         f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始Belk.com模拟搜索广告创建日志\n")
 
-    create_mock_ad(args.customer_id, args.customizer_attribute_name)
+    campaign_specs = None
+    if args.spec:
+        from campaign_spec import load_campaign_specs
+        campaign_specs = load_campaign_specs(args.spec)
+
+    from fake_ads_client import LatencyModel
+    create_mock_ad(
+        args.customer_id,
+        args.customizer_attribute_name,
+        campaign_specs,
+        latency=LatencyModel(args.latency_ms, jitter=0.5),
+    )
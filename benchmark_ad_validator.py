@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+广告预检吞吐量基准
+
+生成 N 个广告（每个 3 条标题、2 条描述、两段路径和最终URL），分别在
+文本大量重复（常见的规格文件）和全部唯一（最坏情况）两种情况下计时。
+不需要网络和凭据。
+
+用法:
+    python benchmark_ad_validator.py --count 100000
+"""
+
+import argparse
+import time
+
+from ad_validator import AdValidator
+
+FINAL_URL = "https://www.belk.com/"
+
+
+def make_ads(count, unique):
+    ads = []
+    for index in range(count):
+        suffix = f" {index}" if unique else ""
+        ads.append({
+            "headlines": [
+                (f"Shop Belk Fashion{suffix}", "HEADLINE_1"),
+                (f"Up to 70% Off Brands{suffix}", None),
+                (f"Free Shipping $49+{suffix}", None),
+            ],
+            "descriptions": [
+                f"Shop the latest fashion trends, homeware & beauty at Belk.com{suffix}.",
+                f"Discover designer clothing, shoes & accessories. Shop now{suffix}.",
+            ],
+            "final_url": f"{FINAL_URL}?ad={index}" if unique else FINAL_URL,
+            "path1": "fashion",
+            "path2": "deals",
+        })
+    return ads
+
+
+def measure(name, ads):
+    validator = AdValidator()
+    started = time.perf_counter()
+    issue_count = 0
+    for ad in ads:
+        issue_count += len(validator.validate_ad(ad))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<10} {len(ads):>8} 个广告  {elapsed:6.3f} 秒  "
+        f"{len(ads) / elapsed:>12,.0f} 个/秒  {issue_count} 个问题"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="广告预检吞吐量基准")
+    parser.add_argument("--count", type=int, default=100000, help="广告数量")
+    args = parser.parse_args()
+
+    measure("文本重复", make_ads(args.count, unique=False))
+    measure("全部唯一", make_ads(args.count, unique=True))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+关键词操作构建微基准
+
+比较两种方式构建 N 个关键词操作并包装为 MutateOperation 的吞吐量：
+  - 逐个 proto-plus: 每个关键词调用 client.get_type() 并经由 proto-plus 赋值，
+    再通过 client.copy_from() 包装（原来的实现）
+  - 原型克隆: operation_factory.OperationFactory，原生 protobuf CopyFrom
+
+不需要网络和凭据，只使用本地类型构建。
+
+用法:
+    python benchmark_operation_factory.py --count 100000
+"""
+
+import argparse
+import time
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.auth.credentials import AnonymousCredentials
+
+from ads_config import API_VERSION
+from operation_factory import OperationFactory
+
+AD_GROUP_RESOURCE_NAME = "customers/1234567890/adGroups/1"
+MATCH_TYPES = ("BROAD", "PHRASE", "EXACT")
+
+
+def make_keywords(count):
+    return [
+        (f"belk keyword {index}", MATCH_TYPES[index % len(MATCH_TYPES)])
+        for index in range(count)
+    ]
+
+
+def build_with_proto_plus(client, keywords):
+    """原来的实现：每个关键词一次 get_type，字段经过 proto-plus 转换"""
+    match_type_enum = client.enums.KeywordMatchTypeEnum
+    mutate_operations = []
+    for text, match_type in keywords:
+        operation = client.get_type("AdGroupCriterionOperation")
+        criterion = operation.create
+        criterion.ad_group = AD_GROUP_RESOURCE_NAME
+        criterion.status = client.enums.AdGroupCriterionStatusEnum.ENABLED
+        criterion.keyword.text = text
+        criterion.keyword.match_type = getattr(match_type_enum, match_type)
+        mutate_operation = client.get_type("MutateOperation")
+        client.copy_from(mutate_operation.ad_group_criterion_operation, operation)
+        mutate_operations.append(mutate_operation)
+    return mutate_operations
+
+
+def build_with_factory(client, keywords):
+    """原型克隆：原生 protobuf CopyFrom，不经过 proto-plus"""
+    factory = OperationFactory(client)
+    return [
+        factory.mutate_operation("ad_group_criterion_operation", operation)
+        for operation in factory.keyword_operations(
+            AD_GROUP_RESOURCE_NAME, keywords
+        )
+    ]
+
+
+def measure(name, build, client, keywords):
+    started = time.perf_counter()
+    operations = build(client, keywords)
+    elapsed = time.perf_counter() - started
+    rate = len(operations) / elapsed
+    print(f"{name:<16} {len(operations):>8} 个操作  {elapsed:8.2f} 秒  {rate:>12,.0f} 个/秒")
+    return operations, rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="关键词操作构建微基准")
+    parser.add_argument("--count", type=int, default=100000, help="关键词数量")
+    args = parser.parse_args()
+
+    client = GoogleAdsClient(
+        credentials=AnonymousCredentials(),
+        developer_token="benchmark",
+        use_proto_plus=True,
+        version=API_VERSION,
+    )
+    keywords = make_keywords(args.count)
+
+    before, before_rate = measure("逐个 proto-plus", build_with_proto_plus, client, keywords)
+    after, after_rate = measure("原型克隆", build_with_factory, client, keywords)
+
+    # 两种方式生成的操作序列化后必须完全一致
+    for old, new in zip(before, after):
+        assert type(old).serialize(old) == new.SerializeToString()
+    print(f"加速比: {after_rate / before_rate:.1f}x（结果一致）")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+完整创建流水线的端到端吞吐量基准
+
+启动本地 fake_ads_server.py 替身服务器，对每个规模（默认 1、100、10000 个
+广告系列）在独立的子进程中运行一次完整的创建流水线，使每个规模的峰值内存
+互不影响。客户端使用真实的 GAPIC 服务客户端和 gRPC 通道，一个计时拦截器
+记录每次调用的耗时和操作数。
+
+报告每个规模的广告系列/秒、操作/秒、RPC 数、每次 RPC 的 p50/p99 延迟以及
+峰值 RSS。
+
+用法:
+    python benchmark_pipeline.py --sizes 1,100,10000
+    python benchmark_pipeline.py --sizes 100 --mode main --latency_ms 30
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+import grpc
+
+SERVER_OPTIONS = (
+    "latency_ms", "latency_jitter", "per_operation_ms", "error_rate",
+    "quota_error_rate", "invalid_operation_rate",
+)
+
+
+class TimingInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """记录每个 gRPC 方法的调用耗时（秒）和请求中的操作数"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.operations = 0
+        self._lock = threading.Lock()
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        operations = getattr(request, "operations", None)
+        if operations is None:
+            operations = getattr(request, "mutate_operations", ())
+        started = time.perf_counter()
+        try:
+            return continuation(client_call_details, request)
+        finally:
+            elapsed = time.perf_counter() - started
+            method = client_call_details.method.rsplit("/", 1)[-1]
+            with self._lock:
+                self.latencies.setdefault(method, []).append(elapsed)
+                self.operations += len(operations)
+
+
+def percentile(sorted_values, fraction):
+    """返回已排序列表的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(latencies):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+
+
+def run_worker(args):
+    """在当前进程中运行一次流水线，返回结果字典"""
+    # 基准只关心吞吐量，日志只保留警告和错误
+    from ads_logging import get_logger
+    from belk_search_ads_creator import LOG_FILE, main
+    from bulk_creator import create_campaigns_from_specs
+    from campaign_spec import normalize_campaign_spec
+    from fake_ads_server import FakeServerClient
+    from retry_policy import RetryingClient, RetryPolicy
+
+    get_logger(LOG_FILE, level="WARNING", echo=False)
+
+    interceptor = TimingInterceptor()
+    client = RetryingClient(
+        FakeServerClient(args.address, interceptors=[interceptor]),
+        RetryPolicy(max_attempts=args.retries + 1, initial_delay=0.1),
+    )
+
+    started = time.perf_counter()
+    if args.mode == "bulk":
+        specs = [
+            normalize_campaign_spec({"name": f"Benchmark Campaign {index}"})
+            for index in range(args.campaigns)
+        ]
+        create_campaigns_from_specs(
+            client, args.customer_id, specs,
+            customizer_attribute_name="BenchmarkAttribute",
+            chunk_size=args.chunk_size,
+        )
+    else:
+        for index in range(args.campaigns):
+            main(client, args.customer_id, f"BenchmarkAttribute{index}")
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [
+        value for values in interceptor.latencies.values() for value in values
+    ]
+    return {
+        "campaigns": args.campaigns,
+        "mode": args.mode,
+        "seconds": elapsed,
+        "campaigns_per_second": args.campaigns / elapsed,
+        "operations": interceptor.operations,
+        "operations_per_second": interceptor.operations / elapsed,
+        "rpcs": len(all_latencies),
+        "latency": latency_summary(all_latencies),
+        "methods": {
+            method: latency_summary(values)
+            for method, values in sorted(interceptor.latencies.items())
+        },
+        # Linux 上 ru_maxrss 的单位是 KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def start_server(args):
+    """以子进程启动替身服务器，返回 (进程, 地址)"""
+    server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ads_server.py")
+    command = [sys.executable, server_script, "--port", "0"]
+    for option in SERVER_OPTIONS:
+        command += [f"--{option}", str(getattr(args, option))]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    match = re.search(r"listening on (\S+)", line)
+    if not match:
+        process.kill()
+        raise RuntimeError(f"替身服务器启动失败: {line.strip()}")
+    return process, match.group(1)
+
+
+def run_size(args, address, campaigns):
+    """在独立子进程中运行一个规模，使峰值 RSS 只反映该规模"""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--address", address,
+        "--campaigns", str(campaigns),
+        "--mode", args.mode,
+        "--chunk_size", str(args.chunk_size),
+        "--customer_id", args.customer_id,
+        "--retries", str(args.retries),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(results, verbose=False):
+    print(
+        f"{'广告系列':>8} {'耗时(秒)':>9} {'系列/秒':>9} {'操作数':>9} "
+        f"{'操作/秒':>10} {'RPC':>6} {'p50(ms)':>8} {'p99(ms)':>8} {'峰值RSS(MB)':>11}"
+    )
+    for result in results:
+        latency = result["latency"]
+        print(
+            f"{result['campaigns']:>8} {result['seconds']:>9.2f} "
+            f"{result['campaigns_per_second']:>9.1f} {result['operations']:>9} "
+            f"{result['operations_per_second']:>10.0f} {result['rpcs']:>6} "
+            f"{latency['p50_ms']:>8.1f} {latency['p99_ms']:>8.1f} "
+            f"{result['peak_rss_mb']:>11.1f}"
+        )
+        if verbose:
+            for method, summary in result["methods"].items():
+                print(
+                    f"    {method:<32} {summary['count']:>6} 次  "
+                    f"p50 {summary['p50_ms']:7.1f} ms  p99 {summary['p99_ms']:7.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="完整创建流水线的端到端吞吐量基准")
+    parser.add_argument("--sizes", default="1,100,10000", help="逗号分隔的广告系列数量")
+    parser.add_argument(
+        "--mode", choices=["bulk", "main"], default="bulk",
+        help="bulk: 批量引擎（--spec）；main: 逐个广告系列调用 main()",
+    )
+    parser.add_argument("--chunk_size", type=int, default=10000, help="每个 Mutate 请求的最大操作数")
+    parser.add_argument("--customer_id", default="1234567890", help="替身服务器使用的客户ID")
+    parser.add_argument("--retries", type=int, default=3, help="单个调用的最大重试次数")
+    parser.add_argument("--latency_ms", type=float, default=0, help="服务器每次调用的基础延迟（毫秒）")
+    parser.add_argument("--latency_jitter", type=float, default=0, help="延迟的对数正态抖动系数")
+    parser.add_argument("--per_operation_ms", type=float, default=0, help="每个操作增加的延迟（毫秒）")
+    parser.add_argument("--error_rate", type=float, default=0, help="UNAVAILABLE 错误比例")
+    parser.add_argument("--quota_error_rate", type=float, default=0, help="RESOURCE_EXHAUSTED 错误比例")
+    parser.add_argument("--invalid_operation_rate", type=float, default=0, help="被拒绝的操作比例")
+    parser.add_argument("--seed", type=int, help="服务器随机数种子")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示每个 gRPC 方法的延迟")
+    # 内部使用：在子进程中运行单个规模
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--address", help=argparse.SUPPRESS)
+    parser.add_argument("--campaigns", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        sys.exit(0)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    server, address = start_server(args)
+    try:
+        results = []
+        for campaigns in sizes:
+            print(f"运行 {campaigns} 个广告系列（{args.mode}）...", flush=True)
+            results.append(run_size(args, address, campaigns))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_report(results, verbose=args.verbose)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
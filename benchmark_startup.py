@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+命令行启动耗时基准（回归检查）
+
+对 --help 和每个子命令分别启动 N 个新的解释器，导入该子命令用到的全部
+模块后退出，记录墙钟耗时的中位数；同时检查 --help 和 validate 没有加载
+google-ads 库、grpc 或 requests。使用 --save_baseline 记录基线，之后用
+--baseline 比较：中位数超过基线的 (1 + --tolerance) 倍再加 --slack_ms 或加载了
+不该加载的模块时以非零状态退出。不需要网络和凭据。
+
+用法:
+    python benchmark_startup.py --runs 10 --save_baseline startup_baseline.json
+    python benchmark_startup.py --runs 10 --baseline startup_baseline.json
+"""
+
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+
+from belk_search_ads_creator import COMMANDS
+from startup_profile import SCRIPT_DIR, command_import_code, run_import
+
+# 不连接 API 的路径上不允许出现的模块
+HEAVY_MODULES = ("google.ads.googleads", "grpc", "requests")
+LIGHT_CASES = ("help", "validate")
+
+
+def case_code(case):
+    """每个基准用例在子进程中执行的代码"""
+    if case == "help":
+        return (
+            "import sys; sys.argv = ['belk_search_ads_creator.py', '--help']\n"
+            "import belk_search_ads_creator\n"
+            "try:\n"
+            "    belk_search_ads_creator.build_argument_parser().parse_args()\n"
+            "except SystemExit:\n"
+            "    pass"
+        )
+    return command_import_code(case)
+
+
+def loaded_heavy_modules(case):
+    """返回用例执行后已加载的重量级模块"""
+    # --help 的输出也在标准输出中，结果写到标准错误
+    code = case_code(case) + (
+        f"\nimport sys; sys.stderr.write(repr([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=SCRIPT_DIR, capture_output=True, text=True
+    )
+    return ast.literal_eval(result.stderr)
+
+
+def measure(case, runs):
+    """返回 runs 次启动耗时（毫秒）的中位数和最小值"""
+    # 第一次运行预热 __pycache__ 和文件系统缓存，不计入结果
+    run_import(case_code(case))
+    timings = [run_import(case_code(case))[0] * 1000 for _ in range(runs)]
+    return statistics.median(timings), min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="命令行启动耗时基准")
+    parser.add_argument("--runs", type=int, default=10, help="每个用例启动的次数")
+    parser.add_argument(
+        "--cases", default=",".join(("help",) + COMMANDS), help="逗号分隔的用例"
+    )
+    parser.add_argument("--baseline", help="与之比较的基线 JSON 文件")
+    parser.add_argument("--save_baseline", help="将本次结果保存为基线 JSON 文件")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="允许超过基线的比例"
+    )
+    parser.add_argument(
+        "--slack_ms", type=float, default=20, help="额外允许的绝对误差（毫秒），避免短用例的抖动误报"
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    failures = []
+    for case in args.cases.split(","):
+        median, fastest = measure(case, args.runs)
+        results[case] = round(median, 1)
+        line = f"{case:<10} 中位数 {median:8.1f} 毫秒  最快 {fastest:8.1f} 毫秒"
+        if case in baseline:
+            ratio = median / baseline[case]
+            line += f"  基线 {baseline[case]:8.1f} 毫秒（{ratio:.2f} 倍）"
+            if median > baseline[case] * (1 + args.tolerance) + args.slack_ms:
+                failures.append(f"{case} 启动耗时超过基线 {ratio:.2f} 倍")
+        print(line)
+        if case in LIGHT_CASES:
+            heavy = loaded_heavy_modules(case)
+            if heavy:
+                failures.append(f"{case} 加载了 {', '.join(heavy)}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.save_baseline}")
+    for failure in failures:
+        print(f"回归: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,470 @@
+#!/usr/bin/env python
+"""
+批量广告系列创建引擎
+
+根据 campaign_spec.py 加载的规格一次创建多个广告系列。与 main() 逐个
+广告系列、逐个资源发送请求不同，这里按资源层级（预算 → 广告系列 → 广告组
+→ 广告/关键词/地理定位）把所有广告系列中同类型的操作合并，每个
+GoogleAdsService.Mutate 请求最多包含 MAX_OPERATIONS_PER_REQUEST 个操作，
+序列化后不超过 MAX_REQUEST_BYTES。
+500 个广告系列只需要少量请求，而不是数千个。
+"""
+
+import sys
+
+from belk_search_ads_creator import (
+    build_ad_group_ad_operation,
+    build_ad_group_operation,
+    build_campaign_budget_operation,
+    build_campaign_operation,
+    build_geo_targeting_operations,
+    build_keyword_operations,
+    create_customizer_attribute,
+    link_customizer_attribute_to_customer,
+    log_message,
+    resolve_geo_target_constants,
+    run_journaled_step,
+)
+from ad_validator import filter_campaign_specs
+from batch_job import run_batch_job
+from keyword_expansion import iter_catalog_keyword_operations
+from operation_factory import get_operation_factory, to_pb
+from partial_failure import handle_partial_failure
+
+# Google Ads API 单个 Mutate 请求允许的最大操作数
+MAX_OPERATIONS_PER_REQUEST = 10000
+# gRPC 默认最多接收 4 MB 的消息；10000 个广告或关键词操作序列化后远超这个
+# 大小，因此每个块还按累计的序列化大小限制，并为请求头留出余量
+MAX_REQUEST_BYTES = 3 * 1024 * 1024
+# 每个操作包装进 MutateOperation 和重复字段时增加的字节数（上限估计）
+OPERATION_OVERHEAD_BYTES = 16
+
+
+def iter_operation_chunks(
+    operations, chunk_size=MAX_OPERATIONS_PER_REQUEST,
+    max_bytes=MAX_REQUEST_BYTES, operation_of=None
+):
+    """
+    按操作数和序列化大小将操作分块
+
+    Args:
+        operations: 操作的可迭代对象（可以是生成器）
+        chunk_size: 每块的最大操作数
+        max_bytes: 每块操作序列化后的最大累计字节数；单个操作超过上限时
+            单独成块
+        operation_of: 可选，从元素中取出操作的函数（元素不是操作本身时）
+
+    Yields:
+        元素列表，顺序与 operations 一致
+    """
+    chunk = []
+    size = 0
+    for item in operations:
+        operation = item if operation_of is None else operation_of(item)
+        operation_size = to_pb(operation).ByteSize() + OPERATION_OVERHEAD_BYTES
+        if chunk and (
+            len(chunk) >= chunk_size or size + operation_size > max_bytes
+        ):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(item)
+        size += operation_size
+    if chunk:
+        yield chunk
+
+
+def mutate_in_chunks(
+    client, customer_id, operation_field, operations,
+    chunk_size=MAX_OPERATIONS_PER_REQUEST, stats=None, journal=None,
+    partial_failure=False, rejected_log=None, keep_results=True
+):
+    """
+    将同类型的操作按块提交到 GoogleAdsService.Mutate
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID（不带破折号）
+        operation_field: MutateOperation 中的字段名，例如 "campaign_operation"
+        operations: 具体类型操作的可迭代对象（可以是生成器，每次只取一块）
+        chunk_size: 每个请求的最大操作数（另外按 MAX_REQUEST_BYTES 限制大小）
+        stats: 可选的统计字典，累加 requests 和 operations
+        journal: run_journal.RunJournal 实例（可选），已提交的块不再重复提交
+        partial_failure: 是否以部分失败模式提交；被拒绝的操作不影响同一块中
+            的其他操作，也不会被重新提交
+        rejected_log: partial_failure.RejectedOperationLog 实例（可选）
+        keep_results: 是否收集资源名称；没有下游依赖的大量操作可关闭以节省内存
+
+    Returns:
+        与 operations 顺序一致的资源名称列表，被拒绝的操作对应空字符串；
+        keep_results 为 False 时返回空列表
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    operation_factory = get_operation_factory(client)
+    result_field = operation_field.replace("_operation", "_result")
+
+    def submit(start, chunk):
+        request = operation_factory.mutate_request(
+            "MutateGoogleAdsRequest",
+            customer_id,
+            [
+                operation_factory.mutate_operation(operation_field, operation)
+                for operation in chunk
+            ],
+            partial_failure,
+            operations_field="mutate_operations",
+        )
+        response = googleads_service.mutate(request=request)
+        rejected = set()
+        if partial_failure:
+            rejected = handle_partial_failure(
+                client, customer_id, operation_field, response, chunk,
+                rejected_log,
+            )
+        if stats is not None:
+            stats["requests"] += 1
+            stats["operations"] += len(chunk)
+            stats["rejected"] = stats.get("rejected", 0) + len(rejected)
+        log_message(
+            f"提交了 {len(chunk)} 个 {operation_field}，"
+            f"累计 {start + len(chunk)} 个"
+        )
+        return [
+            getattr(operation_response, result_field).resource_name
+            for operation_response in response.mutate_operation_responses
+        ]
+
+    resource_names = []
+    start = 0
+    for chunk in iter_operation_chunks(operations, chunk_size):
+        # 每个块是一个独立的步骤，中途失败时只重新提交未完成的块
+        chunk_resource_names = run_journaled_step(
+            journal, customer_id, f"{operation_field}:{start}",
+            submit, start, chunk,
+        )
+        if keep_results:
+            resource_names.extend(chunk_resource_names)
+        start += len(chunk)
+    return resource_names
+
+
+def mutate_missing(
+    client, customer_id, operation_field, entity_type, operations,
+    chunk_size=MAX_OPERATIONS_PER_REQUEST, stats=None, journal=None,
+    entity_index=None
+):
+    """
+    只提交索引中不存在的实体的创建操作，返回与 operations 顺序一致的资源名称
+
+    已存在的实体返回其资源名称，新创建的实体加入索引。没有 entity_index 时
+    与 mutate_in_chunks 相同。有索引时过滤后的块在重新运行时位置会变化，
+    不再记入步骤日志：重新运行时已创建的实体由索引识别。
+    """
+    if entity_index is None:
+        return mutate_in_chunks(
+            client, customer_id, operation_field, operations, chunk_size,
+            stats, journal,
+        )
+    resource_names = [
+        entity_index.find(entity_type, operation.create) for operation in operations
+    ]
+    missing = [
+        index for index, resource_name in enumerate(resource_names)
+        if not resource_name
+    ]
+    entity_index.note_reused(entity_type, len(operations) - len(missing))
+    created = mutate_in_chunks(
+        client, customer_id, operation_field,
+        [operations[index] for index in missing], chunk_size, stats,
+    )
+    for index, resource_name in zip(missing, created):
+        resource_names[index] = resource_name
+        if resource_name:
+            entity_index.add(entity_type, operations[index].create, resource_name)
+    return resource_names
+
+
+def submit_leaf_operations(
+    client, customer_id, operation_field, operations, chunk_size, stats,
+    use_batch_job=False, batch_job_service=None, journal=None,
+    partial_failure=False, rejected_log=None, entity_index=None,
+    entity_type=None
+):
+    """
+    提交没有下游依赖的操作（关键词、地理定位），可选地走批处理作业
+
+    operations 可以是生成器，全程流式提交。提供 entity_index 时跳过已存在
+    的实体，提交后该类型的索引失效（不收集新资源名称）。返回提交的操作数。
+    """
+    if entity_index is not None:
+        operations = entity_index.missing_operations(entity_type, operations)
+        # 过滤后的块位置在重新运行时会变化，不能按位置跳过
+        submitted = 0
+        try:
+            submitted = submit_leaf_operations(
+                client, customer_id, operation_field, operations, chunk_size,
+                stats, use_batch_job, batch_job_service, None,
+                partial_failure, rejected_log,
+            )
+            return submitted
+        finally:
+            # 新资源名称没有收集，提交过操作时该类型需要重新加载
+            if submitted or sys.exc_info()[0] is not None:
+                entity_index.invalidate(entity_type)
+    if not use_batch_job:
+        submitted = 0
+
+        def counted(operations):
+            nonlocal submitted
+            for operation in operations:
+                submitted += 1
+                yield operation
+
+        mutate_in_chunks(
+            client, customer_id, operation_field, counted(operations),
+            chunk_size, stats, journal, partial_failure, rejected_log,
+            keep_results=False,
+        )
+        return submitted
+    summary = run_journaled_step(
+        journal, customer_id, f"batch_job:{operation_field}",
+        run_batch_job,
+        client, customer_id, operation_field, operations,
+        batch_job_service=batch_job_service,
+    )
+    stats["operations"] += summary["operations"]
+    stats["batch_job_failures"] = (
+        stats.get("batch_job_failures", 0) + summary["failed"]
+    )
+    return summary["operations"]
+
+
+def create_campaigns_from_specs(
+    client, customer_id, campaign_specs, customizer_attribute_name=None,
+    chunk_size=MAX_OPERATIONS_PER_REQUEST, use_batch_job=False,
+    batch_job_service=None, journal=None, geo_resolver=None,
+    partial_failure=False, rejected_log=None, entity_index=None
+):
+    """
+    按规格批量创建广告系列
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        campaign_specs: campaign_spec.load_campaign_specs() 返回的规格列表
+        customizer_attribute_name: 自定义属性名称（可选，整个运行只创建一次）
+        chunk_size: 每个 Mutate 请求的最大操作数
+        use_batch_job: 是否通过 BatchJobService 提交关键词和地理定位
+        batch_job_service: 可选的批处理服务替身（例如 LocalBatchJobService）
+        journal: run_journal.RunJournal 实例（可选），用于跳过已完成的步骤
+        geo_resolver: geo_target_cache.CachedGeoTargetResolver 实例（可选）
+        partial_failure: 广告、关键词和地理定位是否以部分失败模式提交；
+            预算、广告系列和广告组被下游引用，始终整体提交
+        rejected_log: partial_failure.RejectedOperationLog 实例（可选）
+        entity_index: entity_index.EntityIndex 实例（可选）；按名称复用已存在
+            的预算、广告系列、广告组，已有广告的广告组不再创建广告，已存在的
+            关键词和地理定位被跳过
+
+    Returns:
+        包含各类资源数量和请求数的统计字典
+    """
+    customer_id = customer_id.replace("-", "")
+    stats = {"requests": 0, "operations": 0}
+    # 提交前本地预检，无效的广告和关键词不消耗 API 配额
+    campaign_specs = filter_campaign_specs(campaign_specs)
+    log_message(
+        f"开始为客户 ID {customer_id} 批量创建 {len(campaign_specs)} 个广告系列"
+    )
+
+    if customizer_attribute_name:
+        reused = entity_index.reused if entity_index is not None else 0
+        customizer_attribute_resource_name = run_journaled_step(
+            journal, customer_id, "customizer_attribute",
+            create_customizer_attribute,
+            client, customer_id, customizer_attribute_name, entity_index,
+        )
+        run_journaled_step(
+            journal, customer_id, "customer_customizer",
+            link_customizer_attribute_to_customer,
+            client, customer_id, customizer_attribute_resource_name,
+            entity_index,
+        )
+        if entity_index is not None:
+            reused = entity_index.reused - reused
+        stats["requests"] += 2 - reused
+        stats["operations"] += 2 - reused
+
+    # 所有广告系列的位置名称只查询一次
+    location_names = sorted(
+        {name for spec in campaign_specs for name in spec["locations"]}
+    )
+    geo_target_constants = resolve_geo_target_constants(
+        client, location_names, geo_resolver
+    )
+    stats["requests"] += 1
+
+    # 预算：多个广告系列可以共用同名预算，每个名称只创建一次，否则同一个
+    # 请求中的重复创建会因 DUPLICATE_NAME 使整个预算层级失败
+    budget_specs = {}
+    for spec in campaign_specs:
+        first = budget_specs.setdefault(spec["budget_name"], spec)
+        if first["budget_amount_micros"] != spec["budget_amount_micros"]:
+            log_message(
+                f"广告系列 {spec['name']} 的预算 {spec['budget_name']} 金额"
+                f"与前面的规格不同，沿用 {first['budget_amount_micros']} micros",
+                "WARNING",
+            )
+    budget_resource_names_by_name = dict(zip(
+        budget_specs,
+        mutate_missing(
+            client, customer_id, "campaign_budget_operation", "campaign_budget",
+            [
+                build_campaign_budget_operation(
+                    client,
+                    name=budget_name,
+                    amount_micros=spec["budget_amount_micros"],
+                )
+                for budget_name, spec in budget_specs.items()
+            ],
+            chunk_size, stats, journal, entity_index,
+        ),
+    ))
+    budget_resource_names = [
+        budget_resource_names_by_name[spec["budget_name"]] for spec in campaign_specs
+    ]
+
+    # 广告系列
+    campaign_resource_names = mutate_missing(
+        client, customer_id, "campaign_operation", "campaign",
+        [
+            build_campaign_operation(client, budget_resource_name, name=spec["name"])
+            for spec, budget_resource_name in zip(
+                campaign_specs, budget_resource_names
+            )
+        ],
+        chunk_size, stats, journal, entity_index,
+    )
+
+    # 广告组
+    ad_group_specs = [
+        (campaign_resource_name, ad_group_spec)
+        for spec, campaign_resource_name in zip(
+            campaign_specs, campaign_resource_names
+        )
+        for ad_group_spec in spec["ad_groups"]
+    ]
+    ad_group_resource_names = mutate_missing(
+        client, customer_id, "ad_group_operation", "ad_group",
+        [
+            build_ad_group_operation(
+                client,
+                campaign_resource_name,
+                name=ad_group_spec["name"],
+                cpc_bid_micros=ad_group_spec["cpc_bid_micros"],
+            )
+            for campaign_resource_name, ad_group_spec in ad_group_specs
+        ],
+        chunk_size, stats, journal, entity_index,
+    )
+
+    # 广告
+    ad_operations = [
+        build_ad_group_ad_operation(
+            client,
+            ad_group_resource_name,
+            customizer_attribute_name,
+            headlines=ad_spec["headlines"],
+            descriptions=ad_spec["descriptions"],
+            final_url=ad_spec["final_url"],
+            path1=ad_spec["path1"],
+            path2=ad_spec["path2"],
+        )
+        for (_, ad_group_spec), ad_group_resource_name in zip(
+            ad_group_specs, ad_group_resource_names
+        )
+        for ad_spec in ad_group_spec["ads"]
+    ]
+    if entity_index is None:
+        mutate_in_chunks(
+            client, customer_id, "ad_group_ad_operation", ad_operations,
+            chunk_size, stats, journal, partial_failure, rejected_log,
+        )
+    else:
+        # 已有广告的广告组不再创建广告
+        ad_operations = list(
+            entity_index.missing_operations("ad_group_ad", ad_operations)
+        )
+        ad_resource_names = mutate_in_chunks(
+            client, customer_id, "ad_group_ad_operation", ad_operations,
+            chunk_size, stats, None, partial_failure, rejected_log,
+        )
+        for operation, resource_name in zip(ad_operations, ad_resource_names):
+            if resource_name:
+                entity_index.add("ad_group_ad", operation.create, resource_name)
+
+    # 关键词：手写关键词加上从商品目录扩展的关键词，以生成器流式提交
+    def keyword_operations():
+        for (_, ad_group_spec), ad_group_resource_name in zip(
+            ad_group_specs, ad_group_resource_names
+        ):
+            if ad_group_spec["keywords"]:
+                yield from build_keyword_operations(
+                    client, ad_group_resource_name, ad_group_spec["keywords"]
+                )
+            if ad_group_spec.get("keyword_catalog"):
+                yield from iter_catalog_keyword_operations(
+                    client, ad_group_resource_name,
+                    ad_group_spec["keyword_catalog"],
+                )
+
+    keyword_count = submit_leaf_operations(
+        client, customer_id, "ad_group_criterion_operation",
+        keyword_operations(), chunk_size, stats, use_batch_job,
+        batch_job_service, journal, partial_failure, rejected_log,
+        entity_index, "keyword",
+    )
+
+    # 地理定位
+    criterion_operations = []
+    for spec, campaign_resource_name in zip(
+        campaign_specs, campaign_resource_names
+    ):
+        resolved = []
+        for name in spec["locations"]:
+            if name in geo_target_constants:
+                resolved.append(geo_target_constants[name][0])
+            else:
+                log_message(f"未找到位置 \"{name}\" 的地理目标常量，已跳过")
+        criterion_operations.extend(
+            build_geo_targeting_operations(
+                client, campaign_resource_name, resolved
+            )
+        )
+    criterion_count = submit_leaf_operations(
+        client, customer_id, "campaign_criterion_operation",
+        criterion_operations, chunk_size, stats, use_batch_job,
+        batch_job_service, journal, partial_failure, rejected_log,
+        entity_index, "geo_target",
+    )
+
+    stats.update(
+        {
+            "campaigns": len(campaign_resource_names),
+            "ad_groups": len(ad_group_resource_names),
+            "ads": len(ad_operations),
+            "keywords": keyword_count,
+            "campaign_criteria": criterion_count,
+        }
+    )
+    log_message(
+        f"批量创建完成: {stats['campaigns']} 个广告系列, "
+        f"{stats['ad_groups']} 个广告组, {stats['ads']} 个广告, "
+        f"{stats['keywords']} 个关键词, {stats['campaign_criteria']} 个地理定位, "
+        f"共 {stats['requests']} 个请求"
+        + (f"，拒绝了 {stats['rejected']} 个操作" if stats.get("rejected") else "")
+        + (
+            f"，复用了 {entity_index.reused} 个已存在的实体"
+            if entity_index is not None and entity_index.reused else ""
+        )
+    )
+    return stats
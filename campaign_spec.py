@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+广告系列规格文件解析
+
+从 YAML 或 JSONL 文件读取需要批量创建的广告系列、广告组、广告和关键词。
+
+YAML 格式（顶层可直接是列表，也可以是带 defaults/campaigns 的字典）:
+
+    defaults:
+      budget_amount_micros: 1000000
+      locations: ["New York", "Chicago"]
+    campaigns:
+      - name: "Belk Shoes Campaign"
+        ad_groups:
+          - name: "Belk Women's Shoes"
+            cpc_bid_micros: 1500000
+            ads:
+              - headlines:
+                  - {text: "Shop Belk Shoes", pinned_field: HEADLINE_1}
+                  - "Up to 50% Off Shoes"
+                  - "Free Shipping on $49+"
+                descriptions: ["...", "..."]
+                path1: shoes
+                path2: sale
+            keywords:
+              - {text: "belk shoes", match_type: EXACT}
+              - "belk womens shoes"
+            # 可选：从商品目录扩展关键词（见 keyword_expansion.py）
+            keyword_catalog:
+              path: catalog.csv
+              modifiers: ["", sale, deals]
+              match_types: [PHRASE, EXACT]
+
+JSONL 格式每行一个广告系列对象，字段与上面 campaigns 中的条目相同。
+未提供的字段使用 belk_search_ads_creator.py 中的模块默认值。
+"""
+
+import json
+
+import yaml
+
+from belk_search_ads_creator import (
+    BUDGET_AMOUNT_MICROS,
+    CPC_BID_MICROS,
+    DEFAULT_AD_GROUP_NAME,
+    DEFAULT_CAMPAIGN_NAME,
+    FINAL_URL,
+    GEO_LOCATIONS,
+    HEADLINES,
+    KEYWORDS,
+    PATH1,
+    PATH2,
+)
+from keyword_expansion import (
+    DEFAULT_BRAND_COLUMN,
+    DEFAULT_CATEGORY_COLUMN,
+    DEFAULT_MATCH_TYPES,
+    DEFAULT_MODIFIERS,
+)
+
+# 未指定匹配类型的关键词默认使用广泛匹配
+DEFAULT_MATCH_TYPE = "BROAD"
+
+
+class CampaignSpecError(ValueError):
+    """规格文件内容无效"""
+
+
+def default_name(base, position):
+    """未命名实体的稳定名称：第一个使用基础名称，之后按位置加序号"""
+    return base if position == 1 else f"{base} {position}"
+
+
+def read_raw_specs(path):
+    """读取规格文件，返回 (defaults, 原始广告系列列表)"""
+    if path.endswith(".jsonl"):
+        campaigns = []
+        with open(path, "r") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    campaigns.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise CampaignSpecError(
+                        f"{path} 第 {line_number} 行不是有效的 JSON: {e}"
+                    )
+        return {}, campaigns
+
+    with open(path, "r") as f:
+        document = yaml.safe_load(f) or {}
+    if isinstance(document, list):
+        return {}, document
+    if not isinstance(document, dict) or "campaigns" not in document:
+        raise CampaignSpecError(f"{path} 缺少 campaigns 列表")
+    return document.get("defaults") or {}, document["campaigns"] or []
+
+
+def _normalize_headlines(headlines):
+    """将标题统一为 (文本, 固定位置) 列表"""
+    normalized = []
+    for headline in headlines:
+        if isinstance(headline, str):
+            normalized.append((headline, None))
+        else:
+            normalized.append((headline["text"], headline.get("pinned_field")))
+    return normalized
+
+
+def _normalize_keywords(keywords):
+    """将关键词统一为 (文本, 匹配类型) 列表"""
+    normalized = []
+    for keyword in keywords:
+        if isinstance(keyword, str):
+            normalized.append((keyword, DEFAULT_MATCH_TYPE))
+        else:
+            normalized.append(
+                (
+                    keyword["text"],
+                    keyword.get("match_type", DEFAULT_MATCH_TYPE).upper(),
+                )
+            )
+    return normalized
+
+
+def _normalize_keyword_catalog(raw_catalog):
+    """将 keyword_catalog 统一为字典；可以只写目录文件路径"""
+    if isinstance(raw_catalog, str):
+        raw_catalog = {"path": raw_catalog}
+    if not isinstance(raw_catalog, dict) or not raw_catalog.get("path"):
+        raise CampaignSpecError(f"keyword_catalog 必须包含 path: {raw_catalog!r}")
+    return {
+        "path": raw_catalog["path"],
+        "brand_column": raw_catalog.get("brand_column", DEFAULT_BRAND_COLUMN),
+        "category_column": raw_catalog.get(
+            "category_column", DEFAULT_CATEGORY_COLUMN
+        ),
+        "modifiers": [
+            "" if modifier is None else str(modifier)
+            for modifier in raw_catalog.get("modifiers", DEFAULT_MODIFIERS)
+        ],
+        "match_types": [
+            match_type.upper()
+            for match_type in raw_catalog.get("match_types", DEFAULT_MATCH_TYPES)
+        ],
+    }
+
+
+def _normalize_ad(raw_ad, defaults):
+    """规范化单个响应式搜索广告"""
+    return {
+        "headlines": _normalize_headlines(
+            raw_ad.get("headlines") or defaults.get("headlines") or []
+        ) or list(HEADLINES),
+        # 未提供描述时保留 None，由广告构建器决定是否使用自定义属性占位符
+        "descriptions": raw_ad.get("descriptions")
+        or defaults.get("descriptions"),
+        "final_url": raw_ad.get("final_url")
+        or defaults.get("final_url", FINAL_URL),
+        "path1": raw_ad.get("path1", defaults.get("path1", PATH1)),
+        "path2": raw_ad.get("path2", defaults.get("path2", PATH2)),
+    }
+
+
+def _normalize_ad_group(raw_ad_group, defaults, position=1):
+    """规范化单个广告组，position 为其在广告系列中的位置（从 1 开始）"""
+    raw_ads = raw_ad_group.get("ads") or [{}]
+    raw_keywords = raw_ad_group.get("keywords") or defaults.get("keywords")
+    raw_catalog = raw_ad_group.get("keyword_catalog")
+    if raw_catalog and not raw_keywords:
+        # 使用目录扩展时不再附加默认的手写关键词
+        raw_keywords = []
+    return {
+        "name": raw_ad_group.get("name")
+        or default_name(DEFAULT_AD_GROUP_NAME, position),
+        "cpc_bid_micros": int(
+            raw_ad_group.get(
+                "cpc_bid_micros",
+                defaults.get("cpc_bid_micros", CPC_BID_MICROS),
+            )
+        ),
+        "ads": [_normalize_ad(raw_ad, defaults) for raw_ad in raw_ads],
+        "keywords": _normalize_keywords(raw_keywords)
+        if raw_keywords is not None
+        else list(KEYWORDS),
+        "keyword_catalog": _normalize_keyword_catalog(raw_catalog)
+        if raw_catalog
+        else None,
+    }
+
+
+def normalize_campaign_spec(raw_campaign, defaults=None, position=1):
+    """
+    规范化单个广告系列规格，补全默认值
+
+    未命名的广告系列和广告组按位置使用稳定的默认名称，预算名称由广告系列
+    名称派生，因此同一规格文件重复运行时名称不变，可以复用已创建的实体。
+
+    Args:
+        raw_campaign: 从规格文件读取的广告系列字典
+        defaults: 规格文件中的全局默认值（可选）
+        position: 广告系列在规格文件中的位置（从 1 开始）
+    """
+    defaults = defaults or {}
+    if not isinstance(raw_campaign, dict):
+        raise CampaignSpecError(f"广告系列规格必须是对象: {raw_campaign!r}")
+
+    name = raw_campaign.get("name") or default_name(DEFAULT_CAMPAIGN_NAME, position)
+    raw_ad_groups = raw_campaign.get("ad_groups") or [{}]
+    return {
+        "name": name,
+        "budget_name": raw_campaign.get("budget_name")
+        or f"{name} Budget",
+        "budget_amount_micros": int(
+            raw_campaign.get(
+                "budget_amount_micros",
+                defaults.get("budget_amount_micros", BUDGET_AMOUNT_MICROS),
+            )
+        ),
+        "locations": list(
+            raw_campaign.get("locations")
+            or defaults.get("locations")
+            or GEO_LOCATIONS
+        ),
+        "ad_groups": [
+            _normalize_ad_group(raw_ad_group, defaults, ad_group_position)
+            for ad_group_position, raw_ad_group in enumerate(raw_ad_groups, 1)
+        ],
+    }
+
+
+def load_campaign_specs(path):
+    """从 YAML/JSONL 规格文件加载并规范化所有广告系列"""
+    defaults, raw_campaigns = read_raw_specs(path)
+    return [
+        normalize_campaign_spec(raw_campaign, defaults, position)
+        for position, raw_campaign in enumerate(raw_campaigns, 1)
+    ]
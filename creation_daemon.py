@@ -0,0 +1,590 @@
+#!/usr/bin/env python
+"""
+常驻的广告创建守护进程
+
+原来每次上线广告系列都是一个新进程：解析参数、加载配置、构建客户端、建立
+gRPC 通道并完成 TLS 握手和令牌交换，然后只运行一次。日志显示实际工作开始
+之前约有一秒的客户端加载时间，冷启动的 TLS 握手更长。
+
+守护进程只构建一次客户端（所有任务共享服务客户端和 gRPC 通道），启动时
+预热通道，之后从本地假脱机目录接收创建任务，在有界线程池中执行，每个任务
+写入一个结果文件。提交任务后的延迟只剩 RPC 本身。
+
+假脱机目录结构:
+    incoming/   待处理的任务（先写临时文件再重命名放入，对守护进程原子可见）
+    running/    正在执行的任务（通过 os.rename 认领）
+    done/       成功的任务文件
+    failed/     失败的任务文件
+    results/    每个任务的结果 <任务ID>.json，以及被拒绝的操作
+                <任务ID>.rejected.jsonl（--partial_failure 时）
+
+任务文件可以是 submit 生成的 JSON 任务描述，也可以直接是规格文件
+（.yaml/.yml/.jsonl，格式见 campaign_spec.py，为守护进程的默认客户ID创建）。
+任务ID 同时作为步骤日志的运行ID：守护进程异常退出后重新启动时，running/
+中的任务放回 incoming/，重新执行时跳过已完成的步骤。每个假脱机目录只允许
+一个守护进程（文件锁）。
+
+用法:
+    python creation_daemon.py serve --spool_dir spool -c 1234567890 --max_workers 4
+    python creation_daemon.py submit campaign_spec_example.yaml --spool_dir spool --wait
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，无法阻止多个守护进程共用一个假脱机目录
+    fcntl = None
+
+from ads_logging import get_logger, log_context
+from belk_search_ads_creator import LOG_FILE, SAVE_PATH, log_message, run_creation
+
+# 默认的假脱机目录
+DEFAULT_SPOOL_DIR = os.path.join(SAVE_PATH, "creation_spool")
+
+SPOOL_SUBDIRS = ("incoming", "running", "done", "failed", "results")
+
+# 直接放入 incoming/ 的规格文件
+SPEC_SUFFIXES = (".yaml", ".yml", ".jsonl")
+JOB_SUFFIXES = (".json",) + SPEC_SUFFIXES
+
+# 任务选项及守护进程的默认值；任务文件中的值优先
+JOB_OPTIONS = {
+    "customizer_attribute_name": "BelkSalePrice",
+    "atomic": False,
+    "chunk_size": 10000,
+    "batch_job": False,
+    "partial_failure": False,
+    "max_workers": 1,
+}
+
+
+def init_spool(spool_dir):
+    """创建假脱机目录结构"""
+    for subdir in SPOOL_SUBDIRS:
+        os.makedirs(os.path.join(spool_dir, subdir), exist_ok=True)
+
+
+def _write_json_atomic(path, data):
+    """先写临时文件再重命名，读取方不会看到写了一半的文件"""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def new_job_id():
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def submit_job(spool_dir, job, job_id=None):
+    """
+    把任务放入 incoming/
+
+    Args:
+        spool_dir: 假脱机目录
+        job: 任务描述字典（customer_ids、campaigns/defaults、JOB_OPTIONS 中的选项）
+        job_id: 任务ID（可选，默认按时间生成）
+
+    Returns:
+        任务ID
+    """
+    init_spool(spool_dir)
+    job_id = job_id or new_job_id()
+    _write_json_atomic(os.path.join(spool_dir, "incoming", job_id + ".json"), job)
+    return job_id
+
+
+def wait_for_result(spool_dir, job_id, timeout=None, interval=0.1):
+    """等待任务的结果文件出现并返回结果；超时返回 None"""
+    path = os.path.join(spool_dir, "results", job_id + ".json")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not os.path.exists(path):
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        time.sleep(interval)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_job(path, default_customer_ids=None, defaults=None):
+    """
+    读取任务文件
+
+    Returns:
+        (客户ID列表, 规格列表或 None, 选项字典)；规格为 None 时创建默认的
+        单个广告系列
+    """
+    from campaign_spec import load_campaign_specs, normalize_campaign_spec
+
+    options = dict(JOB_OPTIONS, **(defaults or {}))
+    customer_ids = list(default_customer_ids or [])
+    campaign_specs = None
+    if path.endswith(SPEC_SUFFIXES):
+        campaign_specs = load_campaign_specs(path)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            job = json.load(f)
+        if job.get("customer_ids") or job.get("customer_id"):
+            customer_ids = job.get("customer_ids") or [job["customer_id"]]
+        if job.get("campaigns") is not None:
+            campaign_specs = [
+                normalize_campaign_spec(raw_campaign, job.get("defaults"), position)
+                for position, raw_campaign in enumerate(job["campaigns"], 1)
+            ]
+        elif job.get("spec"):
+            campaign_specs = load_campaign_specs(job["spec"])
+        options.update({key: job[key] for key in JOB_OPTIONS if key in job})
+    if not customer_ids:
+        raise ValueError("任务没有指定客户ID，守护进程也没有默认客户ID")
+    return [str(cid).replace("-", "") for cid in customer_ids], campaign_specs, options
+
+
+def warm_up(client):
+    """建立 gRPC 通道并完成令牌交换，之后的任务不再承担这部分延迟"""
+    started = time.monotonic()
+    client.get_service("CustomerService").list_accessible_customers()
+    log_message(f"客户端预热完成，耗时 {time.monotonic() - started:.2f} 秒")
+
+
+class CreationDaemon:
+    """
+    从假脱机目录认领任务，在线程池中用共享的客户端执行
+
+    Args:
+        client: 初始化的GoogleAdsClient实例（或其包装器），所有任务共享
+        spool_dir: 假脱机目录
+        customer_ids: 任务未指定客户ID时使用的默认客户ID列表
+        max_workers: 同时执行的最大任务数
+        poll_interval: 扫描 incoming/ 的间隔（秒）
+        journal_file: 步骤日志 SQLite 文件路径（可选）
+        geo_resolver: geo_target_cache.CachedGeoTargetResolver 实例（可选）
+        entity_index_cache: entity_index.EntityIndexCache 实例（可选）
+        job_defaults: 覆盖 JOB_OPTIONS 的默认任务选项（可选）
+    """
+
+    def __init__(
+        self, client, spool_dir=DEFAULT_SPOOL_DIR, customer_ids=None,
+        max_workers=4, poll_interval=0.5, journal_file=None, geo_resolver=None,
+        entity_index_cache=None, job_defaults=None
+    ):
+        self.client = client
+        self.spool_dir = spool_dir
+        self.customer_ids = customer_ids or []
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.journal_file = journal_file or os.path.join(
+            SAVE_PATH, "run_journal.sqlite3"
+        )
+        self.geo_resolver = geo_resolver
+        self.entity_index_cache = entity_index_cache
+        self.job_defaults = job_defaults or {}
+        self.completed = 0
+        self.failed = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # 任务完成时立即唤醒主循环认领下一个任务，而不是等到下次扫描
+        self._wake = threading.Event()
+        init_spool(spool_dir)
+        self._spool_lock = self._lock_spool()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _path(self, subdir, name=""):
+        return os.path.join(self.spool_dir, subdir, name)
+
+    def _lock_spool(self):
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.spool_dir, "daemon.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"假脱机目录 {self.spool_dir} 已有守护进程在运行")
+        return lock_file
+
+    def recover(self):
+        """把上次异常退出时未完成的任务放回 incoming/"""
+        names = os.listdir(self._path("running"))
+        for name in names:
+            os.replace(self._path("running", name), self._path("incoming", name))
+        if names:
+            log_message(f"恢复了 {len(names)} 个未完成的任务，将跳过已完成的步骤")
+        return len(names)
+
+    def pending_jobs(self):
+        """incoming/ 中的任务文件名，按放入时间排序"""
+        entries = [
+            entry for entry in os.scandir(self._path("incoming"))
+            if entry.is_file()
+            and not entry.name.startswith(".")
+            and entry.name.endswith(JOB_SUFFIXES)
+        ]
+        entries.sort(key=lambda entry: (entry.stat().st_mtime, entry.name))
+        return [entry.name for entry in entries]
+
+    def poll(self):
+        """在空闲的工作线程数以内认领并提交任务，返回认领的任务数"""
+        claimed = 0
+        for name in self.pending_jobs():
+            with self._lock:
+                if self._in_flight >= self.max_workers:
+                    break
+                self._in_flight += 1
+            try:
+                os.rename(self._path("incoming", name), self._path("running", name))
+            except FileNotFoundError:
+                # 任务在扫描之后被取走
+                with self._lock:
+                    self._in_flight -= 1
+                continue
+            self._executor.submit(self._run_claimed, name)
+            claimed += 1
+        return claimed
+
+    def _run_claimed(self, name):
+        try:
+            self.run_job(name)
+        except Exception as e:
+            log_message(f"任务 {name} 异常: {str(e)}", "ERROR")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def run_job(self, name):
+        """执行 running/ 中的一个任务，写入结果文件并移动任务文件"""
+        job_id = os.path.splitext(name)[0]
+        started = time.monotonic()
+        result = {
+            "job_id": job_id,
+            "file": name,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "status": "failed",
+            "error": None,
+            "customers": {},
+        }
+        with log_context(job_id=job_id):
+            log_message(f"开始执行任务 {job_id}")
+            try:
+                result.update(self._execute(job_id, self._path("running", name)))
+            except Exception as e:
+                log_message(f"任务 {job_id} 无法执行: {str(e)}", "ERROR")
+                result["error"] = str(e)
+            result["elapsed"] = round(time.monotonic() - started, 3)
+            result["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            _write_json_atomic(self._path("results", job_id + ".json"), result)
+            succeeded = result["status"] == "success"
+            os.replace(
+                self._path("running", name),
+                self._path("done" if succeeded else "failed", name),
+            )
+            with self._lock:
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            log_message(
+                f"任务 {job_id} {'完成' if succeeded else '失败'}，"
+                f"耗时 {result['elapsed']:.2f} 秒"
+            )
+        return result
+
+    def _execute(self, job_id, path):
+        from multi_customer import run_for_customers
+        from partial_failure import RejectedOperationLog
+        from run_journal import RunJournal
+
+        customer_ids, campaign_specs, options = load_job(
+            path, self.customer_ids, self.job_defaults
+        )
+        rejected_log = None
+        if options["partial_failure"]:
+            rejected_log = RejectedOperationLog(
+                self._path("results", job_id + ".rejected.jsonl")
+            )
+        journal = RunJournal(self.journal_file, job_id)
+        try:
+            customers = run_for_customers(
+                customer_ids,
+                lambda customer_id: run_creation(
+                    self.client,
+                    customer_id,
+                    options["customizer_attribute_name"],
+                    campaign_specs,
+                    atomic=options["atomic"],
+                    chunk_size=options["chunk_size"],
+                    use_batch_job=options["batch_job"],
+                    journal=journal,
+                    geo_resolver=self.geo_resolver,
+                    partial_failure=options["partial_failure"],
+                    rejected_log=rejected_log,
+                    reuse_existing=True,
+                    entity_index_cache=self.entity_index_cache,
+                ),
+                options["max_workers"],
+            )
+        finally:
+            journal.close()
+        failed = [cid for cid, outcome in customers.items() if outcome["status"] != "success"]
+        return {
+            "status": "failed" if failed else "success",
+            "error": f"{len(failed)} 个客户账号失败" if failed else None,
+            "customers": customers,
+            "rejected_operations": rejected_log.count if rejected_log else 0,
+        }
+
+    def serve(self, once=False):
+        """
+        持续认领并执行任务，直到 stop() 被调用
+
+        Args:
+            once: 为 True 时处理完 incoming/ 中现有的任务后返回
+        """
+        self.recover()
+        log_message(
+            f"守护进程开始监视 {self._path('incoming')}，最大并发任务数 {self.max_workers}"
+        )
+        while not self._stop.is_set():
+            self._wake.clear()
+            claimed = self.poll()
+            with self._lock:
+                idle = self._in_flight == 0
+            if once and not claimed and idle and not self.pending_jobs():
+                break
+            self._wake.wait(self.poll_interval)
+        self.close()
+
+    def stop(self):
+        """停止认领新任务；正在执行的任务会执行完"""
+        self._stop.set()
+        self._wake.set()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._spool_lock is not None:
+            self._spool_lock.close()
+            self._spool_lock = None
+        log_message(f"守护进程退出：完成 {self.completed} 个任务，失败 {self.failed} 个")
+
+
+def build_daemon_client(args):
+    """
+    构建所有任务共享的客户端（与主脚本多账号模式的包装方式相同）
+
+    Returns:
+        (客户端, 是否需要预热连接)；返回前已在当前线程导入全部 API 类型
+    """
+    from multi_customer import SharedServiceClient, preload_api_types
+    from retry_policy import RetryingClient, RetryPolicy, request_timeout
+
+    if args.mock:
+        from fake_ads_client import FakeGoogleAdsClient, LatencyModel
+        log_message("⚠️ 使用模拟模式 - 不会实际连接到 Google Ads API ⚠️")
+        client = FakeGoogleAdsClient(LatencyModel(args.mock_latency_ms))
+        preload_api_types(client)
+        return client, False
+
+    from ads_config import build_client, load_config
+    from request_scheduler import rate_limited
+    from rpc_metrics import instrumented
+    yaml_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "google-ads.yaml"
+    )
+    config = load_config(yaml_path, proxy=args.proxy)
+    client = RetryingClient(
+        rate_limited(
+            instrumented(SharedServiceClient(build_client(config)), config), config
+        ),
+        RetryPolicy(
+            max_attempts=args.retries + 1,
+            initial_delay=args.retry_interval,
+            max_delay=args.max_retry_delay,
+        ),
+        request_timeout(config),
+    )
+    preload_api_types(client)
+    return client, True
+
+
+def build_shared_caches(args, mock_dir):
+    """
+    构建所有任务共享的步骤日志路径、地理目标解析器和实体索引缓存
+
+    模拟模式下替身账号的资源名称不能写入真实的缓存和步骤日志：不使用缓存，
+    步骤日志保存在 mock_dir 中。
+
+    Returns:
+        (步骤日志路径, CachedGeoTargetResolver, EntityIndexCache 或 None)
+    """
+    from geo_target_cache import CachedGeoTargetResolver, GeoTargetCache
+
+    journal_file = args.journal_file
+    if args.mock:
+        journal_file = journal_file or os.path.join(mock_dir, "mock_journal.sqlite3")
+    geo_cache = None
+    if args.geo_cache_ttl_days > 0 and not args.mock:
+        geo_cache = GeoTargetCache(
+            args.geo_cache_file or os.path.join(SAVE_PATH, "geo_target_cache.sqlite3"),
+            ttl=args.geo_cache_ttl_days * 24 * 60 * 60,
+        )
+    entity_index_cache = None
+    if args.entity_index_ttl_minutes > 0 and not args.mock:
+        from entity_index import EntityIndexCache
+        entity_index_cache = EntityIndexCache(
+            args.entity_index_file or os.path.join(SAVE_PATH, "entity_index.sqlite3"),
+            ttl=args.entity_index_ttl_minutes * 60,
+        )
+    return journal_file, CachedGeoTargetResolver(geo_cache), entity_index_cache
+
+
+def add_client_arguments(parser):
+    """共享客户端、重试和缓存相关的参数（jsonl_ingest.py 也使用）"""
+    parser.add_argument("--proxy", help="HTTP代理，格式为 http://host:port")
+    parser.add_argument("--retries", type=int, default=3, help="单个调用的最大重试次数")
+    parser.add_argument("--retry_interval", type=float, default=5, help="首次重试的退避上限（秒）")
+    parser.add_argument("--max_retry_delay", type=float, default=60, help="单次重试退避的最大值（秒）")
+    parser.add_argument("--journal_file", help="步骤日志 SQLite 文件路径")
+    parser.add_argument("--geo_cache_file", help="地理目标常量缓存 SQLite 文件路径")
+    parser.add_argument("--geo_cache_ttl_days", type=float, default=30, help="地理目标常量缓存有效期（天）")
+    parser.add_argument("--entity_index_file", help="已有实体索引的 SQLite 缓存文件路径")
+    parser.add_argument(
+        "--entity_index_ttl_minutes", type=float, default=60, help="已有实体索引缓存有效期（分钟）"
+    )
+    parser.add_argument(
+        "--log_level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="日志级别"
+    )
+    parser.add_argument("--mock", action="store_true", help="使用进程内替身客户端，不连接 API")
+    parser.add_argument("--mock_latency_ms", type=float, default=150, help="模拟模式下每次调用的延迟（毫秒）")
+
+
+def serve_command(args):
+    from multi_customer import read_customer_ids
+
+    os.makedirs(SAVE_PATH, exist_ok=True)
+    get_logger(LOG_FILE, level=args.log_level)
+    client, needs_warm_up = build_daemon_client(args)
+    if needs_warm_up and not args.no_warm_up:
+        warm_up(client)
+    journal_file, geo_resolver, entity_index_cache = build_shared_caches(
+        args, args.spool_dir
+    )
+
+    daemon = CreationDaemon(
+        client,
+        args.spool_dir,
+        customer_ids=read_customer_ids(args.customer_ids, args.customer_file),
+        max_workers=args.max_workers,
+        poll_interval=args.poll_interval,
+        journal_file=journal_file,
+        geo_resolver=geo_resolver,
+        entity_index_cache=entity_index_cache,
+        job_defaults={
+            "customizer_attribute_name": args.customizer_attribute_name,
+            "chunk_size": args.chunk_size,
+            "partial_failure": args.partial_failure,
+        },
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+    daemon.serve(once=args.once)
+    return 1 if daemon.failed else 0
+
+
+def submit_command(args):
+    from multi_customer import read_customer_ids
+
+    job = {}
+    customer_ids = read_customer_ids(args.customer_ids, args.customer_file)
+    if customer_ids:
+        job["customer_ids"] = customer_ids
+    if args.spec:
+        from campaign_spec import read_raw_specs
+        job["defaults"], job["campaigns"] = read_raw_specs(args.spec)
+    for key in JOB_OPTIONS:
+        value = getattr(args, key)
+        if value is not None:
+            job[key] = value
+
+    job_id = submit_job(args.spool_dir, job)
+    print(job_id)
+    if not args.wait:
+        return 0
+    result = wait_for_result(args.spool_dir, job_id, args.wait_timeout)
+    if result is None:
+        print(f"等待任务 {job_id} 超时")
+        return 1
+    for customer_id, outcome in result["customers"].items():
+        line = f"{customer_id}: {outcome['status']} ({outcome['elapsed']:.2f} 秒)"
+        if outcome["error"]:
+            line += f" - {outcome['error']}"
+        print(line)
+    print(f"任务 {job_id}: {result['status']}，耗时 {result['elapsed']:.2f} 秒")
+    if result["error"]:
+        print(result["error"])
+    return 0 if result["status"] == "success" else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="常驻的广告创建守护进程及任务提交")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="运行守护进程")
+    submit_parser = subparsers.add_parser("submit", help="向假脱机目录提交任务")
+    for command_parser in (serve_parser, submit_parser):
+        command_parser.add_argument(
+            "--spool_dir", default=DEFAULT_SPOOL_DIR, help="假脱机目录"
+        )
+        command_parser.add_argument(
+            "-c", "--customer_ids", help="逗号分隔的客户ID（serve 时为任务的默认客户ID）"
+        )
+        command_parser.add_argument("--customer_file", help="每行一个客户ID的文件")
+
+    serve_parser.add_argument("--max_workers", type=int, default=4, help="同时执行的最大任务数")
+    serve_parser.add_argument("--poll_interval", type=float, default=0.5, help="扫描间隔（秒）")
+    serve_parser.add_argument("--once", action="store_true", help="处理完现有任务后退出")
+    serve_parser.add_argument("--no_warm_up", action="store_true", help="启动时不预热客户端")
+    serve_parser.add_argument(
+        "-n", "--customizer_attribute_name", default="BelkSalePrice",
+        help="任务未指定时使用的自定义属性名称"
+    )
+    serve_parser.add_argument("--chunk_size", type=int, default=10000, help="每个 Mutate 请求的最大操作数")
+    serve_parser.add_argument("--partial_failure", action="store_true", help="任务默认以部分失败模式提交")
+    add_client_arguments(serve_parser)
+
+    submit_parser.add_argument("spec", nargs="?", help="YAML/JSONL 规格文件（不提供时创建默认广告系列）")
+    submit_parser.add_argument("-n", "--customizer_attribute_name", help="自定义属性名称")
+    submit_parser.add_argument("--atomic", action="store_true", default=None, help="一次 Mutate 原子创建")
+    submit_parser.add_argument("--chunk_size", type=int, help="每个 Mutate 请求的最大操作数")
+    submit_parser.add_argument("--batch_job", action="store_true", default=None, help="通过 BatchJobService 提交关键词和地理定位")
+    submit_parser.add_argument("--partial_failure", action="store_true", default=None, help="以部分失败模式提交")
+    submit_parser.add_argument("--max_workers", type=int, help="任务内并发的客户账号数")
+    submit_parser.add_argument("--wait", action="store_true", help="等待任务完成并输出结果")
+    submit_parser.add_argument("--wait_timeout", type=float, help="等待的最长时间（秒）")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            sys.exit(serve_command(args))
+        except Exception as e:
+            log_message(f"守护进程无法启动: {str(e)}", "ERROR")
+            sys.exit(1)
+    sys.exit(submit_command(args))
@@ -0,0 +1,666 @@
+#!/usr/bin/env python
+"""
+价格自定义器数据源的增量加载
+
+link_customizer_attribute_to_customer 只为 BelkSalePrice 设置一个写死的
+客户级值。这里读取 Belk 每日价格数据源（CSV，或安装 pyarrow 后读取
+Parquet，约 100 万行），为每个广告组或关键词设置自己的自定义器值。
+
+每个 (目标, 自定义属性) 的值取 blake2b 摘要，与本地 SQLite 快照中上次
+上传的摘要比较，只为变化的值发送 AdGroupCustomizer /
+AdGroupCriterionCustomizer 操作：新值创建，变化的值在同一个请求中先删除
+再创建（这两种资源不支持 update），数据源中不再出现的值删除。每天的刷新
+通常只涉及几千行，而不是重新上传一百万行。
+
+数据源列:
+    ad_group_id   广告组ID（必需）
+    criterion_id  关键词的标准ID；为空时值设置在广告组上
+    attribute     自定义属性名称（可选，默认 --customizer_attribute_name）
+    value         自定义器的值，例如 "$19.99"；为空时视为删除
+
+快照第一次使用（或 --refresh_snapshot）时从账号读取现有的自定义器值建立，
+之后每个请求成功后立即更新，中断后重新运行只提交剩余的变化。
+
+用法:
+    python customizer_feed.py belk_prices.csv -c 1234567890 --dry_run
+    python customizer_feed.py belk_prices.parquet -c 1234567890 --partial_failure
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import operator
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from belk_search_ads_creator import create_customizer_attribute, log_message
+from bulk_creator import (
+    MAX_OPERATIONS_PER_REQUEST,
+    MAX_REQUEST_BYTES,
+    OPERATION_OVERHEAD_BYTES,
+)
+from entity_index import EntityIndex
+from operation_factory import get_operation_factory, to_pb
+from partial_failure import handle_partial_failure
+
+# 默认的自定义属性名称，与广告描述中的占位符一致
+DEFAULT_ATTRIBUTE_NAME = "BelkSalePrice"
+
+# 数据源的列名和每批读取的行数
+FEED_COLUMNS = ("ad_group_id", "criterion_id", "attribute", "value")
+FEED_BATCH_SIZE = 10000
+
+# 值摘要长度（字节）；只用于判断同一目标的值是否变化
+DIGEST_SIZE = 8
+
+# 目标类型 → (MutateOperation 中的字段, 操作类型, 自定义器中引用目标的字段)
+CUSTOMIZER_TYPES = {
+    "ad_group": (
+        "ad_group_customizer_operation", "AdGroupCustomizerOperation",
+        "ad_group",
+    ),
+    "ad_group_criterion": (
+        "ad_group_criterion_customizer_operation",
+        "AdGroupCriterionCustomizerOperation", "ad_group_criterion",
+    ),
+}
+
+
+class CustomizerFeedError(ValueError):
+    """价格数据源无效"""
+
+
+def value_digest(value):
+    """返回自定义器值的摘要"""
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def _target_type(target):
+    """根据资源名称判断目标是广告组还是关键词"""
+    return "ad_group_criterion" if "/adGroupCriteria/" in target else "ad_group"
+
+
+def read_feed(path, default_attribute, batch_size=FEED_BATCH_SIZE):
+    """
+    流式读取价格数据源，每次生成一批 (广告组ID, 标准ID, 属性名称, 值) 元组列表
+
+    .parquet 文件需要安装 pyarrow，只读取需要的列；其他文件按 CSV 读取。
+    缺少的可选列按空值处理。
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise CustomizerFeedError(
+                "读取 Parquet 数据源需要安装 pyarrow: pip install pyarrow"
+            ) from e
+        parquet_file = pq.ParquetFile(path)
+        columns = _feed_columns(path, parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield _normalize_columns(
+                {column: batch.column(column).to_pylist() for column in columns},
+                batch.num_rows, default_attribute,
+            )
+        return
+
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        columns = _feed_columns(path, header)
+        indexes = [header.index(column) for column in columns]
+        get_values = operator.itemgetter(*indexes)
+        while True:
+            rows = list(itertools.islice(reader, batch_size))
+            if not rows:
+                break
+            try:
+                values = list(map(get_values, rows))
+            except IndexError:
+                # 存在缺列的行时逐行读取，缺失的值按空字符串处理
+                values = [
+                    tuple(row[index] if index < len(row) else "" for index in indexes)
+                    for row in rows
+                ]
+            yield _normalize_columns(
+                dict(zip(columns, zip(*values))), len(rows), default_attribute
+            )
+
+
+def _feed_columns(path, names):
+    """返回数据源中存在的列（FEED_COLUMNS 的顺序），缺少必需列时报错"""
+    missing = {"ad_group_id", "value"} - set(names)
+    if missing:
+        raise CustomizerFeedError(f"{path} 缺少列: {', '.join(sorted(missing))}")
+    return [column for column in FEED_COLUMNS if column in names]
+
+
+def _normalize_columns(columns, size, default_attribute):
+    """按列规范化一批值，返回元组列表；缺少广告组ID的行被丢弃"""
+    empty = [None] * size
+    ad_group_ids, criterion_ids, attributes, values = (
+        ["" if value is None else str(value).strip() for value in columns.get(column, empty)]
+        for column in FEED_COLUMNS
+    )
+    attributes = [attribute or default_attribute for attribute in attributes]
+    return [
+        row
+        for row in zip(ad_group_ids, criterion_ids, attributes, values)
+        if row[0]
+    ]
+
+
+class CustomizerSnapshot:
+    """
+    上次上传的自定义器值的 SQLite 快照
+
+    按 (客户ID, 目标资源名称, 自定义属性名称) 记录值的摘要和自定义器的
+    资源名称。比较在 SQLite 中完成：数据源先写入临时表，再用连接查询找出
+    变化和删除的值，内存占用与数据源行数无关。
+
+    Args:
+        path: SQLite 数据库文件路径
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # 数据源临时表只在本次运行中使用，放在内存中
+        self._connection.execute("PRAGMA temp_store = MEMORY")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS customizer_snapshot_loads ("
+                " customer_id TEXT PRIMARY KEY,"
+                " loaded_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS customizer_snapshot ("
+                " customer_id TEXT NOT NULL,"
+                " target TEXT NOT NULL,"
+                " attribute TEXT NOT NULL,"
+                " digest BLOB NOT NULL,"
+                " resource_name TEXT NOT NULL,"
+                " PRIMARY KEY (customer_id, target, attribute))"
+            )
+
+    def loaded(self, customer_id):
+        """快照是否已经从账号建立过"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM customizer_snapshot_loads WHERE customer_id = ?",
+                (customer_id,),
+            ).fetchone() is not None
+
+    def replace(self, customer_id, entries):
+        """用账号中现有的值替换快照；entries 为 (目标, 属性, 值, 资源名称) 的可迭代对象"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM customizer_snapshot WHERE customer_id = ?",
+                (customer_id,),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO customizer_snapshot"
+                " (customer_id, target, attribute, digest, resource_name)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    (customer_id, target, attribute, value_digest(value), resource_name)
+                    for target, attribute, value, resource_name in entries
+                ),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO customizer_snapshot_loads"
+                " (customer_id, loaded_at) VALUES (?, ?)",
+                (customer_id, time.time()),
+            )
+
+    def stage(self, rows):
+        """
+        把数据源写入临时表；同一目标和属性出现多次时以最后一行为准
+
+        rows 为批次的可迭代对象，每批是 (目标资源名称, 属性名称, 值) 列表。
+        返回写入的行数。
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DROP TABLE IF EXISTS temp.feed")
+            self._connection.execute(
+                "CREATE TEMP TABLE feed ("
+                " target TEXT NOT NULL,"
+                " attribute TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " digest BLOB NOT NULL,"
+                " PRIMARY KEY (target, attribute))"
+            )
+            staged = 0
+            for batch in rows:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO temp.feed"
+                    " (target, attribute, value, digest) VALUES (?, ?, ?, ?)",
+                    (
+                        (target, attribute, value, value_digest(value))
+                        for target, attribute, value in batch
+                    ),
+                )
+                staged += len(batch)
+            return staged
+
+    def changes(self, customer_id, remove_missing=True):
+        """
+        比较临时表与快照，把变化写入临时表 changes，返回变化的数量
+
+        每个变化为 (目标, 属性, 新值, 快照中的资源名称)：新值为 None 表示
+        删除，资源名称为 None 表示新建。
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DROP TABLE IF EXISTS temp.changes")
+            self._connection.execute(
+                "CREATE TEMP TABLE changes AS"
+                " SELECT f.target, f.attribute, f.value, s.resource_name"
+                " FROM temp.feed f LEFT JOIN customizer_snapshot s"
+                " ON s.customer_id = ? AND s.target = f.target"
+                " AND s.attribute = f.attribute"
+                " WHERE f.value != '' AND (s.digest IS NULL OR s.digest != f.digest)",
+                (customer_id,),
+            )
+            if remove_missing:
+                self._connection.execute(
+                    "INSERT INTO temp.changes"
+                    " SELECT s.target, s.attribute, NULL, s.resource_name"
+                    " FROM customizer_snapshot s WHERE s.customer_id = ?"
+                    " AND NOT EXISTS (SELECT 1 FROM temp.feed f"
+                    " WHERE f.target = s.target AND f.attribute = s.attribute"
+                    " AND f.value != '')",
+                    (customer_id,),
+                )
+            else:
+                # 只删除数据源中明确给出空值的目标
+                self._connection.execute(
+                    "INSERT INTO temp.changes"
+                    " SELECT s.target, s.attribute, NULL, s.resource_name"
+                    " FROM customizer_snapshot s JOIN temp.feed f"
+                    " ON f.target = s.target AND f.attribute = s.attribute"
+                    " WHERE s.customer_id = ? AND f.value = ''",
+                    (customer_id,),
+                )
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM temp.changes"
+            ).fetchone()[0]
+
+    def iter_changes(self, batch_size=FEED_BATCH_SIZE):
+        """按批读取 changes 临时表，读取期间可以更新快照"""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT rowid, target, attribute, value, resource_name"
+                    " FROM temp.changes WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def record(self, customer_id, uploaded, removed):
+        """
+        记录一个请求的结果
+
+        Args:
+            uploaded: [(目标, 属性, 值, 新资源名称), ...]
+            removed: [(目标, 属性), ...]
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM customizer_snapshot"
+                " WHERE customer_id = ? AND target = ? AND attribute = ?",
+                ((customer_id, target, attribute) for target, attribute in removed),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO customizer_snapshot"
+                " (customer_id, target, attribute, digest, resource_name)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    (customer_id, target, attribute, value_digest(value), resource_name)
+                    for target, attribute, value, resource_name in uploaded
+                ),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def fetch_account_customizers(client, customer_id):
+    """
+    读取账号中现有的广告组和关键词自定义器值
+
+    生成 (目标资源名称, 属性名称, 值, 自定义器资源名称)。
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    for resource, target_field in (
+        ("ad_group_customizer", "ad_group"),
+        ("ad_group_criterion_customizer", "ad_group_criterion"),
+    ):
+        query = (
+            f"SELECT {resource}.resource_name, {resource}.{target_field},"
+            f" {resource}.value.string_value, customizer_attribute.name"
+            f" FROM {resource} WHERE {resource}.status != 'REMOVED'"
+        )
+        for batch in googleads_service.search_stream(
+            customer_id=customer_id, query=query
+        ):
+            for row in to_pb(batch).results:
+                customizer = getattr(row, resource)
+                yield (
+                    getattr(customizer, target_field),
+                    row.customizer_attribute.name,
+                    customizer.value.string_value,
+                    customizer.resource_name,
+                )
+
+
+class CustomizerFeedLoader:
+    """
+    把价格数据源中变化的值上传为广告组/关键词自定义器
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        snapshot: CustomizerSnapshot 实例
+        chunk_size: 每个 Mutate 请求的最大操作数
+        partial_failure: 是否以部分失败模式提交；被拒绝的值不记入快照，下次重新提交
+        rejected_log: partial_failure.RejectedOperationLog 实例（可选）
+    """
+
+    def __init__(
+        self, client, customer_id, snapshot, chunk_size=MAX_OPERATIONS_PER_REQUEST,
+        partial_failure=False, rejected_log=None
+    ):
+        self.client = client
+        self.customer_id = customer_id.replace("-", "")
+        self.snapshot = snapshot
+        self.chunk_size = chunk_size
+        self.partial_failure = partial_failure
+        self.rejected_log = rejected_log
+        self.stats = {
+            "rows": 0, "changes": 0, "created": 0, "removed": 0,
+            "rejected": 0, "requests": 0, "operations": 0,
+        }
+        self._googleads_service = client.get_service("GoogleAdsService")
+        self._operation_factory = get_operation_factory(client)
+        self._price_type = self._operation_factory.enum_value(
+            "CustomizerAttributeTypeEnum", "PRICE"
+        )
+        self._entity_index = EntityIndex(client, self.customer_id)
+        # 每行都要构建目标资源名称，直接拼接前缀而不是逐行调用路径方法
+        self._ad_group_prefix = f"customers/{self.customer_id}/adGroups/"
+        self._criterion_prefix = f"customers/{self.customer_id}/adGroupCriteria/"
+        self._attributes = {}
+
+    def attribute_resource_name(self, attribute):
+        """返回自定义属性的资源名称，不存在时创建（类型为 PRICE）"""
+        resource_name = self._attributes.get(attribute)
+        if resource_name is None:
+            resource_name = create_customizer_attribute(
+                self.client, self.customer_id, attribute, self._entity_index
+            )
+            self._attributes[attribute] = resource_name
+        return resource_name
+
+    def target_resource_name(self, ad_group_id, criterion_id):
+        """返回广告组或关键词的资源名称（与 ad_group_path 等路径方法的格式一致）"""
+        if criterion_id:
+            return f"{self._criterion_prefix}{ad_group_id}~{criterion_id}"
+        return f"{self._ad_group_prefix}{ad_group_id}"
+
+    def refresh_snapshot(self):
+        """从账号中现有的自定义器值重建快照"""
+        entries = list(fetch_account_customizers(self.client, self.customer_id))
+        self.snapshot.replace(self.customer_id, entries)
+        log_message(f"从账号建立了快照: {len(entries)} 个现有的自定义器值")
+
+    def _staged_rows(self, batches):
+        ad_group_prefix = self._ad_group_prefix
+        criterion_prefix = self._criterion_prefix
+        for batch in batches:
+            self.stats["rows"] += len(batch)
+            yield [
+                (
+                    f"{criterion_prefix}{ad_group_id}~{criterion_id}"
+                    if criterion_id
+                    else f"{ad_group_prefix}{ad_group_id}",
+                    attribute,
+                    value,
+                )
+                for ad_group_id, criterion_id, attribute, value in batch
+            ]
+
+    def plan(self, batches, remove_missing=True):
+        """写入数据源并与快照比较，返回需要提交的变化数量"""
+        self.snapshot.stage(self._staged_rows(batches))
+        self.stats["changes"] = self.snapshot.changes(self.customer_id, remove_missing)
+        log_message(
+            f"数据源共 {self.stats['rows']} 行，{self.stats['changes']} 个值需要更新"
+        )
+        return self.stats["changes"]
+
+    def _operations(self, target, attribute, value, resource_name):
+        """返回一个变化对应的 [(操作字段, 原生 protobuf 操作), ...]"""
+        operation_field, operation_type, target_field = CUSTOMIZER_TYPES[
+            _target_type(target)
+        ]
+        operation_class = self._operation_factory.pb_type(operation_type)
+        operations = []
+        if resource_name:
+            remove = operation_class()
+            remove.remove = resource_name
+            operations.append((operation_field, remove))
+        if value is not None:
+            create = operation_class()
+            customizer = create.create
+            setattr(customizer, target_field, target)
+            customizer.customizer_attribute = self.attribute_resource_name(attribute)
+            customizer.value.type_ = self._price_type
+            customizer.value.string_value = value
+            operations.append((operation_field, create))
+        return operations
+
+    def _chunks(self):
+        """把变化分成请求；同一目标的删除和创建始终在同一个请求中"""
+        chunk, size, byte_size = [], 0, 0
+        for changes in self.snapshot.iter_changes():
+            for change in changes:
+                operations = self._operations(*change)
+                operations_bytes = sum(
+                    operation.ByteSize() + OPERATION_OVERHEAD_BYTES
+                    for _, operation in operations
+                )
+                if chunk and (
+                    size + len(operations) > self.chunk_size
+                    or byte_size + operations_bytes > MAX_REQUEST_BYTES
+                ):
+                    yield chunk
+                    chunk, size, byte_size = [], 0, 0
+                chunk.append((change, operations))
+                size += len(operations)
+                byte_size += operations_bytes
+        if chunk:
+            yield chunk
+
+    def _submit(self, chunk):
+        mutate_operations = [
+            self._operation_factory.mutate_operation(operation_field, operation)
+            for _, operations in chunk
+            for operation_field, operation in operations
+        ]
+        response = self._googleads_service.mutate(
+            request=self._operation_factory.mutate_request(
+                "MutateGoogleAdsRequest", self.customer_id, mutate_operations,
+                self.partial_failure, operations_field="mutate_operations",
+            )
+        )
+        rejected = set()
+        if self.partial_failure:
+            rejected = handle_partial_failure(
+                self.client, self.customer_id, "mutate_operation", response,
+                mutate_operations, self.rejected_log,
+            )
+        responses = to_pb(response).mutate_operation_responses
+
+        uploaded, removed = [], []
+        index = 0
+        for (target, attribute, value, resource_name), operations in chunk:
+            removed_ok = bool(resource_name) and index not in rejected
+            if resource_name:
+                index += 1
+            if value is not None:
+                if index in rejected:
+                    # 新值被拒绝；旧值已经删除时快照中也删除，下次重新创建
+                    if removed_ok:
+                        removed.append((target, attribute))
+                else:
+                    result = responses[index]
+                    uploaded.append((
+                        target, attribute, value,
+                        getattr(result, result.WhichOneof("response")).resource_name,
+                    ))
+                index += 1
+            elif removed_ok:
+                removed.append((target, attribute))
+                self.stats["removed"] += 1
+        self.snapshot.record(self.customer_id, uploaded, removed)
+
+        self.stats["requests"] += 1
+        self.stats["operations"] += len(mutate_operations)
+        self.stats["rejected"] += len(rejected)
+        self.stats["created"] += len(uploaded)
+        log_message(
+            f"提交了 {len(mutate_operations)} 个自定义器操作，"
+            f"累计 {self.stats['operations']} 个"
+        )
+
+    def apply(self):
+        """提交所有变化，返回统计字典"""
+        for chunk in self._chunks():
+            self._submit(chunk)
+        return self.stats
+
+
+def load_customizer_feed(
+    client, customer_id, feed_path, snapshot,
+    default_attribute=DEFAULT_ATTRIBUTE_NAME,
+    chunk_size=MAX_OPERATIONS_PER_REQUEST, partial_failure=False,
+    rejected_log=None, remove_missing=True, refresh_snapshot=False,
+    dry_run=False
+):
+    """
+    加载价格数据源，只上传相对于快照变化的自定义器值
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        feed_path: 价格数据源路径（CSV 或 Parquet）
+        snapshot: CustomizerSnapshot 实例
+        default_attribute: 数据源中没有 attribute 列时使用的自定义属性名称
+        chunk_size: 每个 Mutate 请求的最大操作数
+        partial_failure: 是否以部分失败模式提交
+        rejected_log: partial_failure.RejectedOperationLog 实例（可选）
+        remove_missing: 是否删除数据源中不再出现的值
+        refresh_snapshot: 是否先从账号重建快照
+        dry_run: 只比较并记录需要更新的数量，不提交
+
+    Returns:
+        统计字典
+    """
+    loader = CustomizerFeedLoader(
+        client, customer_id, snapshot, chunk_size, partial_failure, rejected_log
+    )
+    if refresh_snapshot or not snapshot.loaded(loader.customer_id):
+        loader.refresh_snapshot()
+    loader.plan(read_feed(feed_path, default_attribute), remove_missing)
+    if dry_run or not loader.stats["changes"]:
+        return loader.stats
+    stats = loader.apply()
+    log_message(
+        f"价格自定义器更新完成: 设置 {stats['created']} 个值，"
+        f"删除 {stats['removed']} 个值，{stats['requests']} 个请求"
+        + (f"，{stats['rejected']} 个操作被拒绝" if stats["rejected"] else "")
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    from belk_search_ads_creator import SAVE_PATH
+
+    parser = argparse.ArgumentParser(
+        description="增量加载价格数据源，只上传变化的广告组/关键词自定义器值"
+    )
+    parser.add_argument("feed", help="价格数据源（CSV 或 Parquet）")
+    parser.add_argument("-c", "--customer_id", default="278-639-3017", help="Google Ads客户ID")
+    parser.add_argument(
+        "-n", "--customizer_attribute_name", default=DEFAULT_ATTRIBUTE_NAME,
+        help="数据源中没有 attribute 列时使用的自定义属性名称",
+    )
+    parser.add_argument(
+        "--snapshot_file",
+        help="快照 SQLite 文件（默认保存在日志目录下的 customizer_snapshot.sqlite3）",
+    )
+    parser.add_argument(
+        "--refresh_snapshot", action="store_true",
+        help="先从账号中现有的自定义器值重建快照",
+    )
+    parser.add_argument(
+        "--keep_missing", action="store_true",
+        help="不删除数据源中不再出现的值（只删除值为空的行）",
+    )
+    parser.add_argument("--dry_run", action="store_true", help="只统计需要更新的值，不提交")
+    parser.add_argument(
+        "--chunk_size", type=int, default=MAX_OPERATIONS_PER_REQUEST,
+        help="每个 Mutate 请求的最大操作数",
+    )
+    parser.add_argument(
+        "--partial_failure", action="store_true",
+        help="以部分失败模式提交，被拒绝的操作写入 --rejected_file",
+    )
+    parser.add_argument(
+        "--rejected_file", default="rejected_operations.jsonl",
+        help="记录被拒绝操作的 JSONL 文件",
+    )
+    parser.add_argument("--retries", type=int, default=3, help="单个调用的最大重试次数")
+    args = parser.parse_args()
+
+    from ads_config import build_client, load_config
+    from partial_failure import RejectedOperationLog
+    from request_scheduler import rate_limited
+    from retry_policy import RetryingClient, RetryPolicy, request_timeout
+    from rpc_metrics import instrumented
+    yaml_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "google-ads.yaml"
+    )
+    config = load_config(yaml_path)
+    client = RetryingClient(
+        rate_limited(instrumented(build_client(config), config), config),
+        RetryPolicy(max_attempts=args.retries + 1),
+        request_timeout(config),
+    )
+    os.makedirs(SAVE_PATH, exist_ok=True)
+    snapshot = CustomizerSnapshot(
+        args.snapshot_file or os.path.join(SAVE_PATH, "customizer_snapshot.sqlite3")
+    )
+    try:
+        load_customizer_feed(
+            client, args.customer_id, args.feed, snapshot,
+            args.customizer_attribute_name, args.chunk_size,
+            args.partial_failure,
+            RejectedOperationLog(args.rejected_file) if args.partial_failure else None,
+            remove_missing=not args.keep_missing,
+            refresh_snapshot=args.refresh_snapshot, dry_run=args.dry_run,
+        )
+    except Exception as e:
+        log_message(f"加载价格数据源失败: {e}", "ERROR")
+        sys.exit(1)
+    finally:
+        snapshot.close()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+"""
+已有实体的 名称 → 资源名称 索引（创建或复用）
+
+原来每次运行都用带 uuid4() 后缀的名称创建新的预算、广告系列和广告组，
+重复运行会留下大量重复实体并浪费操作配额；create_customizer_attribute
+在第二次运行时还会因为 "BelkSalePrice" 已存在而失败。现在使用稳定的
+名称，创建前先在索引中查找：已存在的实体直接复用其资源名称，只为缺失的
+实体发送 mutate。
+
+每种实体类型用一个 GAQL 查询（search_stream）加载，只在第一次用到时
+加载；结果缓存到本地 SQLite（EntityIndexCache），有效期内重复运行不再
+查询。失效规则:
+
+1. 超过 TTL 的条目在下次使用时重新查询；
+2. 本次运行创建的实体立即写入索引和缓存；
+3. 只知道数量、不知道资源名称的批量创建（关键词、地理定位、原子请求）
+   完成后使该类型的缓存失效；
+4. 运行失败时使该客户账号的全部缓存失效，下次从账号重新加载。
+
+用法:
+    index = EntityIndex(client, customer_id, EntityIndexCache("entity_index.sqlite3"))
+    main(client, customer_id, entity_index=index)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from belk_search_ads_creator import log_message
+from operation_factory import to_pb
+
+# 缓存默认有效期（秒）：账号结构可能在界面中被修改，不宜缓存太久
+DEFAULT_TTL = 60 * 60
+
+# 实体类型 → (资源字段, FROM 子句, 组成键的字段路径, WHERE 条件, 日志中的名称)
+ENTITY_TYPES = {
+    "customizer_attribute": (
+        "customizer_attribute", "customizer_attribute", ("name",),
+        "customizer_attribute.status != 'REMOVED'", "自定义属性",
+    ),
+    "customer_customizer": (
+        "customer_customizer", "customer_customizer", ("customizer_attribute",),
+        "customer_customizer.status != 'REMOVED'", "客户自定义器",
+    ),
+    "campaign_budget": (
+        "campaign_budget", "campaign_budget", ("name",),
+        "campaign_budget.status != 'REMOVED'", "预算",
+    ),
+    "campaign": (
+        "campaign", "campaign", ("name",),
+        "campaign.status != 'REMOVED'", "广告系列",
+    ),
+    "ad_group": (
+        "ad_group", "ad_group", ("campaign", "name"),
+        "ad_group.status != 'REMOVED'", "广告组",
+    ),
+    # 每个广告组只判断是否已有广告，已有广告的广告组不再创建广告
+    "ad_group_ad": (
+        "ad_group_ad", "ad_group_ad", ("ad_group",),
+        "ad_group_ad.status != 'REMOVED'", "广告",
+    ),
+    "keyword": (
+        "ad_group_criterion", "keyword_view",
+        ("ad_group", "keyword.text", "keyword.match_type"),
+        "ad_group_criterion.status != 'REMOVED'", "关键词",
+    ),
+    "geo_target": (
+        "campaign_criterion", "campaign_criterion",
+        ("campaign", "location.geo_target_constant"),
+        "campaign_criterion.type = LOCATION"
+        " AND campaign_criterion.status != 'REMOVED'",
+        "地理定位",
+    ),
+}
+
+# 不区分大小写比较的字段（Google Ads 中关键词文本不区分大小写）
+_CASE_INSENSITIVE_PATHS = {"keyword.text"}
+
+
+def entity_query(entity_type):
+    """返回加载某种实体类型的 GAQL 查询"""
+    resource_field, resource, key_paths, condition, _ = ENTITY_TYPES[entity_type]
+    fields = ", ".join(
+        f"{resource_field}.{path}" for path in ("resource_name",) + key_paths
+    )
+    return f"SELECT {fields} FROM {resource} WHERE {condition}"
+
+
+def _field_text(message, path):
+    """返回原生 protobuf 消息中字段路径的值的字符串形式，枚举返回名称"""
+    names = path.split(".")
+    for name in names[:-1]:
+        message = getattr(message, name)
+    value = getattr(message, names[-1])
+    field = message.DESCRIPTOR.fields_by_name[names[-1]]
+    if field.enum_type is not None:
+        enum_value = field.enum_type.values_by_number.get(value)
+        return enum_value.name if enum_value is not None else str(value)
+    if path in _CASE_INSENSITIVE_PATHS:
+        return " ".join(value.split()).casefold()
+    return str(value)
+
+
+def entity_key(entity_type, resource):
+    """
+    返回资源（创建操作中的资源或查询结果中的资源）在索引中的键
+
+    键由 ENTITY_TYPES 中的字段组成，例如广告组为 (广告系列资源名称, 名称)，
+    关键词为 (广告组资源名称, 小写文本, 匹配类型名称)。
+    """
+    resource = to_pb(resource)
+    return tuple(
+        _field_text(resource, path) for path in ENTITY_TYPES[entity_type][2]
+    )
+
+
+class EntityIndexCache:
+    """
+    实体索引的 SQLite 缓存，按 (客户ID, 实体类型) 记录加载时间
+
+    Args:
+        path: SQLite 数据库文件路径
+        ttl: 缓存有效期（秒）
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # 多账号模式下多个线程共享同一个连接，由锁串行化访问
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entity_index_loads ("
+                " customer_id TEXT NOT NULL,"
+                " entity_type TEXT NOT NULL,"
+                " loaded_at REAL NOT NULL,"
+                " PRIMARY KEY (customer_id, entity_type))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entity_index ("
+                " customer_id TEXT NOT NULL,"
+                " entity_type TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " resource_name TEXT NOT NULL,"
+                " PRIMARY KEY (customer_id, entity_type, key))"
+            )
+        self.evict_expired()
+
+    def get(self, customer_id, entity_type):
+        """返回 {键: 资源名称}；没有加载过或已过期时返回 None"""
+        with self._lock:
+            loaded = self._connection.execute(
+                "SELECT 1 FROM entity_index_loads"
+                " WHERE customer_id = ? AND entity_type = ? AND loaded_at >= ?",
+                (customer_id, entity_type, time.time() - self.ttl),
+            ).fetchone()
+            if loaded is None:
+                return None
+            rows = self._connection.execute(
+                "SELECT key, resource_name FROM entity_index"
+                " WHERE customer_id = ? AND entity_type = ?",
+                (customer_id, entity_type),
+            ).fetchall()
+        return {tuple(json.loads(key)): resource_name for key, resource_name in rows}
+
+    def put(self, customer_id, entity_type, entries):
+        """用一次完整加载的结果替换某种实体类型的缓存"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM entity_index WHERE customer_id = ? AND entity_type = ?",
+                (customer_id, entity_type),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entity_index"
+                " (customer_id, entity_type, key, resource_name)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (customer_id, entity_type, json.dumps(key), resource_name)
+                    for key, resource_name in entries.items()
+                ],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entity_index_loads"
+                " (customer_id, entity_type, loaded_at) VALUES (?, ?, ?)",
+                (customer_id, entity_type, time.time()),
+            )
+
+    def add(self, customer_id, entity_type, key, resource_name):
+        """加入一个新创建的实体；该类型没有有效缓存时不写入"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entity_index"
+                " (customer_id, entity_type, key, resource_name)"
+                " SELECT ?, ?, ?, ? FROM entity_index_loads"
+                " WHERE customer_id = ? AND entity_type = ?",
+                (
+                    customer_id, entity_type, json.dumps(key), resource_name,
+                    customer_id, entity_type,
+                ),
+            )
+
+    def invalidate(self, customer_id, entity_type=None):
+        """使一个客户账号的某种或全部实体类型的缓存失效"""
+        condition, params = "customer_id = ?", [customer_id]
+        if entity_type is not None:
+            condition += " AND entity_type = ?"
+            params.append(entity_type)
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"DELETE FROM entity_index_loads WHERE {condition}", params
+            )
+            self._connection.execute(
+                f"DELETE FROM entity_index WHERE {condition}", params
+            )
+
+    def evict_expired(self):
+        """删除超过有效期的条目"""
+        with self._lock, self._connection:
+            expired = self._connection.execute(
+                "SELECT customer_id, entity_type FROM entity_index_loads"
+                " WHERE loaded_at < ?",
+                (time.time() - self.ttl,),
+            ).fetchall()
+            self._connection.executemany(
+                "DELETE FROM entity_index WHERE customer_id = ? AND entity_type = ?",
+                expired,
+            )
+            self._connection.executemany(
+                "DELETE FROM entity_index_loads"
+                " WHERE customer_id = ? AND entity_type = ?",
+                expired,
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+class EntityIndex:
+    """
+    一个客户账号中已有实体的索引，按实体类型在第一次使用时加载
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        cache: EntityIndexCache 实例（可选）；不提供时每次运行都查询账号
+    """
+
+    def __init__(self, client, customer_id, cache=None):
+        self.client = client
+        self.customer_id = customer_id.replace("-", "")
+        self.cache = cache
+        self.queries = 0
+        self.reused = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, entity_type):
+        """用一个 GAQL 查询加载某种实体类型，返回 {键: 资源名称}"""
+        resource_field = ENTITY_TYPES[entity_type][0]
+        googleads_service = self.client.get_service("GoogleAdsService")
+        stream = googleads_service.search_stream(
+            customer_id=self.customer_id, query=entity_query(entity_type)
+        )
+        entries = {}
+        for batch in stream:
+            for row in to_pb(batch).results:
+                resource = getattr(row, resource_field)
+                entries.setdefault(
+                    entity_key(entity_type, resource), resource.resource_name
+                )
+        self.queries += 1
+        log_message(
+            f"从账号加载了 {len(entries)} 个已有的{ENTITY_TYPES[entity_type][4]}",
+            "DEBUG",
+        )
+        return entries
+
+    def load(self, entity_type):
+        """返回某种实体类型的 {键: 资源名称}，依次使用内存、本地缓存、GAQL 查询"""
+        with self._lock:
+            entries = self._entries.get(entity_type)
+            if entries is not None:
+                return entries
+            if self.cache is not None:
+                entries = self.cache.get(self.customer_id, entity_type)
+            if entries is None:
+                entries = self._fetch(entity_type)
+                if self.cache is not None:
+                    self.cache.put(self.customer_id, entity_type, entries)
+            self._entries[entity_type] = entries
+            return entries
+
+    def find(self, entity_type, resource):
+        """返回与资源同键的已有实体的资源名称，不存在时返回 None"""
+        return self.load(entity_type).get(entity_key(entity_type, resource))
+
+    def existing(self, entity_type, resource):
+        """与 find 相同，找到时记录复用日志"""
+        resource_name = self.find(entity_type, resource)
+        if resource_name:
+            self.reused += 1
+            log_message(
+                f"复用已有的{ENTITY_TYPES[entity_type][4]}: {resource_name}",
+                resource_name=resource_name,
+            )
+        return resource_name
+
+    def add(self, entity_type, resource, resource_name):
+        """把本次运行创建的实体加入索引和缓存"""
+        key = entity_key(entity_type, resource)
+        with self._lock:
+            # 尚未加载的类型不需要更新，加载时会包含新创建的实体
+            entries = self._entries.get(entity_type)
+            if entries is not None:
+                entries[key] = resource_name
+        if self.cache is not None:
+            self.cache.add(self.customer_id, entity_type, key, resource_name)
+
+    def note_reused(self, entity_type, count):
+        """记录跳过了 count 个已存在的实体"""
+        if count:
+            self.reused += count
+            log_message(
+                f"{count} 个{ENTITY_TYPES[entity_type][4]}已存在，跳过创建"
+            )
+
+    def missing_operations(self, entity_type, operations):
+        """
+        过滤创建操作，只保留索引中不存在的实体（可以是生成器，流式过滤）
+        """
+        entries = self.load(entity_type)
+        skipped = 0
+        for operation in operations:
+            if entity_key(entity_type, to_pb(operation).create) in entries:
+                skipped += 1
+                continue
+            yield operation
+        self.note_reused(entity_type, skipped)
+
+    def invalidate(self, entity_type=None):
+        """使某种或全部实体类型失效，下次使用时重新查询"""
+        with self._lock:
+            if entity_type is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(entity_type, None)
+        if self.cache is not None:
+            self.cache.invalidate(self.customer_id, entity_type)
+
+
+def create_if_missing(entity_index, entity_type, resource, create):
+    """
+    索引中已有同键实体时返回其资源名称，否则调用 create() 创建并加入索引
+
+    entity_index 为 None 时总是创建，与原来的行为一致。
+    """
+    if entity_index is not None:
+        resource_name = entity_index.existing(entity_type, resource)
+        if resource_name:
+            return resource_name
+    resource_name = create()
+    if entity_index is not None and resource_name:
+        entity_index.add(entity_type, resource, resource_name)
+    return resource_name
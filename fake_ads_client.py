@@ -0,0 +1,790 @@
+#!/usr/bin/env python
+"""
+进程内的 GoogleAdsClient 替身
+
+原来的模拟模式只记录固定的字符串，不运行任何真实代码。FakeGoogleAdsClient
+可以直接替换 GoogleAdsClient：get_type、enums、copy_from 使用真实的库，
+get_service 返回的服务在内存中执行 mutate 请求，按与真实 API 相同的规则
+分配资源名称、解析临时资源名称，并返回真实的响应类型，因此 main()、
+main_atomic() 和批量引擎的全部代码都会被执行。GoogleAdsService.search_stream
+在内存中执行简单的 GAQL 查询，返回与真实 API 相同结构的结果行。
+
+每次调用都会记录操作数、请求/响应字节数，并按 LatencyModel 模拟调用延迟，
+结束后由 RunProfile 汇总为运行概况：在接触生产账号之前，先用模拟模式运行
+一遍规格文件，即可得知预计的 RPC 数和耗时。
+
+用法:
+    from fake_ads_client import FakeGoogleAdsClient
+    client = FakeGoogleAdsClient(LatencyModel(base_ms=120))
+    main(client, "1234567890")
+    for line in client.profile.report_lines():
+        print(line)
+"""
+
+import importlib
+import itertools
+import random
+import re
+import threading
+import time
+import zlib
+
+from ads_config import API_VERSION
+from operation_factory import to_pb
+
+# 服务名称 → (types 模块名, 方法名, 操作对应的资源类型)
+MUTATE_SERVICES = {
+    "CampaignBudgetService": (
+        "campaign_budget_service", "MutateCampaignBudgets", "campaign_budget",
+    ),
+    "CampaignService": ("campaign_service", "MutateCampaigns", "campaign"),
+    "AdGroupService": ("ad_group_service", "MutateAdGroups", "ad_group"),
+    "AdGroupAdService": ("ad_group_ad_service", "MutateAdGroupAds", "ad_group_ad"),
+    "AdGroupCriterionService": (
+        "ad_group_criterion_service", "MutateAdGroupCriteria", "ad_group_criterion",
+    ),
+    "CampaignCriterionService": (
+        "campaign_criterion_service", "MutateCampaignCriteria", "campaign_criterion",
+    ),
+    "CustomizerAttributeService": (
+        "customizer_attribute_service", "MutateCustomizerAttributes",
+        "customizer_attribute",
+    ),
+    "CustomerCustomizerService": (
+        "customer_customizer_service", "MutateCustomerCustomizers",
+        "customer_customizer",
+    ),
+    "AdGroupCustomizerService": (
+        "ad_group_customizer_service", "MutateAdGroupCustomizers",
+        "ad_group_customizer",
+    ),
+    "AdGroupCriterionCustomizerService": (
+        "ad_group_criterion_customizer_service",
+        "MutateAdGroupCriterionCustomizers", "ad_group_criterion_customizer",
+    ),
+    # AdService 只支持更新广告内容，广告本身随广告组广告创建
+    "AdService": ("ad_service", "MutateAds", "ad"),
+}
+
+# 资源类型 → (资源名称中的集合名, 引用父资源的字段)；子资源ID为 "父ID~ID"，
+# 引用字段为元组时ID由被引用资源的ID组成（例如 "广告组ID~自定义属性ID"）
+RESOURCE_COLLECTIONS = {
+    "campaign_budget": ("campaignBudgets", None),
+    "campaign": ("campaigns", None),
+    "ad_group": ("adGroups", None),
+    "ad_group_ad": ("adGroupAds", "ad_group"),
+    "ad_group_criterion": ("adGroupCriteria", "ad_group"),
+    "campaign_criterion": ("campaignCriteria", "campaign"),
+    "customizer_attribute": ("customizerAttributes", None),
+    "customer_customizer": ("customerCustomizers", "customizer_attribute"),
+    "ad_group_customizer": (
+        "adGroupCustomizers", ("ad_group", "customizer_attribute"),
+    ),
+    "ad_group_criterion_customizer": (
+        "adGroupCriterionCustomizers",
+        ("ad_group_criterion", "customizer_attribute"),
+    ),
+}
+
+# 资源类型 → {引用的资源类型: 字段}；search_stream 据此填充查询结果行中的关联资源
+RESOURCE_REFERENCES = {
+    "campaign": {"campaign_budget": "campaign_budget"},
+    "ad_group": {"campaign": "campaign"},
+    "ad_group_ad": {"ad_group": "ad_group"},
+    "ad_group_criterion": {"ad_group": "ad_group"},
+    "campaign_criterion": {"campaign": "campaign"},
+    "customer_customizer": {"customizer_attribute": "customizer_attribute"},
+    "ad_group_customizer": {
+        "ad_group": "ad_group", "customizer_attribute": "customizer_attribute",
+    },
+    "ad_group_criterion_customizer": {
+        "ad_group_criterion": "ad_group_criterion",
+        "customizer_attribute": "customizer_attribute",
+    },
+}
+
+# FROM 子句中的视图 → (资源类型, 要求资源中已设置的字段)
+QUERY_VIEWS = {"keyword_view": ("ad_group_criterion", "keyword")}
+
+# search_stream 每个响应的最大行数，与真实 API 一致
+SEARCH_STREAM_BATCH_SIZE = 10000
+
+_GAQL_QUERY = re.compile(
+    r"\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<resource>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+.+?)?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?"
+    r"(?:\s+PARAMETERS\s+.+?)?\s*\Z",
+    re.IGNORECASE | re.DOTALL,
+)
+_GAQL_CONDITION = re.compile(
+    r"\s*(?P<field>[\w.]+)\s+(?P<operator>NOT\s+IN|IN|NOT\s+LIKE|LIKE|!=|=|\w+)"
+    r"\s*(?P<value>.*?)\s*\Z",
+    re.IGNORECASE | re.DOTALL,
+)
+_GAQL_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+# 字面量：单引号或双引号字符串（反斜杠转义），或数字、枚举名
+_GAQL_LITERAL = re.compile(
+    r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"|([^\s,()]+)", re.DOTALL
+)
+_GAQL_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+
+# 服务方法中不发起请求的辅助方法，直接使用真实服务客户端类上的实现
+_LOCAL_METHOD_PREFIXES = ("parse_", "common_")
+_LOCAL_METHOD_SUFFIXES = ("_path",)
+
+
+def types_module(name):
+    """返回服务的 types 模块，例如 "campaign_service" """
+    return importlib.import_module(
+        f"google.ads.googleads.{API_VERSION}.services.types.{name}"
+    )
+
+
+def geo_target_constant_id(name):
+    """位置名称对应的稳定ID，同一名称始终返回相同的ID，便于缓存验证"""
+    return 1000000 + zlib.crc32(name.lower().encode("utf-8")) % 1000000
+
+
+def _gaql_literals(value):
+    """把 GAQL 字面量或 (字面量, ...) 列表转换为字符串列表"""
+    literals = []
+    for match in _GAQL_LITERAL.finditer(value):
+        single, double, bare = match.groups()
+        if bare is not None:
+            literals.append(bare)
+        else:
+            literals.append(_GAQL_ESCAPE.sub(r"\1", single if double is None else double))
+    return literals
+
+
+def _split_conditions(where):
+    """按 AND 拆分 WHERE 子句，忽略引号中的 AND"""
+    conditions = []
+    start = position = 0
+    quote = None
+    while position < len(where):
+        char = where[position]
+        if quote:
+            if char == "\\":
+                position += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        else:
+            match = _GAQL_AND.match(where, position)
+            if match:
+                conditions.append(where[start:position])
+                start = position = match.end()
+                continue
+        position += 1
+    conditions.append(where[start:])
+    return conditions
+
+
+def _gaql_condition(condition):
+    """
+    解析一个 WHERE 条件，返回 (字段路径, 判断函数)；判断函数接收字段值的字符串形式
+
+    segments.* 和 metrics.* 条件被忽略（内存存储没有效果数据），返回 None。
+    """
+    match = _GAQL_CONDITION.match(condition)
+    if match is None:
+        raise NotImplementedError(f"替身客户端无法解析的 GAQL 条件: {condition}")
+    field = match.group("field")
+    if field.startswith(("segments.", "metrics.")):
+        return None
+    operator = " ".join(match.group("operator").upper().split())
+    value = match.group("value")
+    if operator in ("IN", "NOT IN"):
+        values = set(_gaql_literals(value))
+        if operator == "IN":
+            return field, values.__contains__
+        return field, lambda actual: actual not in values
+    literals = _gaql_literals(value)
+    literal = literals[0] if literals else ""
+    if operator == "=":
+        return field, literal.__eq__
+    if operator == "!=":
+        return field, literal.__ne__
+    if operator in ("LIKE", "NOT LIKE"):
+        pattern = re.compile(
+            ".*".join(re.escape(part) for part in literal.split("%")) + r"\Z",
+            re.DOTALL,
+        )
+        if operator == "LIKE":
+            return field, lambda actual: pattern.match(actual) is not None
+        return field, lambda actual: pattern.match(actual) is None
+    raise NotImplementedError(f"替身客户端不支持的 GAQL 运算符: {operator}")
+
+
+def _field_text(message, path):
+    """返回原生 protobuf 消息中字段路径的值的字符串形式，枚举返回名称"""
+    names = path.split(".")
+    for name in names[:-1]:
+        message = getattr(message, name)
+    fields = message.DESCRIPTOR.fields_by_name
+    # 与 Python 关键字或内置名称冲突的字段（例如 type）在消息中带下划线后缀
+    field = fields.get(names[-1]) or fields.get(f"{names[-1]}_")
+    if field is None:
+        raise NotImplementedError(f"替身客户端无法识别的字段: {path}")
+    value = getattr(message, field.name)
+    if field.enum_type is not None:
+        enum_value = field.enum_type.values_by_number.get(value)
+        return enum_value.name if enum_value is not None else str(value)
+    return str(value)
+
+
+def _infer_type(message, oneof_name):
+    """按已设置的 oneof 字段填充 type_（例如 keyword → KEYWORD），与真实 API 一致"""
+    if oneof_name not in message.DESCRIPTOR.oneofs_by_name or message.type_:
+        return
+    kind = message.WhichOneof(oneof_name)
+    enum_type = message.DESCRIPTOR.fields_by_name["type_"].enum_type
+    if kind and kind.upper() in enum_type.values_by_name:
+        message.type_ = enum_type.values_by_name[kind.upper()].number
+
+
+def percentile(sorted_values, fraction):
+    """返回已排序列表的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+class InMemoryAdsStore:
+    """
+    内存中的资源存储，按真实 API 的规则执行 mutate 操作
+
+    新资源的名称为 customers/{客户ID}/{集合}/{ID}，子资源（广告、标准等）的
+    ID 为 "父ID~ID"；同一请求中以负数ID表示的临时资源名称在创建后被替换为
+    真实名称，后续操作中对它们的引用也会被解析。存储的是创建时的资源副本，
+    update 按 update_mask 合并，remove 删除。
+    """
+
+    def __init__(self):
+        self.resources = {}
+        self.created = {}
+        # 广告资源名称 → 所属广告组广告的资源名称（AdService 更新广告时使用）
+        self._ads = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, resource_name):
+        return self.resources.get(resource_name)
+
+    def _create(self, customer_id, resource_type, resource, temporary_names):
+        collection, parent_field = RESOURCE_COLLECTIONS[resource_type]
+        stored = type(resource)()
+        stored.CopyFrom(resource)
+        # 解析对同一请求中临时资源名称的引用，例如广告系列引用的预算
+        for field, value in stored.ListFields():
+            if isinstance(value, str) and value in temporary_names:
+                setattr(stored, field.name, temporary_names[value])
+
+        number = next(self._ids)
+        resource_id = str(number)
+        # 与真实 API 一样填充数字ID，供 GAQL 查询的 *.id 字段使用
+        if "id" in stored.DESCRIPTOR.fields_by_name:
+            stored.id = number
+        elif "criterion_id" in stored.DESCRIPTOR.fields_by_name:
+            stored.criterion_id = number
+        elif resource_type == "ad_group_ad":
+            stored.ad.id = number
+            stored.ad.resource_name = f"customers/{customer_id}/ads/{number}"
+            _infer_type(stored.ad, "ad_data")
+        # 与真实 API 一样根据设置的标准推断标准类型（KEYWORD、LOCATION 等）
+        _infer_type(stored, "criterion")
+        if isinstance(parent_field, tuple):
+            resource_id = "~".join(
+                getattr(stored, field).rsplit("/", 1)[-1] for field in parent_field
+            )
+        elif parent_field:
+            parent = getattr(stored, parent_field)
+            resource_id = f"{parent.rsplit('/', 1)[-1]}~{resource_id}"
+        resource_name = f"customers/{customer_id}/{collection}/{resource_id}"
+        if resource.resource_name:
+            temporary_names[resource.resource_name] = resource_name
+        stored.resource_name = resource_name
+        with self._lock:
+            if resource_name in self.resources:
+                raise ValueError(f"资源已存在: {resource_name}")
+            if resource_type == "ad_group_ad":
+                self._ads[stored.ad.resource_name] = resource_name
+            self.resources[resource_name] = stored
+            self.created[resource_type] = self.created.get(resource_type, 0) + 1
+        return resource_name
+
+    def apply(self, customer_id, resource_type, operation, temporary_names):
+        """执行单个原生 protobuf 操作，返回结果资源名称"""
+        kind = operation.WhichOneof("operation")
+        if kind == "create":
+            return self._create(
+                customer_id, resource_type, operation.create, temporary_names
+            )
+        if kind == "update":
+            resource_name = operation.update.resource_name
+            resource_name = temporary_names.get(resource_name, resource_name)
+            with self._lock:
+                if resource_type == "ad":
+                    owner = self.resources.get(self._ads.get(resource_name))
+                    stored = owner.ad if owner is not None else None
+                else:
+                    stored = self.resources.get(resource_name)
+                if stored is None:
+                    raise ValueError(f"资源不存在: {resource_name}")
+                operation.update_mask.MergeMessage(
+                    operation.update, stored,
+                    replace_message_field=True, replace_repeated_field=True,
+                )
+                stored.resource_name = resource_name
+            return resource_name
+        if kind == "remove":
+            resource_name = temporary_names.get(operation.remove, operation.remove)
+            with self._lock:
+                if self.resources.pop(resource_name, None) is None:
+                    raise ValueError(f"资源不存在: {resource_name}")
+            return resource_name
+        return ""
+
+    def mutate(
+        self, customer_id, resource_type, operations, skip=(), validate_only=False
+    ):
+        """
+        执行某种资源类型的操作列表
+
+        Returns:
+            与操作顺序一致的资源名称列表；跳过的操作和 validate_only 时为空字符串
+        """
+        temporary_names = {}
+        return [
+            ""
+            if index in skip or validate_only
+            else self.apply(customer_id, resource_type, operation, temporary_names)
+            for index, operation in enumerate(operations)
+        ]
+
+    def mutate_google_ads(
+        self, customer_id, mutate_operations, skip=(), validate_only=False
+    ):
+        """
+        执行 GoogleAdsService.Mutate 的操作列表，临时资源名称在整个请求内有效
+
+        Returns:
+            与操作顺序一致的 (资源类型, 资源名称) 列表
+        """
+        temporary_names = {}
+        results = []
+        for index, mutate_operation in enumerate(mutate_operations):
+            operation_field = mutate_operation.WhichOneof("operation")
+            resource_type = operation_field[: -len("_operation")]
+            if index in skip or validate_only:
+                results.append((resource_type, ""))
+                continue
+            results.append((
+                resource_type,
+                self.apply(
+                    customer_id, resource_type,
+                    getattr(mutate_operation, operation_field), temporary_names,
+                ),
+            ))
+        return results
+
+    def _related(self, resource_type, resource, related):
+        """沿引用字段收集关联资源（广告组 → 广告系列 → 预算）"""
+        related[resource_type] = resource
+        for referenced_type, field in RESOURCE_REFERENCES.get(resource_type, {}).items():
+            referenced = self.resources.get(getattr(resource, field))
+            if referenced is not None:
+                self._related(referenced_type, referenced, related)
+        return related
+
+    def search(self, customer_id, query, row_type):
+        """
+        在内存中执行一个 GAQL 查询（只支持本工具用到的子集）
+
+        支持 SELECT ... FROM 资源/keyword_view [WHERE 条件 AND ...] [LIMIT n]；
+        条件支持 =、!=、IN、NOT IN、LIKE、NOT LIKE，segments.* 和 metrics.*
+        条件被忽略。结果行只包含选择的字段。
+
+        Returns:
+            (选择的字段路径列表, 原生 protobuf GoogleAdsRow 列表)
+        """
+        from google.protobuf import field_mask_pb2
+
+        match = _GAQL_QUERY.match(query)
+        if match is None:
+            raise NotImplementedError(f"替身客户端无法解析的 GAQL 查询: {query}")
+        paths = [path.strip() for path in match.group("fields").split(",")]
+        resource = match.group("resource")
+        resource_type, required_field = QUERY_VIEWS.get(resource, (resource, None))
+        if resource_type not in RESOURCE_COLLECTIONS:
+            raise NotImplementedError(f"替身客户端不支持查询 {resource}")
+        conditions = []
+        if match.group("where"):
+            for condition in _split_conditions(match.group("where")):
+                parsed = _gaql_condition(condition)
+                if parsed is not None:
+                    conditions.append(parsed)
+        limit = int(match.group("limit")) if match.group("limit") else None
+        # 结果行只保留选择的资源字段，segments/metrics 保持默认值
+        selected = field_mask_pb2.FieldMask(
+            paths=[
+                path for path in paths
+                if not path.startswith(("segments.", "metrics."))
+            ]
+        )
+
+        prefix = f"customers/{customer_id}/{RESOURCE_COLLECTIONS[resource_type][0]}/"
+        with self._lock:
+            candidates = [
+                stored for name, stored in self.resources.items()
+                if name.startswith(prefix)
+                and (required_field is None or stored.HasField(required_field))
+            ]
+            rows = []
+            for stored in candidates:
+                full_row = row_type()
+                for related_type, related in self._related(
+                    resource_type, stored, {}
+                ).items():
+                    getattr(full_row, related_type).CopyFrom(related)
+                full_row.customer.id = int(customer_id)
+                full_row.customer.resource_name = f"customers/{customer_id}"
+                if not all(
+                    test(_field_text(full_row, path)) for path, test in conditions
+                ):
+                    continue
+                row = row_type()
+                selected.MergeMessage(full_row, row)
+                rows.append(row)
+                if limit is not None and len(rows) >= limit:
+                    break
+        return paths, rows
+
+    def suggest_geo_target_constants(self, request, response):
+        """为每个位置名称返回一个稳定的地理目标常量建议（原生 protobuf）"""
+        for name in request.location_names.names:
+            suggestion = response.geo_target_constant_suggestions.add()
+            suggestion.locale = request.locale or "en"
+            suggestion.search_term = name
+            suggestion.reach = 1000000
+            constant = suggestion.geo_target_constant
+            constant.id = geo_target_constant_id(name)
+            constant.resource_name = f"geoTargetConstants/{constant.id}"
+            constant.name = name
+            constant.country_code = request.country_code or "US"
+            constant.target_type = "City"
+
+
+class LatencyModel:
+    """
+    每次调用的模拟延迟：基础延迟 × 对数正态抖动 + 每个操作的延迟
+
+    Args:
+        base_ms: 每次调用的基础延迟（毫秒）
+        jitter: 对数正态分布的 sigma，0 表示固定延迟；0.5 时 p99 约为中位数的 3 倍
+        per_operation_ms: 每个操作增加的延迟（毫秒）
+        seed: 随机数种子（可选）
+    """
+
+    def __init__(self, base_ms=0.0, jitter=0.0, per_operation_ms=0.0, seed=None):
+        self.base_ms = base_ms
+        self.jitter = jitter
+        self.per_operation_ms = per_operation_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, operation_count):
+        """返回一次调用的模拟延迟（秒）"""
+        factor = 1.0
+        if self.jitter:
+            with self._lock:
+                factor = self._random.lognormvariate(0, self.jitter)
+        return (self.base_ms * factor + self.per_operation_ms * operation_count) / 1000
+
+
+class RunProfile:
+    """汇总替身客户端上每次调用的操作数、字节数和模拟延迟"""
+
+    def __init__(self, sleeps=False):
+        self.sleeps = sleeps
+        self.methods = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, method, operations, request_bytes, response_bytes, latency):
+        with self._lock:
+            stats = self.methods.get(method)
+            if stats is None:
+                stats = self.methods[method] = {
+                    "calls": 0,
+                    "operations": 0,
+                    "request_bytes": 0,
+                    "response_bytes": 0,
+                    "latencies": [],
+                }
+            stats["calls"] += 1
+            stats["operations"] += operations
+            stats["request_bytes"] += request_bytes
+            stats["response_bytes"] += response_bytes
+            stats["latencies"].append(latency)
+
+    def summary(self):
+        """返回运行概况字典"""
+        local_seconds = time.perf_counter() - self.started
+        with self._lock:
+            methods = {
+                method: dict(stats, latencies=sorted(stats["latencies"]))
+                for method, stats in self.methods.items()
+            }
+        latencies = sorted(
+            latency for stats in methods.values() for latency in stats["latencies"]
+        )
+        simulated_seconds = sum(latencies)
+        return {
+            "rpcs": len(latencies),
+            "operations": sum(stats["operations"] for stats in methods.values()),
+            "request_bytes": sum(stats["request_bytes"] for stats in methods.values()),
+            "response_bytes": sum(
+                stats["response_bytes"] for stats in methods.values()
+            ),
+            "local_seconds": local_seconds,
+            "simulated_latency_seconds": simulated_seconds,
+            # 没有实际等待时，按调用串行执行估算真实耗时
+            "estimated_wall_seconds": (
+                local_seconds if self.sleeps else local_seconds + simulated_seconds
+            ),
+            "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+            "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+            "methods": {
+                method: {
+                    "calls": stats["calls"],
+                    "operations": stats["operations"],
+                    "request_bytes": stats["request_bytes"],
+                    "response_bytes": stats["response_bytes"],
+                    "latency_p50_ms": percentile(stats["latencies"], 0.50) * 1000,
+                    "latency_p99_ms": percentile(stats["latencies"], 0.99) * 1000,
+                }
+                for method, stats in sorted(methods.items())
+            },
+        }
+
+    def report_lines(self):
+        """返回可直接写入日志的运行概况文本行"""
+        summary = self.summary()
+        lines = [
+            f"RPC 数: {summary['rpcs']}，操作数: {summary['operations']}，"
+            f"请求 {summary['request_bytes']:,} 字节，响应 {summary['response_bytes']:,} 字节",
+            f"本地耗时: {summary['local_seconds']:.2f} 秒，模拟延迟合计: "
+            f"{summary['simulated_latency_seconds']:.2f} 秒，"
+            f"预计总耗时: {summary['estimated_wall_seconds']:.2f} 秒",
+            f"每次调用延迟: p50 {summary['latency_p50_ms']:.1f} ms，"
+            f"p99 {summary['latency_p99_ms']:.1f} ms",
+        ]
+        for method, stats in summary["methods"].items():
+            lines.append(
+                f"  {method}: {stats['calls']} 次，{stats['operations']} 个操作，"
+                f"{stats['request_bytes']:,} 字节，p50 {stats['latency_p50_ms']:.1f} ms"
+            )
+        return lines
+
+
+class _FakeService:
+    """一个服务的替身，方法签名与 GAPIC 服务客户端一致"""
+
+    def __init__(self, client, name):
+        from google.ads.googleads import util
+
+        self._client = client
+        self._name = name
+        snaked = util.convert_upper_case_to_snake_case(name)
+        service_module = importlib.import_module(
+            f"google.ads.googleads.{API_VERSION}.services.services.{snaked}"
+        )
+        self._service_client_class = getattr(service_module, f"{name}Client")
+        self._handlers = {}
+
+        store = client.store
+        if name in MUTATE_SERVICES:
+            module_name, method_name, resource_type = MUTATE_SERVICES[name]
+            module = types_module(module_name)
+
+            def mutate(request):
+                names = store.mutate(
+                    request.customer_id, resource_type, request.operations,
+                    validate_only=request.validate_only,
+                )
+                response = module_response.pb()()
+                for resource_name in names:
+                    response.results.add().resource_name = resource_name
+                return response
+
+            module_response = getattr(module, f"{method_name}Response")
+            self._register(
+                method_name, getattr(module, f"{method_name}Request"),
+                module_response, mutate, "operations",
+            )
+        elif name == "GoogleAdsService":
+            module = types_module("google_ads_service")
+            response_type = module.MutateGoogleAdsResponse
+
+            def google_ads_mutate(request):
+                results = store.mutate_google_ads(
+                    request.customer_id, request.mutate_operations,
+                    validate_only=request.validate_only,
+                )
+                response = response_type.pb()()
+                for resource_type, resource_name in results:
+                    operation_response = response.mutate_operation_responses.add()
+                    if resource_name:
+                        getattr(
+                            operation_response, f"{resource_type}_result"
+                        ).resource_name = resource_name
+                return response
+
+            self._register(
+                "Mutate", module.MutateGoogleAdsRequest, response_type,
+                google_ads_mutate, "mutate_operations",
+            )
+
+            stream_response_type = module.SearchGoogleAdsStreamResponse
+            row_type = module.GoogleAdsRow.pb()
+
+            def search_stream(request):
+                paths, rows = store.search(request.customer_id, request.query, row_type)
+                responses = []
+                # 与真实 API 一样，没有结果时也返回一个带字段掩码的空响应
+                for start in range(0, max(len(rows), 1), SEARCH_STREAM_BATCH_SIZE):
+                    response = stream_response_type.pb()()
+                    response.results.extend(rows[start:start + SEARCH_STREAM_BATCH_SIZE])
+                    response.field_mask.paths.extend(paths)
+                    responses.append(response)
+                return responses
+
+            self._register(
+                "SearchStream", module.SearchGoogleAdsStreamRequest,
+                stream_response_type, search_stream, None, streaming=True,
+            )
+        elif name == "GeoTargetConstantService":
+            module = types_module("geo_target_constant_service")
+            response_type = module.SuggestGeoTargetConstantsResponse
+
+            def suggest(request):
+                response = response_type.pb()()
+                store.suggest_geo_target_constants(request, response)
+                return response
+
+            self._register(
+                "SuggestGeoTargetConstants",
+                module.SuggestGeoTargetConstantsRequest, response_type, suggest,
+                None,
+            )
+
+    def _register(
+        self, method_name, request_type, response_type, handle, operations_field,
+        streaming=False,
+    ):
+        from google.ads.googleads import util
+
+        method = util.convert_upper_case_to_snake_case(method_name)
+        profile_name = f"{self._name}.{method_name}"
+        client = self._client
+
+        def call(request=None, **fields):
+            request = _request_pb(request_type, request, fields)
+            operation_count = (
+                len(getattr(request, operations_field)) if operations_field else 0
+            )
+            response = handle(request)
+            latency = client.latency.sample(operation_count)
+            if client.sleep and latency:
+                time.sleep(latency)
+            if streaming:
+                # 流式方法的处理函数返回响应列表，调用方得到迭代器
+                client.profile.record(
+                    profile_name, operation_count, request.ByteSize(),
+                    sum(item.ByteSize() for item in response), latency,
+                )
+                return iter([response_type.wrap(item) for item in response])
+            client.profile.record(
+                profile_name, operation_count, request.ByteSize(),
+                response.ByteSize(), latency,
+            )
+            return response_type.wrap(response)
+
+        self._handlers[method] = call
+
+    def __getattr__(self, name):
+        handler = self._handlers.get(name)
+        if handler is not None:
+            return handler
+        if name.startswith(_LOCAL_METHOD_PREFIXES) or name.endswith(
+            _LOCAL_METHOD_SUFFIXES
+        ):
+            return getattr(self._service_client_class, name)
+        raise NotImplementedError(f"替身客户端未实现 {self._name}.{name}")
+
+
+def _request_pb(request_type, request, fields):
+    """与 GAPIC 相同地由 request 参数或字段参数构建请求，返回原生 protobuf"""
+    fields = {key: value for key, value in fields.items() if value is not None}
+    if request is not None and fields:
+        raise ValueError(
+            "If the `request` argument is set, then none of the individual "
+            "field arguments should be set."
+        )
+    if isinstance(request, dict):
+        request = request_type(request)
+    if request is not None:
+        return to_pb(request)
+    request = request_type.pb()()
+    for key, value in fields.items():
+        if isinstance(value, (list, tuple)):
+            getattr(request, key).extend(to_pb(item) for item in value)
+        else:
+            setattr(request, key, value)
+    return request
+
+
+class FakeGoogleAdsClient:
+    """
+    GoogleAdsClient 的进程内替身
+
+    Args:
+        latency: LatencyModel 实例（可选，默认无延迟）
+        sleep: 是否真的等待模拟延迟；默认只累计，运行概况中据此估算真实耗时
+        store: 共享的 InMemoryAdsStore（可选）
+        use_proto_plus: 与 google-ads.yaml 中的设置一致
+    """
+
+    def __init__(self, latency=None, sleep=False, store=None, use_proto_plus=True):
+        from google.ads.googleads.client import GoogleAdsClient
+        from google.auth.credentials import AnonymousCredentials
+
+        self._client = GoogleAdsClient(
+            credentials=AnonymousCredentials(),
+            developer_token="fake-developer-token",
+            use_proto_plus=use_proto_plus,
+            version=API_VERSION,
+        )
+        self.latency = latency or LatencyModel()
+        self.sleep = sleep
+        self.store = store or InMemoryAdsStore()
+        self.profile = RunProfile(sleeps=sleep)
+        self._services = {}
+        self._lock = threading.Lock()
+
+    def get_service(self, name, *args, **kwargs):
+        with self._lock:
+            service = self._services.get(name)
+            if service is None:
+                service = self._services[name] = _FakeService(self, name)
+            return service
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+"""
+本地 Google Ads gRPC 替身服务器
+
+实现本工具使用的服务（CampaignBudget、Campaign、AdGroup、AdGroupAd、
+AdGroupCriterion、CampaignCriterion、GeoTargetConstant、CustomizerAttribute、
+CustomerCustomizer 以及 GoogleAdsService.Mutate），使用与真实 API 相同的
+protobuf 消息和 gRPC 方法路径，因此客户端走的是完整的序列化、拦截器和
+网络路径。可以配置每次调用的延迟、瞬时错误、配额错误和单个操作被拒绝的
+比例，用于在不访问真实 API 的情况下测量和验证整个流水线。
+
+用法:
+    python fake_ads_server.py --port 50051 --latency_ms 50 --quota_error_rate 0.01
+
+客户端连接:
+    from fake_ads_server import FakeServerClient
+    client = FakeServerClient("127.0.0.1:50051")
+"""
+
+import argparse
+import importlib
+import random
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+from ads_config import API_VERSION
+from fake_ads_client import MUTATE_SERVICES, InMemoryAdsStore, types_module
+
+RETRY_INFO_KEY = "google.rpc.retryinfo-bin"
+FAILURE_KEY = f"google.ads.googleads.{API_VERSION}.errors.googleadsfailure-bin"
+# gRPC 默认只接收 4 MB 的消息；与 google-ads 客户端通道一样放宽到 64 MB，
+# 服务器和客户端通道使用相同的上限
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+GRPC_MESSAGE_OPTIONS = (
+    ("grpc.max_send_message_length", MAX_MESSAGE_BYTES),
+    ("grpc.max_receive_message_length", MAX_MESSAGE_BYTES),
+)
+
+
+def _pb(module, type_name):
+    return getattr(module, type_name).pb()
+
+
+class FakeAdsServer:
+    """
+    Google Ads API 的本地替身服务器
+
+    Args:
+        port: 监听端口，0 表示自动选择
+        latency_ms: 每次调用的基础延迟（毫秒）
+        latency_jitter: 延迟的对数正态抖动系数（0 表示固定延迟）
+        per_operation_ms: 每个操作额外增加的延迟（毫秒）
+        error_rate: 以 UNAVAILABLE 失败的调用比例
+        quota_error_rate: 以 RESOURCE_EXHAUSTED 失败的调用比例（附带 RetryInfo）
+        quota_retry_delay: 配额错误中建议的重试延迟（秒）
+        invalid_operation_rate: 被拒绝的单个操作比例；启用部分失败时只拒绝
+            这些操作，否则整个请求以 INVALID_ARGUMENT 失败
+        max_workers: 服务器工作线程数
+        seed: 随机数种子（可选）
+    """
+
+    def __init__(
+        self, port=0, latency_ms=0.0, latency_jitter=0.0, per_operation_ms=0.0,
+        error_rate=0.0, quota_error_rate=0.0, quota_retry_delay=1.0,
+        invalid_operation_rate=0.0, max_workers=32, seed=None
+    ):
+        self.port = port
+        self.latency_ms = latency_ms
+        self.latency_jitter = latency_jitter
+        self.per_operation_ms = per_operation_ms
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.quota_retry_delay = quota_retry_delay
+        self.invalid_operation_rate = invalid_operation_rate
+        self.max_workers = max_workers
+        self._random = random.Random(seed)
+        self.store = InMemoryAdsStore()
+        self._lock = threading.Lock()
+        self._server = None
+        self.stats = {
+            "rpcs": 0,
+            "operations": 0,
+            "errors": 0,
+            "quota_errors": 0,
+            "rejected_operations": 0,
+            "resources": self.store.created,
+        }
+
+        errors_module = importlib.import_module(
+            f"google.ads.googleads.{API_VERSION}.errors.types.errors"
+        )
+        self._failure_type = errors_module.GoogleAdsFailure.pb()
+
+    # ---- 服务器生命周期 ----
+
+    def start(self):
+        """启动服务器，返回实际监听的端口"""
+        self._server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=self.max_workers),
+            options=GRPC_MESSAGE_OPTIONS,
+        )
+        self._server.add_generic_rpc_handlers(self._build_handlers())
+        self.port = self._server.add_insecure_port(f"127.0.0.1:{self.port}")
+        self._server.start()
+        return self.port
+
+    def stop(self, grace=None):
+        if self._server is not None:
+            self._server.stop(grace)
+
+    def wait_for_termination(self):
+        self._server.wait_for_termination()
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.port}"
+
+    def _build_handlers(self):
+        handlers = []
+        for service_name, (module_name, method_name, resource_type) in (
+            MUTATE_SERVICES.items()
+        ):
+            module = types_module(module_name)
+            handlers.append(
+                self._service_handler(
+                    service_name,
+                    method_name,
+                    _pb(module, f"{method_name}Request"),
+                    _pb(module, f"{method_name}Response"),
+                    self._make_service_mutate(resource_type),
+                )
+            )
+
+        google_ads_types = types_module("google_ads_service")
+        handlers.append(
+            self._service_handler(
+                "GoogleAdsService",
+                "Mutate",
+                _pb(google_ads_types, "MutateGoogleAdsRequest"),
+                _pb(google_ads_types, "MutateGoogleAdsResponse"),
+                self._google_ads_mutate,
+            )
+        )
+
+        geo_types = types_module("geo_target_constant_service")
+        handlers.append(
+            self._service_handler(
+                "GeoTargetConstantService",
+                "SuggestGeoTargetConstants",
+                _pb(geo_types, "SuggestGeoTargetConstantsRequest"),
+                _pb(geo_types, "SuggestGeoTargetConstantsResponse"),
+                self._suggest_geo_target_constants,
+            )
+        )
+        return handlers
+
+    def _service_handler(
+        self, service_name, method_name, request_type, response_type, handle
+    ):
+        def behavior(request, context):
+            operation_count = len(
+                getattr(request, "operations", None)
+                or getattr(request, "mutate_operations", None)
+                or ()
+            )
+            self._simulate(context, operation_count)
+            response = response_type()
+            handle(request, response, context)
+            return response
+
+        return grpc.method_handlers_generic_handler(
+            f"google.ads.googleads.{API_VERSION}.services.{service_name}",
+            {
+                method_name: grpc.unary_unary_rpc_method_handler(
+                    behavior,
+                    request_deserializer=request_type.FromString,
+                    response_serializer=response_type.SerializeToString,
+                )
+            },
+        )
+
+    # ---- 延迟和错误注入 ----
+
+    def _simulate(self, context, operation_count):
+        with self._lock:
+            self.stats["rpcs"] += 1
+            self.stats["operations"] += operation_count
+            roll = self._random.random()
+            jitter = (
+                self._random.lognormvariate(0, self.latency_jitter)
+                if self.latency_jitter
+                else 1.0
+            )
+        delay_ms = self.latency_ms * jitter + self.per_operation_ms * operation_count
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        if roll < self.quota_error_rate:
+            with self._lock:
+                self.stats["quota_errors"] += 1
+            from google.rpc import error_details_pb2
+
+            retry_info = error_details_pb2.RetryInfo()
+            retry_info.retry_delay.FromNanoseconds(
+                int(self.quota_retry_delay * 1e9)
+            )
+            context.set_trailing_metadata(
+                ((RETRY_INFO_KEY, retry_info.SerializeToString()),)
+            )
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "模拟的配额错误")
+        if roll < self.quota_error_rate + self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            context.abort(grpc.StatusCode.UNAVAILABLE, "模拟的瞬时错误")
+
+    def _rejected_indexes(self, operation_count):
+        if not self.invalid_operation_rate:
+            return set()
+        with self._lock:
+            return {
+                index
+                for index in range(operation_count)
+                if self._random.random() < self.invalid_operation_rate
+            }
+
+    def _reject(self, request, response, context, rejected, operations_field):
+        """按部分失败语义拒绝操作；未启用部分失败时整个请求失败"""
+        failure = self._failure_type()
+        for index in sorted(rejected):
+            error = failure.errors.add()
+            error.error_code.request_error = 1  # UNKNOWN
+            error.message = "模拟的操作被拒绝"
+            element = error.location.field_path_elements.add()
+            element.field_name = operations_field
+            element.index = index
+        with self._lock:
+            self.stats["rejected_operations"] += len(rejected)
+        if not request.partial_failure:
+            context.set_trailing_metadata(
+                ((FAILURE_KEY, failure.SerializeToString()),)
+            )
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "模拟的操作被拒绝")
+        status = response.partial_failure_error
+        status.code = grpc.StatusCode.INVALID_ARGUMENT.value[0]
+        status.message = f"{len(rejected)} 个操作被拒绝"
+        detail = status.details.add()
+        detail.Pack(failure)
+
+    # ---- 资源创建 ----
+
+    def _make_service_mutate(self, resource_type):
+        def mutate(request, response, context):
+            rejected = self._rejected_indexes(len(request.operations))
+            if rejected:
+                self._reject(request, response, context, rejected, "operations")
+            for resource_name in self.store.mutate(
+                request.customer_id, resource_type, request.operations,
+                skip=rejected, validate_only=request.validate_only,
+            ):
+                response.results.add().resource_name = resource_name
+
+        return mutate
+
+    def _google_ads_mutate(self, request, response, context):
+        rejected = self._rejected_indexes(len(request.mutate_operations))
+        if rejected:
+            self._reject(request, response, context, rejected, "mutate_operations")
+        for resource_type, resource_name in self.store.mutate_google_ads(
+            request.customer_id, request.mutate_operations,
+            skip=rejected, validate_only=request.validate_only,
+        ):
+            operation_response = response.mutate_operation_responses.add()
+            if resource_name:
+                getattr(
+                    operation_response, f"{resource_type}_result"
+                ).resource_name = resource_name
+
+    def _suggest_geo_target_constants(self, request, response, context):
+        self.store.suggest_geo_target_constants(request, response)
+
+
+class FakeServerClient:
+    """
+    连接 FakeAdsServer 的 GoogleAdsClient 替身
+
+    get_type、enums、copy_from 等委托给一个使用匿名凭据的真实 GoogleAdsClient；
+    get_service 返回真实的 GAPIC 服务客户端，但通过不加密的本地通道连接替身
+    服务器，并保留库自带的异常拦截器，错误与真实 API 一样表现为
+    GoogleAdsException / grpc.RpcError。每种服务只创建一个通道。
+    """
+
+    def __init__(self, address, use_proto_plus=True, interceptors=None):
+        from google.ads.googleads.client import GoogleAdsClient
+        from google.auth.credentials import AnonymousCredentials
+
+        self.address = address
+        self._client = GoogleAdsClient(
+            credentials=AnonymousCredentials(),
+            developer_token="fake-developer-token",
+            use_proto_plus=use_proto_plus,
+            version=API_VERSION,
+        )
+        self._interceptors = list(interceptors or [])
+        self._services = {}
+        self._lock = threading.Lock()
+
+    def get_service(self, name, *args, **kwargs):
+        with self._lock:
+            service = self._services.get(name)
+            if service is None:
+                service = self._services[name] = self._create_service(name)
+            return service
+
+    def _create_service(self, name):
+        from google.ads.googleads import util
+        from google.ads.googleads.interceptors import ExceptionInterceptor
+
+        snaked = util.convert_upper_case_to_snake_case(name)
+        service_module = importlib.import_module(
+            f"google.ads.googleads.{API_VERSION}.services.services.{snaked}"
+        )
+        service_client_class = getattr(service_module, f"{name}Client")
+        channel = grpc.intercept_channel(
+            grpc.insecure_channel(self.address, options=GRPC_MESSAGE_OPTIONS),
+            *self._interceptors,
+            ExceptionInterceptor(
+                API_VERSION, use_proto_plus=self._client.use_proto_plus
+            ),
+        )
+        transport = service_client_class.get_transport_class()(channel=channel)
+        return service_client_class(transport=transport)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 Google Ads gRPC 替身服务器")
+    parser.add_argument("--port", type=int, default=50051, help="监听端口，0 表示自动选择")
+    parser.add_argument("--latency_ms", type=float, default=0, help="每次调用的基础延迟（毫秒）")
+    parser.add_argument("--latency_jitter", type=float, default=0, help="延迟的对数正态抖动系数")
+    parser.add_argument("--per_operation_ms", type=float, default=0, help="每个操作增加的延迟（毫秒）")
+    parser.add_argument("--error_rate", type=float, default=0, help="UNAVAILABLE 错误比例")
+    parser.add_argument("--quota_error_rate", type=float, default=0, help="RESOURCE_EXHAUSTED 错误比例")
+    parser.add_argument("--quota_retry_delay", type=float, default=1, help="配额错误建议的重试延迟（秒）")
+    parser.add_argument("--invalid_operation_rate", type=float, default=0, help="被拒绝的操作比例")
+    parser.add_argument("--max_workers", type=int, default=32, help="服务器工作线程数")
+    parser.add_argument("--seed", type=int, help="随机数种子")
+    args = parser.parse_args()
+
+    server = FakeAdsServer(
+        port=args.port,
+        latency_ms=args.latency_ms,
+        latency_jitter=args.latency_jitter,
+        per_operation_ms=args.per_operation_ms,
+        error_rate=args.error_rate,
+        quota_error_rate=args.quota_error_rate,
+        quota_retry_delay=args.quota_retry_delay,
+        invalid_operation_rate=args.invalid_operation_rate,
+        max_workers=args.max_workers,
+        seed=args.seed,
+    )
+    server.start()
+    print(f"fake Google Ads server listening on {server.address}", flush=True)
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(0)
+        print(f"统计: {server.stats}")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+"""
+地理目标常量本地缓存与离线索引
+
+add_geo_targeting 每次运行都通过 GeoTargetConstantService 查询相同的
+"New York"、"Los Angeles"、"Chicago"。这里提供两层本地解析:
+
+1. GeoTargetIndex: 从 Google 发布的 geotargets CSV 批量加载的内存索引，
+   支持精确匹配和前缀查找，完全不需要网络请求；
+2. GeoTargetCache: 以 (locale, country_code, 规范化名称) 为键的 SQLite
+   缓存，保存 suggest_geo_target_constants 的结果，超过 TTL 后失效。
+
+CachedGeoTargetResolver 依次查询索引、缓存，只对剩余名称发起一次请求，
+并把请求结果写回缓存。
+"""
+
+import bisect
+import csv
+import json
+import re
+import sqlite3
+import threading
+import time
+
+# 缓存默认有效期（秒）：地理目标常量很少变化
+DEFAULT_TTL = 30 * 24 * 60 * 60
+
+# 同名地点有多个时的优先顺序（与 CSV 中的 Target Type 对应）
+TARGET_TYPE_PRIORITY = {
+    "City": 0,
+    "State": 1,
+    "Province": 1,
+    "DMA Region": 2,
+    "County": 3,
+    "Postal Code": 4,
+    "Country": 5,
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_name(name):
+    """规范化位置名称：忽略大小写并合并多余空白"""
+    return _WHITESPACE.sub(" ", name).strip().casefold()
+
+
+class GeoTargetCache:
+    """
+    suggest_geo_target_constants 结果的 SQLite 缓存
+
+    Args:
+        path: SQLite 数据库文件路径
+        ttl: 缓存有效期（秒）
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS geo_target_constants ("
+                " locale TEXT NOT NULL,"
+                " country_code TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " resource_names TEXT NOT NULL,"
+                " cached_at REAL NOT NULL,"
+                " PRIMARY KEY (locale, country_code, name))"
+            )
+        self.evict_expired()
+
+    def get_many(self, locale, country_code, names):
+        """返回 {规范化名称: [资源名称, ...]}，只包含未过期的条目"""
+        keys = list({normalize_name(name) for name in names})
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name, resource_names FROM geo_target_constants"
+                " WHERE locale = ? AND country_code = ? AND cached_at >= ?"
+                f" AND name IN ({placeholders})",
+                [locale, country_code, time.time() - self.ttl, *keys],
+            ).fetchall()
+        return {name: json.loads(resource_names) for name, resource_names in rows}
+
+    def put_many(self, locale, country_code, resolved):
+        """写入 {名称: [资源名称, ...]}"""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO geo_target_constants"
+                " (locale, country_code, name, resource_names, cached_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        locale,
+                        country_code,
+                        normalize_name(name),
+                        json.dumps(resource_names),
+                        now,
+                    )
+                    for name, resource_names in resolved.items()
+                ],
+            )
+
+    def evict_expired(self):
+        """删除超过有效期的条目"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM geo_target_constants WHERE cached_at < ?",
+                (time.time() - self.ttl,),
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+class GeoTargetIndex:
+    """
+    基于 Google geotargets CSV 的内存索引
+
+    CSV 列: Criteria ID, Name, Canonical Name, Parent ID, Country Code,
+    Target Type, Status。按 (国家代码, 规范化名称) 建立精确匹配字典，
+    并为每个国家维护有序的名称列表用于二分前缀查找。
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._sorted_names = {}
+
+    @classmethod
+    def from_csv(cls, path, include_removed=False):
+        """从 geotargets CSV 文件构建索引"""
+        index = cls()
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if not include_removed and row.get("Status") != "Active":
+                    continue
+                index.add(
+                    row["Criteria ID"],
+                    row["Name"],
+                    row["Country Code"],
+                    row.get("Target Type", ""),
+                    row.get("Canonical Name"),
+                )
+        index.finalize()
+        return index
+
+    def add(self, criteria_id, name, country_code, target_type, canonical_name=None):
+        """添加一个地点；canonical_name（例如 "Chicago,Illinois,United States"）也可用于查找"""
+        entry = (
+            TARGET_TYPE_PRIORITY.get(target_type, len(TARGET_TYPE_PRIORITY)),
+            f"geoTargetConstants/{criteria_id}",
+        )
+        for key_name in filter(None, (name, canonical_name)):
+            self._exact.setdefault(
+                (country_code, normalize_name(key_name)), []
+            ).append(entry)
+
+    def finalize(self):
+        """排序同名条目并建立前缀查找所需的有序列表"""
+        sorted_names = {}
+        for (country_code, name), entries in self._exact.items():
+            entries.sort()
+            sorted_names.setdefault(country_code, []).append(name)
+        self._sorted_names = {
+            country_code: sorted(names)
+            for country_code, names in sorted_names.items()
+        }
+
+    def lookup(self, name, country_code):
+        """精确查找，返回优先级最高的资源名称，找不到时返回 None"""
+        entries = self._exact.get((country_code, normalize_name(name)))
+        return entries[0][1] if entries else None
+
+    def prefix(self, prefix, country_code, limit=10):
+        """前缀查找，返回 [(规范化名称, 资源名称), ...]"""
+        names = self._sorted_names.get(country_code, [])
+        prefix = normalize_name(prefix)
+        matches = []
+        for i in range(bisect.bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(
+                (names[i], self._exact[(country_code, names[i])][0][1])
+            )
+        return matches
+
+    def __len__(self):
+        return len(self._exact)
+
+
+class CachedGeoTargetResolver:
+    """
+    依次通过离线索引、本地缓存和远程请求解析位置名称
+
+    Args:
+        cache: GeoTargetCache 实例（可选）
+        index: GeoTargetIndex 实例（可选）
+    """
+
+    def __init__(self, cache=None, index=None):
+        self.cache = cache
+        self.index = index
+
+    def resolve(self, locale, country_code, names, fetch):
+        """
+        解析位置名称
+
+        Args:
+            locale: 语言代码
+            country_code: 国家代码
+            names: 位置名称列表
+            fetch: fetch(剩余名称列表) -> {搜索词: [资源名称, ...]}，
+                只有本地无法解析的名称才会调用
+
+        Returns:
+            {原始名称: [资源名称, ...]}
+        """
+        resolved = {}
+        remaining = []
+        for name in names:
+            resource_name = self.index.lookup(name, country_code) if self.index else None
+            if resource_name:
+                resolved[name] = [resource_name]
+            else:
+                remaining.append(name)
+
+        if remaining and self.cache:
+            cached = self.cache.get_many(locale, country_code, remaining)
+            still_remaining = []
+            for name in remaining:
+                if normalize_name(name) in cached:
+                    resolved[name] = cached[normalize_name(name)]
+                else:
+                    still_remaining.append(name)
+            remaining = still_remaining
+
+        if remaining:
+            fetched = {
+                normalize_name(term): resource_names
+                for term, resource_names in fetch(remaining).items()
+            }
+            newly_resolved = {
+                name: fetched[normalize_name(name)]
+                for name in remaining
+                if normalize_name(name) in fetched
+            }
+            resolved.update(newly_resolved)
+            if self.cache and newly_resolved:
+                self.cache.put_many(locale, country_code, newly_resolved)
+        return resolved
@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+"""
+流式读取 JSONL 创建请求并分发到线程池
+
+输入文件每行一个创建请求（一个客户账号的一个广告系列）:
+
+    {"customer_id": "1234567890", "campaign": {...}, "partial_failure": true}
+
+campaign 与规格文件 campaigns 列表中的条目格式相同（见 campaign_spec.py），
+省略时创建默认的单个广告系列；customer_id 省略时使用 --customer_id；其余
+可选字段与 creation_daemon.JOB_OPTIONS 相同。
+
+文件以二进制方式逐行读取，只有线程池中的请求和等待中的至多 2 × 并发数
+条请求在内存中，数 GB 的文件内存占用不变。每条请求完成后把检查点原子地
+写入 <输入文件>.checkpoint.json：
+
+    run_prefix   本次导入的随机ID（新建检查点或 --restart 时重新生成）
+    offset       之前所有行都已处理的字节偏移量，恢复时直接 seek 到这里
+    completed    offset 之后已经处理的行 [起始偏移量, 结束偏移量]（乱序完成
+                 的行，至多为线程池窗口大小）
+    failed       失败的行 [起始偏移量, 结束偏移量]，下次运行时先重试
+    fingerprint  已处理部分开头和末尾各 4 KB 的摘要
+
+进程中断后重新运行同一命令，从 offset 继续读取并跳过 completed 中的行，
+已完成的行不会重新读取或重新执行；失败的行（例如重试次数用完的配额错误）
+在下次运行时重新执行，--skip_failed 时不再重试。输入文件被改写或替换（摘要
+不一致）时拒绝继续，需要 --restart 从头开始。每行的结果追加到
+<输入文件>.results.jsonl，部分失败模式下被拒绝的操作追加到
+<输入文件>.rejected.jsonl；每行以 "<run_prefix>-<起始偏移量>-<行内容摘要>"
+作为步骤日志的运行ID，执行到一半中断的行恢复时跳过已完成的步骤，而新的
+导入（--restart 或同一路径下的新文件）不会沿用旧导入的步骤结果。
+
+用法:
+    python jsonl_ingest.py creation_requests.jsonl --max_workers 8
+    python jsonl_ingest.py creation_requests.jsonl --mock --mock_latency_ms 0
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ads_logging import get_logger, log_context
+from belk_search_ads_creator import LOG_FILE, SAVE_PATH, log_message, run_creation
+from creation_daemon import JOB_OPTIONS
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+RESULTS_SUFFIX = ".results.jsonl"
+REJECTED_SUFFIX = ".rejected.jsonl"
+
+# 检查点指纹覆盖的开头和末尾字节数
+FINGERPRINT_BYTES = 4096
+
+
+class IngestCheckpoint:
+    """
+    输入文件的字节偏移量检查点
+
+    Args:
+        path: 检查点文件路径
+        input_path: 输入文件路径（用于校验检查点属于该文件）
+    """
+
+    def __init__(self, path, input_path):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.offset = 0
+        self.completed = {}
+        self.failed = {}
+        # 步骤日志的运行ID前缀：每个新检查点重新生成，旧导入的步骤不会被沿用
+        self.run_prefix = uuid.uuid4().hex[:8]
+
+    @property
+    def processed_end(self):
+        """已处理部分的结束偏移量"""
+        return max([self.offset, *self.completed.values(), *self.failed.values()])
+
+    def fingerprint(self, end=None):
+        """输入文件 [0, end) 开头和末尾各 FINGERPRINT_BYTES 字节的摘要"""
+        end = self.processed_end if end is None else end
+        digest = hashlib.sha256()
+        with open(self.input_path, "rb") as f:
+            digest.update(f.read(min(end, FINGERPRINT_BYTES)))
+            f.seek(max(0, end - FINGERPRINT_BYTES))
+            digest.update(f.read(end - f.tell()))
+        return digest.hexdigest()
+
+    def load(self):
+        """读取已有的检查点；没有检查点时从文件开头开始"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        if data.get("input") != self.input_path:
+            raise ValueError(f"检查点 {self.path} 属于另一个输入文件 {data.get('input')}")
+        self.run_prefix = data["run_prefix"]
+        self.offset = data["offset"]
+        self.completed = {start: end for start, end in data["completed"]}
+        self.failed = {start: end for start, end in data["failed"]}
+        end = self.processed_end
+        if end > os.path.getsize(self.input_path) or self.fingerprint(end) != data["fingerprint"]:
+            raise ValueError(
+                f"{self.input_path} 的前 {end} 字节与检查点 {self.path} 记录的不一致，"
+                "输入文件已被改写或替换；使用 --restart 从头处理"
+            )
+        return self
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "input": self.input_path,
+                        "run_prefix": self.run_prefix,
+                        "offset": self.offset,
+                        "completed": sorted(self.completed.items()),
+                        "failed": sorted(self.failed.items()),
+                        "fingerprint": self.fingerprint(),
+                        "updated_at": datetime.now().isoformat(timespec="seconds"),
+                    },
+                    f,
+                )
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def complete(self, start, end, failed=False):
+        """
+        标记一行已处理，推进连续处理完的偏移量
+
+        失败的行同样推进偏移量（内存只与失败行数有关），但记录在 failed 中
+        等待重试；重试成功后从 failed 中删除。
+        """
+        if failed:
+            self.failed[start] = end
+        else:
+            self.failed.pop(start, None)
+        if start < self.offset:
+            # 重试的失败行，偏移量早已越过
+            return
+        self.completed[start] = end
+        while self.offset in self.completed:
+            self.offset = self.completed.pop(self.offset)
+
+
+def iter_lines(path, offset=0, skip=None):
+    """
+    从字节偏移量开始逐行读取
+
+    Yields:
+        (起始偏移量, 结束偏移量, 行内容 bytes)；skip 中的起始偏移量被跳过
+    """
+    skip = skip or {}
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in iter(f.readline, b""):
+            start, offset = offset, offset + len(line)
+            if start not in skip:
+                yield start, offset, line
+
+
+def parse_request(line, default_customer_id=None, defaults=None):
+    """
+    解析一行创建请求
+
+    Returns:
+        (客户ID, 规格列表或 None, 选项字典)
+    """
+    from campaign_spec import normalize_campaign_spec
+
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("请求必须是 JSON 对象")
+    customer_id = request.get("customer_id") or default_customer_id
+    if not customer_id:
+        raise ValueError("请求没有指定 customer_id")
+    campaign_specs = None
+    if request.get("campaign") is not None:
+        campaign_specs = [normalize_campaign_spec(request["campaign"], request.get("defaults"))]
+    options = dict(JOB_OPTIONS, **(defaults or {}))
+    options.update({key: request[key] for key in JOB_OPTIONS if key in request})
+    return str(customer_id).replace("-", ""), campaign_specs, options
+
+
+class JsonlIngestor:
+    """
+    流式读取 JSONL 创建请求，在有界线程池中执行并逐条提交检查点
+
+    Args:
+        client: 初始化的GoogleAdsClient实例（或其包装器），所有请求共享
+        input_path: JSONL 输入文件
+        checkpoint_path: 检查点文件（可选，默认 <输入文件>.checkpoint.json）
+        results_path: 结果文件（可选，默认 <输入文件>.results.jsonl）
+        customer_id: 请求未指定 customer_id 时使用的客户ID（可选）
+        max_workers: 最大并发请求数
+        journal_file: 步骤日志 SQLite 文件路径（可选）
+        geo_resolver: geo_target_cache.CachedGeoTargetResolver 实例（可选）
+        entity_index_cache: entity_index.EntityIndexCache 实例（可选）
+        defaults: 覆盖 JOB_OPTIONS 的默认选项（可选）
+        retry_failed: 是否先重试检查点中记录的失败行（默认 True）
+    """
+
+    def __init__(
+        self, client, input_path, checkpoint_path=None, results_path=None,
+        customer_id=None, max_workers=4, journal_file=None, geo_resolver=None,
+        entity_index_cache=None, defaults=None, retry_failed=True
+    ):
+        self.client = client
+        self.input_path = input_path
+        self.checkpoint = IngestCheckpoint(
+            checkpoint_path or input_path + CHECKPOINT_SUFFIX, input_path
+        )
+        self.results_path = results_path or input_path + RESULTS_SUFFIX
+        self.customer_id = customer_id
+        self.max_workers = max_workers
+        self.journal_file = journal_file or os.path.join(
+            SAVE_PATH, "run_journal.sqlite3"
+        )
+        self.geo_resolver = geo_resolver
+        self.entity_index_cache = entity_index_cache
+        self.defaults = defaults or {}
+        self.retry_failed = retry_failed
+        self.stats = {"succeeded": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._results = None
+        self._rejected_log = None
+
+    def stop(self):
+        """停止读取新的行；正在执行的请求会执行完并写入检查点"""
+        self._stop.set()
+
+    def _record(self, start, end, result=None):
+        """写入一行的结果（空行没有结果）并提交检查点"""
+        with self._lock:
+            if result is not None:
+                self._results.write(
+                    json.dumps(result, ensure_ascii=False, default=str) + "\n"
+                )
+                self._results.flush()
+                self.stats[result["status"]] += 1
+            self.checkpoint.complete(
+                start, end, failed=result is not None and result["status"] == "failed"
+            )
+            self.checkpoint.save()
+
+    def _process(self, start, end, line):
+        from run_journal import RunJournal
+
+        started = time.monotonic()
+        result = {"offset": start, "status": "failed", "customer_id": None, "error": None}
+        run_id = (
+            f"{self.checkpoint.run_prefix}-{start}-"
+            f"{hashlib.sha256(line).hexdigest()[:12]}"
+        )
+        with log_context(request_offset=start):
+            try:
+                customer_id, campaign_specs, options = parse_request(
+                    line, self.customer_id, self.defaults
+                )
+                result["customer_id"] = customer_id
+                journal = RunJournal(self.journal_file, run_id)
+                try:
+                    result["result"] = run_creation(
+                        self.client,
+                        customer_id,
+                        options["customizer_attribute_name"],
+                        campaign_specs,
+                        atomic=options["atomic"],
+                        chunk_size=options["chunk_size"],
+                        use_batch_job=options["batch_job"],
+                        journal=journal,
+                        geo_resolver=self.geo_resolver,
+                        partial_failure=options["partial_failure"],
+                        rejected_log=self._rejected_log,
+                        reuse_existing=True,
+                        entity_index_cache=self.entity_index_cache,
+                    )
+                finally:
+                    journal.close()
+                result["status"] = "succeeded"
+            except Exception as e:
+                log_message(f"偏移量 {start} 的请求失败: {str(e)}", "ERROR")
+                result["error"] = str(e)
+        result["elapsed"] = round(time.monotonic() - started, 3)
+        self._record(start, end, result)
+
+    def _pending_lines(self):
+        """先返回需要重试的失败行，再返回检查点之后的行"""
+        if self.retry_failed:
+            with open(self.input_path, "rb") as f:
+                for start, end in sorted(self.checkpoint.failed.items()):
+                    f.seek(start)
+                    yield start, end, f.read(end - start)
+        yield from iter_lines(
+            self.input_path, self.checkpoint.offset, dict(self.checkpoint.completed)
+        )
+
+    def run(self):
+        """
+        处理检查点之后的所有行
+
+        Returns:
+            {"succeeded": 成功数, "failed": 失败数}
+        """
+        from partial_failure import RejectedOperationLog
+
+        self.checkpoint.load()
+        if self.checkpoint.offset or self.checkpoint.completed:
+            log_message(
+                f"从检查点继续：偏移量 {self.checkpoint.offset}，"
+                f"跳过其后已完成的 {len(self.checkpoint.completed)} 行，"
+                f"之前失败的 {len(self.checkpoint.failed)} 行"
+                + ("将重新执行" if self.retry_failed else "不再重试")
+            )
+        # 先保存一次，中断后恢复时使用同一个运行ID前缀
+        self.checkpoint.save()
+        self._rejected_log = RejectedOperationLog(self.input_path + REJECTED_SUFFIX)
+        self._results = open(self.results_path, "a", encoding="utf-8")
+        # 读取不会超前线程池太多：等待中的请求至多 max_workers 条
+        window = threading.BoundedSemaphore(self.max_workers * 2)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for start, end, line in self._pending_lines():
+                    if not line.strip():
+                        # 空行直接视为完成
+                        self._record(start, end)
+                        continue
+                    window.acquire()
+                    if self._stop.is_set():
+                        window.release()
+                        break
+                    future = executor.submit(self._process, start, end, line)
+                    future.add_done_callback(lambda _: window.release())
+        finally:
+            self._results.close()
+        log_message(
+            f"JSONL 请求处理完成：成功 {self.stats['succeeded']} 条，"
+            f"失败 {self.stats['failed']} 条，检查点偏移量 {self.checkpoint.offset}"
+        )
+        return self.stats
+
+
+if __name__ == "__main__":
+    from creation_daemon import add_client_arguments, build_daemon_client, build_shared_caches
+
+    parser = argparse.ArgumentParser(description="流式读取 JSONL 创建请求并发执行，支持断点续传")
+    parser.add_argument("input", help="每行一个创建请求的 JSONL 文件")
+    parser.add_argument("-c", "--customer_id", help="请求未指定 customer_id 时使用的客户ID")
+    parser.add_argument("--max_workers", type=int, default=4, help="最大并发请求数")
+    parser.add_argument("--checkpoint_file", help="检查点文件（默认 <输入文件>.checkpoint.json）")
+    parser.add_argument("--results_file", help="结果文件（默认 <输入文件>.results.jsonl）")
+    parser.add_argument(
+        "--restart", action="store_true",
+        help="删除检查点，从文件开头作为新的导入重新处理（不沿用之前的步骤日志）"
+    )
+    parser.add_argument("--skip_failed", action="store_true", help="不重试检查点中记录的失败行")
+    parser.add_argument(
+        "-n", "--customizer_attribute_name", default="BelkSalePrice",
+        help="请求未指定时使用的自定义属性名称"
+    )
+    parser.add_argument("--chunk_size", type=int, default=10000, help="每个 Mutate 请求的最大操作数")
+    parser.add_argument("--partial_failure", action="store_true", help="请求默认以部分失败模式提交")
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(SAVE_PATH, exist_ok=True)
+    get_logger(LOG_FILE, level=args.log_level)
+    checkpoint_file = args.checkpoint_file or args.input + CHECKPOINT_SUFFIX
+    if args.restart and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+        log_message(f"已删除检查点 {checkpoint_file}")
+
+    client, _ = build_daemon_client(args)
+    journal_file, geo_resolver, entity_index_cache = build_shared_caches(
+        args, os.path.dirname(os.path.abspath(args.input))
+    )
+    ingestor = JsonlIngestor(
+        client,
+        args.input,
+        checkpoint_path=checkpoint_file,
+        results_path=args.results_file,
+        customer_id=args.customer_id,
+        max_workers=args.max_workers,
+        journal_file=journal_file,
+        geo_resolver=geo_resolver,
+        entity_index_cache=entity_index_cache,
+        defaults={
+            "customizer_attribute_name": args.customizer_attribute_name,
+            "chunk_size": args.chunk_size,
+            "partial_failure": args.partial_failure,
+        },
+        retry_failed=not args.skip_failed,
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: ingestor.stop())
+    try:
+        stats = ingestor.run()
+    except ValueError as e:
+        log_message(str(e), "ERROR")
+        sys.exit(1)
+    sys.exit(1 if stats["failed"] or ingestor.checkpoint.failed else 0)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+"""
+基于商品目录的关键词扩展
+
+原来的关键词是手工写死的几条短语。这里流式读取 Belk 商品/品类目录
+（CSV，或安装 pyarrow 后读取 Parquet），按 品牌 × 品类 × 修饰词 × 匹配类型
+生成关键词，规范化大小写、空白和 Google Ads 不允许的符号，按长度和词数
+过滤，用 blake2b 摘要集合去重，再直接生成广告组标准操作。
+
+规范化在目录的列上按批进行，并按原始值缓存：目录中数百万行商品通常只有
+有限的品牌和品类，每个不同的值只规范化一次；组合阶段只做字符串拼接，
+长度和词数由各部分预先计算的值相加得出，超限的组合不会拼接字符串。
+内存占用只与批大小和去重后的关键词数量有关，与目录行数无关。
+
+用法（预览扩展结果和统计）:
+    python keyword_expansion.py catalog.csv --output keywords.csv
+"""
+
+import argparse
+import csv
+import gc
+import hashlib
+import itertools
+import operator
+import os
+import time
+import unicodedata
+from contextlib import contextmanager
+
+from belk_search_ads_creator import log_message
+from operation_factory import get_operation_factory
+
+# Google Ads 关键词文本的限制
+MAX_KEYWORD_LENGTH = 80
+MAX_KEYWORD_WORDS = 10
+
+# 关键词中不允许出现的符号，规范化时替换为空格
+INVALID_KEYWORD_CHARS = "!@%,*^=;~`<>?\\|(){}[]\""
+
+# 默认修饰词（空字符串表示不加修饰词）和匹配类型
+DEFAULT_MODIFIERS = ("", "sale", "deals", "online", "clearance")
+DEFAULT_MATCH_TYPES = ("BROAD", "PHRASE", "EXACT")
+
+# 目录的默认列名和每批读取的行数
+DEFAULT_BRAND_COLUMN = "brand"
+DEFAULT_CATEGORY_COLUMN = "category"
+CATALOG_BATCH_SIZE = 10000
+
+# 去重摘要长度（字节）；8 字节在千万级关键词下碰撞概率可以忽略
+DIGEST_SIZE = 8
+
+_SYMBOL_TABLE = str.maketrans({char: " " for char in INVALID_KEYWORD_CHARS})
+
+
+class KeywordCatalogError(ValueError):
+    """关键词目录无效"""
+
+
+@contextmanager
+def _gc_paused():
+    """在代码块内暂停循环垃圾回收，退出时恢复原来的状态"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def normalize_keyword_text(value):
+    """规范化单个关键词片段：NFKC、小写、去除不允许的符号、合并空白"""
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(value)).lower()
+    return " ".join(text.translate(_SYMBOL_TABLE).split())
+
+
+def read_catalog(
+    path, brand_column=DEFAULT_BRAND_COLUMN,
+    category_column=DEFAULT_CATEGORY_COLUMN, batch_size=CATALOG_BATCH_SIZE
+):
+    """
+    流式读取商品目录，每次生成一批 (品牌, 品类) 元组列表
+
+    .parquet 文件需要安装 pyarrow，只读取需要的两列；其他文件按 CSV 读取。
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise KeywordCatalogError(
+                "读取 Parquet 目录需要安装 pyarrow: pip install pyarrow"
+            ) from e
+        parquet_file = pq.ParquetFile(path)
+        missing = {brand_column, category_column} - set(
+            parquet_file.schema_arrow.names
+        )
+        if missing:
+            raise KeywordCatalogError(f"{path} 缺少列: {', '.join(sorted(missing))}")
+        for batch in parquet_file.iter_batches(
+            batch_size=batch_size, columns=[brand_column, category_column]
+        ):
+            yield list(
+                zip(
+                    batch.column(brand_column).to_pylist(),
+                    batch.column(category_column).to_pylist(),
+                )
+            )
+        return
+
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        try:
+            brand_index = header.index(brand_column)
+            category_index = header.index(category_column)
+        except ValueError:
+            raise KeywordCatalogError(
+                f"{path} 缺少列 {brand_column} 或 {category_column}"
+            )
+        get_pair = operator.itemgetter(brand_index, category_index)
+        while True:
+            rows = list(itertools.islice(reader, batch_size))
+            if not rows:
+                break
+            try:
+                yield list(map(get_pair, rows))
+            except IndexError:
+                # 存在缺列的行时逐行读取，缺失的值按空字符串处理
+                yield [
+                    (
+                        row[brand_index] if len(row) > brand_index else "",
+                        row[category_index] if len(row) > category_index else "",
+                    )
+                    for row in rows
+                ]
+
+
+class KeywordExpander:
+    """
+    品牌 × 品类 × 修饰词 × 匹配类型 的关键词扩展器
+
+    同一个扩展器的所有输出全局去重（按规范化后的文本），相同文本的各个
+    匹配类型只在第一次出现时输出。stats 记录候选数和各类过滤数。
+
+    Args:
+        modifiers: 修饰词列表，空字符串表示不加修饰词
+        match_types: 匹配类型名称列表（KeywordMatchTypeEnum 成员名）
+        max_length: 关键词最大字符数
+        max_words: 关键词最大词数
+    """
+
+    def __init__(
+        self, modifiers=DEFAULT_MODIFIERS, match_types=DEFAULT_MATCH_TYPES,
+        max_length=MAX_KEYWORD_LENGTH, max_words=MAX_KEYWORD_WORDS
+    ):
+        self.match_types = tuple(match_type.upper() for match_type in match_types)
+        self.max_length = max_length
+        self.max_words = max_words
+        # 修饰词预先规范化，并计算拼接时增加的长度（含分隔空格）和词数
+        self._modifiers = []
+        for modifier in dict.fromkeys(normalize_keyword_text(m) for m in modifiers):
+            if modifier:
+                self._modifiers.append(
+                    (" " + modifier, len(modifier) + 1, len(modifier.split()))
+                )
+            else:
+                self._modifiers.append(("", 0, 0))
+        self._parts = {}
+        self._seen_raw_pairs = set()
+        self._seen_pairs = set()
+        self._seen_digests = set()
+        self.stats = {
+            "rows": 0,
+            "candidates": 0,
+            "too_long": 0,
+            "too_many_words": 0,
+            "duplicates": 0,
+            "keywords": 0,
+        }
+
+    def _normalize_column(self, values):
+        """按批规范化一列，每个不同的原始值只规范化一次"""
+        parts = self._parts
+        for value in set(values).difference(parts):
+            text = normalize_keyword_text(value)
+            parts[value] = (text, len(text.split()))
+        return list(map(parts.__getitem__, values))
+
+    def expand_batch(self, pairs):
+        """扩展一批 (品牌, 品类) 目录行，返回 (关键词文本, 匹配类型) 列表"""
+        stats = self.stats
+        stats["rows"] += len(pairs)
+        # 整批在集合上去掉已经见过的原始组合：同一品牌/品类的商品只扩展一次
+        new_pairs = set(pairs)
+        new_pairs.difference_update(self._seen_raw_pairs)
+        self._seen_raw_pairs.update(new_pairs)
+        if not new_pairs:
+            return []
+        brands, categories = zip(*new_pairs)
+
+        max_length = self.max_length
+        max_words = self.max_words
+        modifiers = self._modifiers
+        seen_pairs = self._seen_pairs
+        seen_digests = self._seen_digests
+        blake2b = hashlib.blake2b
+        combinations = too_long = too_many_words = duplicates = 0
+        texts = []
+
+        for (brand, brand_words), (category, category_words) in zip(
+            self._normalize_column(brands), self._normalize_column(categories)
+        ):
+            # 不同的原始写法规范化后可能相同
+            if (brand, category) in seen_pairs:
+                continue
+            seen_pairs.add((brand, category))
+
+            if brand and category:
+                base = brand + " " + category
+            else:
+                base = brand or category
+                if not base:
+                    continue
+            base_length = len(base)
+            base_words = brand_words + category_words
+            combinations += 1
+
+            for modifier, modifier_length, modifier_words in modifiers:
+                if base_length + modifier_length > max_length:
+                    too_long += 1
+                    continue
+                if base_words + modifier_words > max_words:
+                    too_many_words += 1
+                    continue
+                text = base + modifier
+                digest = blake2b(
+                    text.encode("utf-8"), digest_size=DIGEST_SIZE
+                ).digest()
+                if digest in seen_digests:
+                    duplicates += 1
+                    continue
+                seen_digests.add(digest)
+                texts.append(text)
+
+        # 计数按 文本 × 匹配类型 统计，与最终生成的关键词数一致
+        match_types = self.match_types
+        match_type_count = len(match_types)
+        keywords = [(text, match_type) for text in texts for match_type in match_types]
+        stats["candidates"] += combinations * len(modifiers) * match_type_count
+        stats["too_long"] += too_long * match_type_count
+        stats["too_many_words"] += too_many_words * match_type_count
+        stats["duplicates"] += duplicates * match_type_count
+        stats["keywords"] += len(keywords)
+        return keywords
+
+    def expand(self, catalog_batches):
+        """逐批扩展目录，生成 (关键词文本, 匹配类型) 列表"""
+        catalog_batches = iter(catalog_batches)
+        while True:
+            # 读取和扩展只分配不含循环引用的对象；暂停循环垃圾回收，避免
+            # 每次完整回收都遍历不断增长的去重集合
+            with _gc_paused():
+                pairs = next(catalog_batches, None)
+                if pairs is None:
+                    return
+                keywords = self.expand_batch(pairs)
+            if keywords:
+                yield keywords
+
+
+def expand_catalog_keywords(
+    path, modifiers=DEFAULT_MODIFIERS, match_types=DEFAULT_MATCH_TYPES,
+    brand_column=DEFAULT_BRAND_COLUMN, category_column=DEFAULT_CATEGORY_COLUMN,
+    batch_size=CATALOG_BATCH_SIZE, expander=None
+):
+    """
+    从目录文件流式生成关键词
+
+    Yields:
+        (关键词文本, 匹配类型名称)
+    """
+    expander = expander or KeywordExpander(modifiers, match_types)
+    for keywords in expander.expand(
+        read_catalog(path, brand_column, category_column, batch_size)
+    ):
+        yield from keywords
+
+
+def iter_keyword_operations(client, ad_group_resource_name, keywords):
+    """将 (文本, 匹配类型名称) 流转换为广告组标准操作流（原型克隆，原生 protobuf）"""
+    return get_operation_factory(client).keyword_operations(
+        ad_group_resource_name, keywords
+    )
+
+
+def iter_catalog_keyword_operations(client, ad_group_resource_name, catalog):
+    """
+    根据广告组规格中的 keyword_catalog 配置生成关键词操作流
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        ad_group_resource_name: 广告组资源名称
+        catalog: campaign_spec 规范化后的 keyword_catalog 字典
+    """
+    expander = KeywordExpander(catalog["modifiers"], catalog["match_types"])
+    keywords = expand_catalog_keywords(
+        catalog["path"],
+        brand_column=catalog["brand_column"],
+        category_column=catalog["category_column"],
+        expander=expander,
+    )
+    yield from iter_keyword_operations(client, ad_group_resource_name, keywords)
+    log_message(
+        f"目录 {catalog['path']}: {expander.stats['rows']} 行，"
+        f"{expander.stats['candidates']} 个候选，生成 {expander.stats['keywords']} 个关键词"
+        f"（超长 {expander.stats['too_long']}，词数超限 {expander.stats['too_many_words']}，"
+        f"重复 {expander.stats['duplicates']}）"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="根据商品目录扩展关键词")
+    parser.add_argument("catalog", help="商品目录 CSV 或 Parquet 文件")
+    parser.add_argument("--output", help="输出关键词的 CSV 文件（text,match_type）")
+    parser.add_argument(
+        "--modifiers",
+        default=",".join(DEFAULT_MODIFIERS),
+        help="逗号分隔的修饰词，空项表示不加修饰词",
+    )
+    parser.add_argument(
+        "--match_types",
+        default=",".join(DEFAULT_MATCH_TYPES),
+        help="逗号分隔的匹配类型",
+    )
+    parser.add_argument("--brand_column", default=DEFAULT_BRAND_COLUMN)
+    parser.add_argument("--category_column", default=DEFAULT_CATEGORY_COLUMN)
+    args = parser.parse_args()
+
+    expander = KeywordExpander(
+        args.modifiers.split(","), args.match_types.split(",")
+    )
+    started = time.perf_counter()
+    keywords = expand_catalog_keywords(
+        args.catalog,
+        brand_column=args.brand_column,
+        category_column=args.category_column,
+        expander=expander,
+    )
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(("text", "match_type"))
+            writer.writerows(keywords)
+    else:
+        for _ in keywords:
+            pass
+    elapsed = time.perf_counter() - started
+    for key, value in expander.stats.items():
+        print(f"{key}: {value}")
+    print(f"耗时: {elapsed:.2f} 秒")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+BatchJobService 本地替身
+
+实现 batch_job.py 用到的 BatchJobService 方法（mutate_batch_job、
+add_batch_job_operations、run_batch_job、list_batch_job_results），
+在内存中模拟作业生命周期、sequence token 校验、轮询延迟和分页结果，
+无需网络即可验证批处理提交流程。
+"""
+
+import itertools
+import uuid
+from types import SimpleNamespace
+
+from operation_factory import to_pb
+
+
+class LocalBatchJobError(RuntimeError):
+    """模拟服务器拒绝请求（例如 sequence token 不匹配）"""
+
+
+class _LocalOperation:
+    """模拟长时间运行操作，done() 在指定的轮询次数后返回 True"""
+
+    def __init__(self, polls_until_done):
+        self._remaining_polls = polls_until_done
+
+    def done(self):
+        if self._remaining_polls <= 0:
+            return True
+        self._remaining_polls -= 1
+        return False
+
+
+class LocalBatchJobService:
+    """
+    BatchJobService 的内存实现
+
+    Args:
+        polls_until_done: 作业启动后 done() 返回 False 的次数
+        fail_every: 每隔多少个操作模拟一次失败（0 表示不失败）
+    """
+
+    def __init__(self, polls_until_done=2, fail_every=0):
+        self.polls_until_done = polls_until_done
+        self.fail_every = fail_every
+        self._jobs = {}
+        self._ids = itertools.count(1)
+
+    def batch_job_path(self, customer_id, batch_job_id):
+        return f"customers/{customer_id}/batchJobs/{batch_job_id}"
+
+    def mutate_batch_job(self, customer_id, operation):
+        resource_name = self.batch_job_path(customer_id, next(self._ids))
+        # 只记录每个操作的类型，避免替身本身随操作数增长占用大量内存
+        self._jobs[resource_name] = {
+            "status": "PENDING",
+            "operation_fields": [],
+            "sequence_token": None,
+        }
+        return SimpleNamespace(
+            result=SimpleNamespace(resource_name=resource_name)
+        )
+
+    def add_batch_job_operations(
+        self, resource_name, mutate_operations, sequence_token=None
+    ):
+        job = self._get_job(resource_name)
+        if job["status"] != "PENDING":
+            raise LocalBatchJobError(f"作业 {resource_name} 已启动，不能再追加操作")
+        if sequence_token != job["sequence_token"]:
+            raise LocalBatchJobError(
+                f"sequence token 不匹配: 期望 {job['sequence_token']!r}，"
+                f"收到 {sequence_token!r}"
+            )
+        for mutate_operation in mutate_operations:
+            job["operation_fields"].append(
+                to_pb(mutate_operation).WhichOneof("operation")
+            )
+        job["sequence_token"] = uuid.uuid4().hex
+        return SimpleNamespace(
+            total_operations=len(job["operation_fields"]),
+            next_sequence_token=job["sequence_token"],
+        )
+
+    def run_batch_job(self, resource_name):
+        job = self._get_job(resource_name)
+        job["status"] = "DONE"
+        return _LocalOperation(self.polls_until_done)
+
+    def list_batch_job_results(self, request):
+        """惰性生成结果，模拟分页器逐条迭代的行为"""
+        job = self._get_job(request.resource_name)
+        if job["status"] != "DONE":
+            raise LocalBatchJobError(f"作业 {request.resource_name} 尚未完成")
+        customer_id = request.resource_name.split("/")[1]
+        for index, operation_field in enumerate(job["operation_fields"]):
+            if self.fail_every and (index + 1) % self.fail_every == 0:
+                status = SimpleNamespace(code=3, message="模拟的操作失败")
+                response = None
+            else:
+                status = SimpleNamespace(code=0, message="")
+                result_field = operation_field.replace("_operation", "_result")
+                response = SimpleNamespace(
+                    **{
+                        result_field: SimpleNamespace(
+                            resource_name=f"customers/{customer_id}/"
+                            f"{result_field}/{index + 1}"
+                        )
+                    }
+                )
+            yield SimpleNamespace(
+                operation_index=index,
+                mutate_operation_response=response,
+                status=status,
+            )
+
+    def _get_job(self, resource_name):
+        if resource_name not in self._jobs:
+            raise LocalBatchJobError(f"作业不存在: {resource_name}")
+        return self._jobs[resource_name]
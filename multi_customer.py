@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""
+多客户账号并发执行
+
+在同一个 MCC（login_customer_id）登录下，为多个客户账号并发运行广告创建
+流水线。所有工作线程共享一个 GoogleAdsClient，每种服务只创建一次客户端，
+所有服务客户端建立在同一个 gRPC 通道上，而不是每个账号、每种服务、每次
+调用都新建通道。
+"""
+
+import importlib
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from belk_search_ads_creator import log_message
+
+# 默认最大并发账号数
+DEFAULT_MAX_WORKERS = 8
+
+
+class SharedServiceClient:
+    """
+    GoogleAdsClient 包装器：所有服务客户端共用一个 gRPC 通道并缓存
+
+    GoogleAdsClient.get_service 每次都新建一个通道；这里按端点只创建一次
+    底层通道，每种服务在其上加上与 google-ads 相同的拦截器（元数据、日志、
+    异常转换）以及调用方通过 interceptors 参数传入的拦截器，再构建服务
+    客户端。GAPIC 服务客户端是线程安全的，缓存后所有线程复用同一个服务实例。
+
+    必须直接包装 GoogleAdsClient（在 InstrumentedClient、RateLimitedClient
+    之内）；包装的不是 GoogleAdsClient（例如替身客户端）时，服务由被包装的
+    客户端创建，只做缓存。其余属性（get_type、enums 等）直接委托给原始客户端。
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._services = {}
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def get_service(self, name, version=None, interceptors=None):
+        interceptors = list(interceptors or [])
+        key = (name, version, tuple(interceptors))
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                service = self._services[key] = self._create_service(
+                    name, version, interceptors
+                )
+            return service
+
+    def _create_service(self, name, version, interceptors):
+        import grpc
+        from google.ads.googleads import client as googleads_client, util
+        from google.ads.googleads.interceptors import (
+            ExceptionInterceptor,
+            LoggingInterceptor,
+            MetadataInterceptor,
+        )
+
+        client = self._client
+        if not isinstance(client, googleads_client.GoogleAdsClient):
+            kwargs = {"interceptors": interceptors} if interceptors else {}
+            if version is not None:
+                kwargs["version"] = version
+            return client.get_service(name, **kwargs)
+
+        version = client.version or version or googleads_client._DEFAULT_VERSION
+        service_module = importlib.import_module(
+            f"google.ads.googleads.{version}.services.services."
+            f"{util.convert_upper_case_to_snake_case(name)}"
+        )
+        service_client_class = getattr(service_module, f"{name}Client")
+        transport_class = service_client_class.get_transport_class()
+        endpoint = client.endpoint or service_client_class.DEFAULT_ENDPOINT
+        channel = self._channels.get(endpoint)
+        if channel is None:
+            channel = self._channels[endpoint] = transport_class.create_channel(
+                host=endpoint,
+                credentials=client.credentials,
+                options=googleads_client._GRPC_CHANNEL_OPTIONS,
+            )
+        channel = grpc.intercept_channel(
+            channel,
+            *interceptors,
+            MetadataInterceptor(
+                client.developer_token,
+                client.login_customer_id,
+                client.linked_customer_id,
+                client.use_cloud_org_for_api_access,
+            ),
+            LoggingInterceptor(googleads_client._logger, version, endpoint),
+            ExceptionInterceptor(version, use_proto_plus=client.use_proto_plus),
+        )
+        transport = transport_class(
+            channel=channel, client_info=googleads_client._CLIENT_INFO
+        )
+        return service_client_class(transport=transport)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def preload_api_types(client):
+    """
+    在启动工作线程之前导入 API 版本的全部类型模块
+
+    google-ads 在第一次 get_type 时才导入整个 API 版本的类型模块。多个线程
+    同时第一次导入时，Python 模块锁的死锁检测可能让其中一个线程拿到尚未
+    初始化完的模块，之后该类型的 get_type 一直报告类型不存在。
+    """
+    client.get_type("MutateOperation")
+
+
+def read_customer_ids(customer_ids=None, customer_file=None):
+    """
+    合并命令行和文件中的客户ID，去掉破折号、去重并保持顺序
+
+    Args:
+        customer_ids: 逗号分隔的客户ID字符串（可选）
+        customer_file: 每行一个客户ID的文件，# 开头的行为注释（可选）
+    """
+    collected = []
+    if customer_ids:
+        collected.extend(customer_ids.split(","))
+    if customer_file:
+        with open(customer_file, "r") as f:
+            for line in f:
+                line = line.split("#", 1)[0]
+                collected.extend(line.split(","))
+
+    seen = set()
+    result = []
+    for customer_id in collected:
+        customer_id = customer_id.strip().replace("-", "")
+        if customer_id and customer_id not in seen:
+            seen.add(customer_id)
+            result.append(customer_id)
+    return result
+
+
+def run_for_customers(
+    customer_ids, task, max_workers=DEFAULT_MAX_WORKERS, action="创建广告"
+):
+    """
+    在有界线程池中为每个客户账号执行 task(customer_id)
+
+    单个账号失败不会影响其他账号。action 用于日志中的任务描述。
+
+    Returns:
+        {customer_id: {"status": "success"|"failed", "elapsed": 秒数,
+                       "result": task 返回值, "error": 错误信息}}
+    """
+    results = {}
+    log_message(
+        f"开始为 {len(customer_ids)} 个客户账号并发{action}，"
+        f"最大并发数 {max_workers}"
+    )
+
+    def run_one(customer_id):
+        started = time.monotonic()
+        try:
+            result = task(customer_id)
+            return {
+                "status": "success",
+                "elapsed": time.monotonic() - started,
+                "result": result,
+                "error": None,
+            }
+        except Exception as e:
+            log_message(f"客户 ID {customer_id} {action}失败: {str(e)}", "ERROR")
+            log_message(traceback.format_exc(), "DEBUG")
+            return {
+                "status": "failed",
+                "elapsed": time.monotonic() - started,
+                "result": None,
+                "error": str(e),
+            }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(run_one, customer_id): customer_id
+            for customer_id in customer_ids
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    # 按输入顺序返回，便于阅读汇总
+    return {customer_id: results[customer_id] for customer_id in customer_ids}
+
+
+def log_summary(results, title="多账号创建汇总"):
+    """记录所有账号的汇总结果，返回失败的账号数"""
+    failed = [
+        customer_id
+        for customer_id, result in results.items()
+        if result["status"] != "success"
+    ]
+    log_message("=" * 60)
+    log_message(title)
+    log_message("=" * 60)
+    for customer_id, result in results.items():
+        mark = "✓" if result["status"] == "success" else "✗"
+        line = f"{mark} {customer_id}: {result['status']} ({result['elapsed']:.1f} 秒)"
+        if result["error"]:
+            line += f" - {result['error']}"
+        log_message(line)
+    log_message(
+        f"成功 {len(results) - len(failed)} 个，失败 {len(failed)} 个，"
+        f"共 {len(results)} 个账号"
+    )
+    return len(failed)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+基于原型克隆的操作构建器
+
+google-ads.yaml 中设置了 use_proto_plus: true，每个关键词或地理定位都要
+调用一次 client.get_type() 创建 proto-plus 操作，再逐个字段经过 proto-plus
+的类型转换赋值；批量创建数十万个关键词时，这部分开销比网络请求还大。
+
+OperationFactory 对每种操作类型只解析一次原生 protobuf 类，对每个广告组/
+广告系列构建一个填好公共字段的原型，之后每个操作只需 CopyFrom 原型再设置
+少量差异字段，全程不经过 proto-plus。生成的原生 protobuf 操作可以直接放入
+proto-plus 请求、client.copy_from() 以及原生请求中。
+"""
+
+import threading
+import weakref
+
+
+def _pb_class(message):
+    """返回 proto-plus 消息对应的原生 protobuf 类；原生消息返回其自身的类"""
+    message_type = type(message)
+    pb = getattr(message_type, "pb", None)
+    return pb() if pb is not None else message_type
+
+
+def to_pb(message):
+    """将 proto-plus 消息转换为原生 protobuf 消息（共享底层数据，不复制）"""
+    pb = getattr(type(message), "pb", None)
+    return pb(message) if pb is not None else message
+
+
+class OperationFactory:
+    """
+    为一个 GoogleAdsClient 缓存原生 protobuf 类型和枚举值，按原型克隆操作
+
+    Args:
+        client: 初始化的GoogleAdsClient实例（或其包装器）
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._types = {}
+        self._enum_values = {}
+        self._lock = threading.Lock()
+
+    def pb_type(self, type_name):
+        """返回类型名称对应的原生 protobuf 类，每种类型只调用一次 get_type"""
+        pb_type = self._types.get(type_name)
+        if pb_type is None:
+            with self._lock:
+                pb_type = self._types.get(type_name)
+                if pb_type is None:
+                    pb_type = _pb_class(self._client.get_type(type_name))
+                    self._types[type_name] = pb_type
+        return pb_type
+
+    def enum_value(self, enum_name, member_name):
+        """返回枚举成员的整数值，例如 ("KeywordMatchTypeEnum", "EXACT")"""
+        key = (enum_name, member_name)
+        value = self._enum_values.get(key)
+        if value is None:
+            value = int(getattr(getattr(self._client.enums, enum_name), member_name))
+            self._enum_values[key] = value
+        return value
+
+    def keyword_operations(self, ad_group_resource_name, keywords):
+        """
+        生成关键词的广告组标准操作
+
+        Args:
+            ad_group_resource_name: 广告组资源名称
+            keywords: (文本, 匹配类型名称) 的可迭代对象
+
+        Yields:
+            原生 protobuf AdGroupCriterionOperation
+        """
+        operation_type = self.pb_type("AdGroupCriterionOperation")
+        prototype = operation_type()
+        prototype.create.ad_group = ad_group_resource_name
+        prototype.create.status = self.enum_value(
+            "AdGroupCriterionStatusEnum", "ENABLED"
+        )
+        match_type_values = {}
+        for text, match_type in keywords:
+            match_type_value = match_type_values.get(match_type)
+            if match_type_value is None:
+                match_type_value = match_type_values[match_type] = self.enum_value(
+                    "KeywordMatchTypeEnum", match_type
+                )
+            operation = operation_type()
+            operation.CopyFrom(prototype)
+            keyword = operation.create.keyword
+            keyword.text = text
+            keyword.match_type = match_type_value
+            yield operation
+
+    def geo_targeting_operations(self, campaign_resource_name, geo_target_constants):
+        """生成地理定位的广告系列标准操作（原生 protobuf CampaignCriterionOperation）"""
+        operation_type = self.pb_type("CampaignCriterionOperation")
+        prototype = operation_type()
+        prototype.create.campaign = campaign_resource_name
+        for geo_target_constant in geo_target_constants:
+            operation = operation_type()
+            operation.CopyFrom(prototype)
+            operation.create.location.geo_target_constant = geo_target_constant
+            yield operation
+
+    def mutate_operation(self, operation_field, operation):
+        """将具体类型的操作包装为原生 protobuf MutateOperation"""
+        mutate_operation = self.pb_type("MutateOperation")()
+        getattr(mutate_operation, operation_field).CopyFrom(to_pb(operation))
+        return mutate_operation
+
+    def mutate_request(
+        self, request_type, customer_id, operations, partial_failure=False,
+        operations_field="operations"
+    ):
+        """
+        构建原生 protobuf mutate 请求
+
+        Args:
+            request_type: 请求类型名称，例如 "MutateAdGroupCriteriaRequest"
+            customer_id: 客户ID
+            operations: 操作列表（proto-plus 或原生 protobuf 均可）
+            partial_failure: 是否启用部分失败
+            operations_field: 操作字段名，GoogleAdsService 为 "mutate_operations"
+        """
+        request = self.pb_type(request_type)()
+        request.customer_id = customer_id
+        request.partial_failure = partial_failure
+        getattr(request, operations_field).extend(
+            to_pb(operation) for operation in operations
+        )
+        return request
+
+
+_factories = weakref.WeakKeyDictionary()
+_factories_lock = threading.Lock()
+
+
+def get_operation_factory(client):
+    """返回客户端对应的共享 OperationFactory，首次调用时创建"""
+    with _factories_lock:
+        factory = _factories.get(client)
+        if factory is None:
+            factory = _factories[client] = OperationFactory(client)
+        return factory
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+部分失败模式
+
+默认情况下，一个 mutate 请求中只要有一个操作被拒绝（例如关键词违反政策），
+整个请求都会回滚，重新提交时又要把成千上万个正常的操作再发送一遍。
+启用 partial_failure 后，服务器在同一次往返中提交所有有效的操作，只把
+被拒绝的操作写入 partial_failure_error。这里将其解码为按操作索引分组的
+错误，并把被拒绝的操作追加到 JSONL 文件中，供人工检查后修正。
+"""
+
+import json
+import threading
+from datetime import datetime
+
+from google.protobuf import json_format
+
+from belk_search_ads_creator import log_message
+from operation_factory import to_pb
+
+
+def _deserialize_failure(client, value):
+    """将 Any.value 解码为 GoogleAdsFailure，兼容 proto-plus 和原生 protobuf"""
+    failure = client.get_type("GoogleAdsFailure")
+    failure_type = type(failure)
+    if hasattr(failure_type, "deserialize"):
+        return failure_type.deserialize(value)
+    failure.ParseFromString(value)
+    return failure
+
+
+def error_code_name(error):
+    """返回 "类别.名称" 形式的错误码，例如 "policy_finding_error.POLICY_FINDING" """
+    error_code = to_pb(error.error_code)
+    category = error_code.WhichOneof("error_code")
+    if not category:
+        return "UNKNOWN"
+    enum_type = error_code.DESCRIPTOR.fields_by_name[category].enum_type
+    name = enum_type.values_by_number[getattr(error_code, category)].name
+    return f"{category}.{name}"
+
+
+def partial_failure_errors(client, response):
+    """
+    解码响应中的 partial_failure_error
+
+    Returns:
+        {操作索引: [GoogleAdsError, ...]}，没有被拒绝的操作时返回空字典
+    """
+    status = response.partial_failure_error
+    if not status.code:
+        return {}
+    errors = {}
+    for detail in status.details:
+        failure = _deserialize_failure(client, detail.value)
+        for error in failure.errors:
+            # 第一个字段路径元素指向请求中的 operations / mutate_operations
+            field_path_elements = error.location.field_path_elements
+            index = field_path_elements[0].index if field_path_elements else -1
+            errors.setdefault(index, []).append(error)
+    return errors
+
+
+class RejectedOperationLog:
+    """
+    以 JSONL 格式记录被拒绝的操作
+
+    每行包含客户ID、操作类型、请求内索引、错误码和错误消息，以及完整的
+    操作内容，修正后可直接据此重新提交。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, customer_id, operation_field, operation, index, errors):
+        record = {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "customer_id": customer_id,
+            "operation_field": operation_field,
+            "operation_index": index,
+            "errors": [
+                {
+                    "error_code": error_code_name(error),
+                    "message": error.message,
+                    "trigger": to_pb(error.trigger).string_value or None,
+                }
+                for error in errors
+            ],
+            "operation": json_format.MessageToDict(to_pb(operation)),
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.count += 1
+
+
+def handle_partial_failure(
+    client, customer_id, operation_field, response, operations,
+    rejected_log=None
+):
+    """
+    记录部分失败响应中被拒绝的操作
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        operation_field: 操作类型名称，例如 "ad_group_criterion_operation"
+        response: 启用 partial_failure 的 mutate 响应
+        operations: 与请求顺序一致的操作列表（具体类型，未包装）
+        rejected_log: RejectedOperationLog 实例（可选）
+
+    Returns:
+        被拒绝的操作索引集合
+    """
+    errors = partial_failure_errors(client, response)
+    for index, operation_errors in sorted(errors.items()):
+        messages = "; ".join(error.message for error in operation_errors)
+        log_message(
+            f"{operation_field} 第 {index} 个操作被拒绝: {messages}", "WARNING"
+        )
+        if rejected_log is not None and 0 <= index < len(operations):
+            rejected_log.record(
+                customer_id, operation_field, operations[index], index,
+                operation_errors,
+            )
+    if errors:
+        log_message(
+            f"{operation_field}: 提交了 {len(operations) - len(errors)} 个操作，"
+            f"拒绝了 {len(errors)} 个"
+            + (f"（已记录到 {rejected_log.path}）" if rejected_log else "")
+        )
+    return set(errors)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+"""
+通过 GoogleAdsService.search_stream 流式导出 GAQL 报告
+
+原来拉取效果数据的临时脚本把所有行读入内存。这里对每个客户账号执行
+search_stream，服务器每返回一批行（最多 10000 行）就立即按字段路径转换为
+列，追加写入 CSV 或 Parquet（每批一个行组），内存占用只与批大小有关，
+与账号有 1 千行还是 5 千万行关键词×日期数据无关。多个客户账号的查询在
+有界线程池中并发执行，写入同一个输出文件。
+
+列名即 GAQL 中选择的字段路径（例如 campaign.name、metrics.clicks）；
+枚举字段输出名称，重复字段以 "; " 连接。需要区分账号时在 SELECT 中包含
+customer.id（默认查询已包含）。Parquet 需要安装 pyarrow。
+
+用法:
+    python report_export.py --customer_ids 1234567890,9876543210 --output report.parquet
+    python report_export.py --query_file keywords.gaql --output report.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from operator import attrgetter
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from belk_search_ads_creator import log_message
+from operation_factory import get_operation_factory, to_pb
+
+# 默认查询：最近 30 天每个关键词每天的效果
+DEFAULT_QUERY = """
+    SELECT
+      customer.id,
+      campaign.id,
+      campaign.name,
+      ad_group.id,
+      ad_group.name,
+      ad_group_criterion.criterion_id,
+      ad_group_criterion.keyword.text,
+      ad_group_criterion.keyword.match_type,
+      segments.date,
+      metrics.impressions,
+      metrics.clicks,
+      metrics.cost_micros,
+      metrics.conversions
+    FROM keyword_view
+    WHERE segments.date DURING LAST_30_DAYS
+"""
+
+REPORT_FORMATS = ("csv", "parquet")
+
+
+class ReportExportError(ValueError):
+    """报告查询或输出设置无效"""
+
+
+def field_descriptor(row_descriptor, path):
+    """沿字段路径（例如 "ad_group_criterion.keyword.text"）查找字段描述符"""
+    descriptor = row_descriptor
+    field = None
+    for name in path.split("."):
+        if descriptor is None or name not in descriptor.fields_by_name:
+            raise ReportExportError(f"无法识别的字段: {path}")
+        field = descriptor.fields_by_name[name]
+        descriptor = field.message_type
+    return field
+
+
+def _is_repeated(field):
+    return field.label == FieldDescriptor.LABEL_REPEATED
+
+
+class ColumnConverter:
+    """把一批 GoogleAdsRow 中某个字段路径的值转换为一列 Python 值"""
+
+    def __init__(self, row_descriptor, path):
+        self.path = path
+        self.field = field_descriptor(row_descriptor, path)
+        self._get = attrgetter(path)
+        self._enum_names = None
+        if self.field.type == FieldDescriptor.TYPE_ENUM:
+            self._enum_names = {
+                value.number: value.name for value in self.field.enum_type.values
+            }
+
+    @property
+    def kind(self):
+        """列的数据类型: int、float、bool、bytes 或 str"""
+        field = self.field
+        if _is_repeated(field):
+            return "str"
+        if field.cpp_type in (
+            FieldDescriptor.CPPTYPE_INT32, FieldDescriptor.CPPTYPE_INT64,
+            FieldDescriptor.CPPTYPE_UINT32, FieldDescriptor.CPPTYPE_UINT64,
+        ):
+            return "int"
+        if field.cpp_type in (
+            FieldDescriptor.CPPTYPE_DOUBLE, FieldDescriptor.CPPTYPE_FLOAT,
+        ):
+            return "float"
+        if field.cpp_type == FieldDescriptor.CPPTYPE_BOOL:
+            return "bool"
+        if field.type == FieldDescriptor.TYPE_BYTES:
+            return "bytes"
+        return "str"
+
+    def convert(self, rows):
+        values = list(map(self._get, rows))
+        if _is_repeated(self.field):
+            if self._enum_names is not None:
+                names = self._enum_names
+                return ["; ".join(names.get(v, str(v)) for v in value) for value in values]
+            return ["; ".join(map(str, value)) for value in values]
+        if self._enum_names is not None:
+            names = self._enum_names
+            return [names.get(value, str(value)) for value in values]
+        if self.field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+            from google.protobuf import json_format
+            return [json.dumps(json_format.MessageToDict(value)) for value in values]
+        return values
+
+
+class CsvReportWriter:
+    """逐批追加写入 CSV，第一行为字段路径"""
+
+    def __init__(self, path, converters):
+        self.path = path
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([converter.path for converter in converters])
+
+    def write(self, columns):
+        self._writer.writerows(zip(*columns))
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetReportWriter:
+    """逐批写入 Parquet，每批一个行组；列类型由字段描述符决定"""
+
+    def __init__(self, path, converters):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ReportExportError(
+                "导出 Parquet 需要安装 pyarrow: pip install pyarrow"
+            ) from e
+        arrow_types = {
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "bool": pa.bool_(),
+            "bytes": pa.binary(),
+            "str": pa.string(),
+        }
+        self.path = path
+        self._pa = pa
+        self._schema = pa.schema(
+            [(converter.path, arrow_types[converter.kind]) for converter in converters]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, columns):
+        pa = self._pa
+        self._writer.write_batch(
+            pa.record_batch(
+                [
+                    pa.array(column, type=field.type)
+                    for column, field in zip(columns, self._schema)
+                ],
+                schema=self._schema,
+            )
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+REPORT_WRITERS = {"csv": CsvReportWriter, "parquet": ParquetReportWriter}
+
+
+def resolve_report_format(path, report_format=None):
+    """根据参数或文件扩展名确定输出格式"""
+    if report_format is None:
+        report_format = "parquet" if path.endswith(".parquet") else "csv"
+    if report_format not in REPORT_FORMATS:
+        raise ReportExportError(f"不支持的报告格式: {report_format}")
+    return report_format
+
+
+class ReportExporter:
+    """
+    把多个客户账号的 search_stream 结果写入同一个文件
+
+    写入器在收到第一批结果时按字段掩码创建；各线程转换自己的批次，
+    只有写入时持有锁。
+
+    Args:
+        client: 初始化的GoogleAdsClient实例（多线程时应共享服务客户端）
+        query: GAQL 查询
+        path: 输出文件路径
+        report_format: "csv" 或 "parquet"（可选，默认按扩展名判断）
+    """
+
+    def __init__(self, client, query, path, report_format=None):
+        self.client = client
+        self.query = query
+        self.path = path
+        self.report_format = resolve_report_format(path, report_format)
+        self.rows = 0
+        self._row_descriptor = (
+            get_operation_factory(client).pb_type("GoogleAdsRow").DESCRIPTOR
+        )
+        self._converters = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _open(self, paths):
+        converters = [ColumnConverter(self._row_descriptor, path) for path in paths]
+        self._writer = REPORT_WRITERS[self.report_format](self.path, converters)
+        self._converters = converters
+
+    def export_customer(self, customer_id):
+        """流式导出一个客户账号的查询结果，返回写入的行数"""
+        customer_id = customer_id.replace("-", "")
+        googleads_service = self.client.get_service("GoogleAdsService")
+        stream = googleads_service.search_stream(
+            customer_id=customer_id, query=self.query
+        )
+        converters = None
+        rows_written = 0
+        for batch in stream:
+            batch = to_pb(batch)
+            if converters is None:
+                with self._lock:
+                    if self._writer is None:
+                        self._open(list(batch.field_mask.paths))
+                converters = self._converters
+            rows = batch.results
+            if not rows:
+                continue
+            columns = [converter.convert(rows) for converter in converters]
+            with self._lock:
+                self._writer.write(columns)
+                self.rows += len(rows)
+            rows_written += len(rows)
+        log_message(f"客户 ID {customer_id} 导出了 {rows_written} 行")
+        return rows_written
+
+    @property
+    def opened(self):
+        """是否已经收到结果并创建了输出文件"""
+        return self._writer is not None
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def export_report(
+    client, customer_ids, query, path, report_format=None, max_workers=None
+):
+    """
+    并发导出多个客户账号的报告到一个文件
+
+    Returns:
+        (导出的总行数, multi_customer.run_for_customers 的结果字典)
+    """
+    from multi_customer import DEFAULT_MAX_WORKERS, run_for_customers
+
+    exporter = ReportExporter(client, query, path, report_format)
+    try:
+        results = run_for_customers(
+            customer_ids, exporter.export_customer,
+            max_workers or DEFAULT_MAX_WORKERS, action="导出报告",
+        )
+    finally:
+        exporter.close()
+    if not exporter.opened:
+        log_message("没有返回任何结果，未生成报告文件", "WARNING")
+    else:
+        log_message(f"共导出 {exporter.rows} 行到 {path}")
+    return exporter.rows, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="通过 search_stream 流式导出 GAQL 报告")
+    parser.add_argument("-c", "--customer_id", default="525-050-7413", help="Google Ads客户ID")
+    parser.add_argument("--customer_ids", help="逗号分隔的多个客户ID")
+    parser.add_argument("--customer_file", help="每行一个客户ID的文件")
+    parser.add_argument("--query", help="GAQL 查询（默认导出最近 30 天的关键词效果）")
+    parser.add_argument("--query_file", help="包含 GAQL 查询的文件")
+    parser.add_argument("-o", "--output", default="report.csv", help="输出文件（.csv 或 .parquet）")
+    parser.add_argument("--format", choices=REPORT_FORMATS, help="输出格式，默认按扩展名判断")
+    parser.add_argument("--max_workers", type=int, help="最大并发账号数")
+    parser.add_argument("--retries", type=int, default=3, help="单个调用的最大重试次数")
+    args = parser.parse_args()
+
+    query = args.query or DEFAULT_QUERY
+    if args.query_file:
+        with open(args.query_file, "r", encoding="utf-8") as f:
+            query = f.read()
+
+    from multi_customer import SharedServiceClient, log_summary, read_customer_ids
+    customer_ids = read_customer_ids(args.customer_ids, args.customer_file) or [
+        args.customer_id
+    ]
+
+    from ads_config import build_client, load_config
+    from request_scheduler import rate_limited
+    from retry_policy import RetryingClient, RetryPolicy, request_timeout
+    from rpc_metrics import instrumented
+    yaml_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "google-ads.yaml"
+    )
+    config = load_config(yaml_path)
+    client = RetryingClient(
+        rate_limited(
+            instrumented(SharedServiceClient(build_client(config)), config), config
+        ),
+        RetryPolicy(max_attempts=args.retries + 1),
+        request_timeout(config),
+    )
+    _, export_results = export_report(
+        client, customer_ids, query, args.output, args.format, args.max_workers
+    )
+    if log_summary(export_results, title="报告导出汇总"):
+        sys.exit(1)
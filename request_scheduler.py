@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+"""
+跨进程共享的配额感知请求调度
+
+所有任务共用 google-ads.yaml 中的同一个开发者令牌。多个创建和报告任务
+同时运行时会触发 RESOURCE_EXHAUSTED，而每个任务只能各自盲目退避，吞吐量
+在突发和停顿之间来回振荡。这里在每个服务调用之前经过令牌桶：每秒请求数
+和每秒操作数（mutate 请求按操作个数，其他请求按 1 个）各一个桶，桶的状态
+保存在 SQLite 中，同一台机器上的所有进程共享。
+
+令牌以预约方式扣除：令牌不足时扣成负数，调用方等待到欠额补足为止，多个
+进程按到达顺序排队，而不是同时醒来再次争抢。出现配额错误时所有进程共享的
+速率减半（每秒最多一次），服务器建议了重试延迟时所有进程暂停到该时刻；
+之后速率在 recovery_seconds 内线性恢复到配置的上限（AIMD），吞吐量稳定在
+配额上限附近。
+
+在 google-ads.yaml 或环境变量中配置（使用同一个开发者令牌的任务共享预算）:
+    max_requests_per_second: 20        # GOOGLE_ADS_MAX_REQUESTS_PER_SECOND
+    max_operations_per_second: 2000    # GOOGLE_ADS_MAX_OPERATIONS_PER_SECOND
+    rate_limit_file: /tmp/googleads_rate_limit.sqlite3  # 可选
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from belk_search_ads_creator import SAVE_PATH, log_message
+from retry_policy import (
+    _LOCAL_METHOD_PREFIXES,
+    _LOCAL_METHOD_SUFFIXES,
+    failure_error_codes,
+    is_message_size_error,
+    server_retry_delay,
+    status_code_name,
+)
+
+# 默认的共享状态文件
+DEFAULT_RATE_LIMIT_FILE = os.path.join(SAVE_PATH, "rate_limit.sqlite3")
+
+# 桶容量相当于多少秒的配额（允许的突发量）
+DEFAULT_BURST_SECONDS = 1.0
+
+# 配额错误后速率的下降倍数和下限（相对于配置的上限）
+DECREASE_FACTOR = 0.5
+MIN_RATE_FRACTION = 0.05
+
+# 两次降速之间的最小间隔（秒）；同一波配额错误只降一次
+DECREASE_INTERVAL = 1.0
+
+# 速率从零恢复到上限所需的秒数
+DEFAULT_RECOVERY_SECONDS = 60.0
+
+# 请求中包含操作列表的字段
+OPERATION_FIELDS = ("operations", "mutate_operations")
+
+
+def is_quota_error(exception):
+    """
+    是否为配额耗尽错误（quota_error 或服务器限流的 gRPC RESOURCE_EXHAUSTED）
+
+    消息超过 gRPC 大小上限时状态码也是 RESOURCE_EXHAUSTED，但与配额无关，
+    不能因此降低所有进程共享的速率。
+    """
+    if any(
+        category == "quota_error" for category, _ in failure_error_codes(exception)
+    ):
+        return True
+    return (
+        status_code_name(exception) == "RESOURCE_EXHAUSTED"
+        and not is_message_size_error(exception)
+    )
+
+
+def count_operations(args, kwargs):
+    """估算一次调用消耗的操作数：mutate 请求按操作个数，其他请求按 1 个"""
+    request = kwargs.get("request", args[0] if args else None)
+    for source in (kwargs, request):
+        if source is None:
+            continue
+        for field in OPERATION_FIELDS:
+            if isinstance(source, dict):
+                operations = source.get(field)
+            else:
+                operations = getattr(source, field, None)
+            if operations is not None and not isinstance(operations, (str, bytes)):
+                try:
+                    return max(1, len(operations))
+                except TypeError:
+                    # 生成器等无法预先计数的参数
+                    return 1
+    return 1
+
+
+class SharedTokenBucket:
+    """
+    保存在 SQLite 中、多个进程共享的令牌桶
+
+    每个作用域（开发者令牌）有 requests 和 operations 两个桶，各自记录
+    剩余令牌、当前速率和上次更新时间；每次取令牌是一个 BEGIN IMMEDIATE
+    事务，由 SQLite 的文件锁在进程之间串行化。
+
+    Args:
+        path: SQLite 数据库文件路径
+        scope: 共享预算的作用域，通常是开发者令牌的摘要
+        requests_per_second: 每秒请求数上限（None 表示不限制）
+        operations_per_second: 每秒操作数上限（None 表示不限制）
+        burst_seconds: 桶容量相当于多少秒的配额
+        recovery_seconds: 速率从零恢复到上限所需的秒数
+        clock: 时间函数，便于替换
+    """
+
+    def __init__(
+        self, path, scope="default", requests_per_second=None,
+        operations_per_second=None, burst_seconds=DEFAULT_BURST_SECONDS,
+        recovery_seconds=DEFAULT_RECOVERY_SECONDS, clock=time.time
+    ):
+        self.path = path
+        self.scope = scope
+        self.limits = {
+            bucket: rate
+            for bucket, rate in (
+                ("requests", requests_per_second),
+                ("operations", operations_per_second),
+            )
+            if rate
+        }
+        self.burst_seconds = burst_seconds
+        self.recovery_seconds = recovery_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        # 手动管理事务；其他进程持有写锁时最多等待 30 秒
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            " scope TEXT NOT NULL,"
+            " bucket TEXT NOT NULL,"
+            " tokens REAL NOT NULL,"
+            " rate REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " decreased_at REAL NOT NULL DEFAULT 0,"
+            " paused_until REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (scope, bucket))"
+        )
+
+    def _transaction(self, update):
+        """在 BEGIN IMMEDIATE 事务中读取、更新每个桶，返回 update 的最大返回值"""
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                result = 0.0
+                for bucket, limit in self.limits.items():
+                    row = connection.execute(
+                        "SELECT tokens, rate, updated_at, decreased_at, paused_until"
+                        " FROM rate_limit_buckets WHERE scope = ? AND bucket = ?",
+                        (self.scope, bucket),
+                    ).fetchone()
+                    if row is None:
+                        row = (limit * self.burst_seconds, limit, now, 0.0, 0.0)
+                    state = self._refill(limit, now, *row)
+                    result = max(result, update(bucket, limit, now, state))
+                    connection.execute(
+                        "INSERT OR REPLACE INTO rate_limit_buckets"
+                        " (scope, bucket, tokens, rate, updated_at, decreased_at,"
+                        " paused_until) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (self.scope, bucket, state["tokens"], state["rate"], now,
+                         state["decreased_at"], state["paused_until"]),
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return result
+
+    def _refill(self, limit, now, tokens, rate, updated_at, decreased_at, paused_until):
+        """按经过的时间补充令牌，并线性恢复速率（不超过本进程配置的上限）"""
+        elapsed = max(0.0, now - updated_at)
+        rate = min(limit, rate + limit * elapsed / self.recovery_seconds)
+        capacity = max(limit * self.burst_seconds, 1.0)
+        return {
+            "tokens": min(capacity, tokens + elapsed * rate),
+            "rate": rate,
+            "decreased_at": decreased_at,
+            "paused_until": paused_until,
+        }
+
+    def acquire(self, operations=1):
+        """
+        预约一个请求和 operations 个操作的令牌
+
+        Returns:
+            发送请求前需要等待的秒数（0 表示可以立即发送）
+        """
+        amounts = {"requests": 1, "operations": operations}
+
+        def take(bucket, limit, now, state):
+            state["tokens"] -= amounts[bucket]
+            wait = state["paused_until"] - now
+            if state["tokens"] < 0:
+                wait = max(wait, -state["tokens"] / state["rate"])
+            return wait
+
+        return self._transaction(take)
+
+    def throttle(self, delay=None):
+        """
+        报告一次配额错误：降低共享速率，清空剩余令牌
+
+        Args:
+            delay: 服务器建议的重试延迟（秒），所有进程暂停到该时刻
+
+        Returns:
+            降速后的请求速率（没有请求桶时为操作速率）
+        """
+        rates = {}
+
+        def decrease(bucket, limit, now, state):
+            if now - state["decreased_at"] >= DECREASE_INTERVAL:
+                state["rate"] = max(
+                    limit * MIN_RATE_FRACTION, state["rate"] * DECREASE_FACTOR
+                )
+                state["decreased_at"] = now
+            state["tokens"] = min(state["tokens"], 0.0)
+            if delay:
+                state["paused_until"] = max(state["paused_until"], now + delay)
+            rates[bucket] = state["rate"]
+            return 0.0
+
+        self._transaction(decrease)
+        return rates.get("requests", rates.get("operations"))
+
+    def rates(self):
+        """返回 {桶: 当前共享速率}（包含到现在为止的恢复）"""
+        rates = {}
+
+        def collect(bucket, limit, now, state):
+            rates[bucket] = state["rate"]
+            return 0.0
+
+        self._transaction(collect)
+        return rates
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class RequestScheduler:
+    """
+    在每个服务调用之前从共享令牌桶取令牌，并在配额错误时降速
+
+    Args:
+        bucket: SharedTokenBucket 实例
+        sleep: 休眠函数，便于替换
+    """
+
+    def __init__(self, bucket, sleep=time.sleep):
+        self.bucket = bucket
+        self.sleep = sleep
+        self.stats = {"requests": 0, "operations": 0, "waited": 0.0, "throttled": 0}
+        self._stats_lock = threading.Lock()
+
+    def call(self, fn, args, kwargs, description):
+        operations = count_operations(args, kwargs)
+        wait = self.bucket.acquire(operations)
+        if wait > 0:
+            self.sleep(wait)
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["operations"] += operations
+            self.stats["waited"] += max(wait, 0.0)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if is_quota_error(e):
+                rate = self.bucket.throttle(server_retry_delay(e))
+                with self._stats_lock:
+                    self.stats["throttled"] += 1
+                log_message(
+                    f"{description} 遇到配额错误，共享速率降至 {rate:.1f}/秒",
+                    "WARNING",
+                )
+            raise
+
+
+class _RateLimitedService:
+    """服务客户端包装器：每个发起请求的方法都先经过调度器"""
+
+    def __init__(self, service, scheduler, service_name):
+        self._service = service
+        self._scheduler = scheduler
+        self._service_name = service_name
+
+    def __getattr__(self, name):
+        attribute = getattr(self._service, name)
+        if (
+            not callable(attribute)
+            or name.startswith("_")
+            or name.startswith(_LOCAL_METHOD_PREFIXES)
+            or name.endswith(_LOCAL_METHOD_SUFFIXES)
+        ):
+            return attribute
+
+        def call_with_rate_limit(*args, **kwargs):
+            return self._scheduler.call(
+                attribute, args, kwargs, f"{self._service_name}.{name}"
+            )
+
+        return call_with_rate_limit
+
+
+class RateLimitedClient:
+    """
+    GoogleAdsClient 包装器：get_service 返回的服务调用经过共享令牌桶
+
+    应放在 RetryingClient 之内，使每次重试也重新取令牌：
+        RetryingClient(RateLimitedClient(client, scheduler), policy)
+    其余属性直接委托给原始客户端。
+    """
+
+    def __init__(self, client, scheduler):
+        self._client = client
+        self.scheduler = scheduler
+
+    def get_service(self, name, *args, **kwargs):
+        return _RateLimitedService(
+            self._client.get_service(name, *args, **kwargs),
+            self.scheduler,
+            name,
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def rate_limited(client, config):
+    """
+    按配置为客户端加上共享速率限制；没有配置任何上限时原样返回
+
+    Args:
+        client: GoogleAdsClient（或其包装器）
+        config: ads_config.load_config() 返回的配置字典
+    """
+    requests_per_second = config.get("max_requests_per_second")
+    operations_per_second = config.get("max_operations_per_second")
+    if not requests_per_second and not operations_per_second:
+        return client
+    path = config.get("rate_limit_file") or DEFAULT_RATE_LIMIT_FILE
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # 配额按开发者令牌计算，使用同一个令牌的进程共享一个作用域
+    scope = hashlib.sha256(
+        str(config.get("developer_token", "")).encode("utf-8")
+    ).hexdigest()[:16]
+    bucket = SharedTokenBucket(
+        path, scope, requests_per_second, operations_per_second
+    )
+    log_message(
+        "启用共享速率限制: "
+        + ", ".join(
+            f"{label} {value}/秒"
+            for label, value in (
+                ("请求", requests_per_second), ("操作", operations_per_second),
+            )
+            if value
+        )
+        + f"（{path}）"
+    )
+    return RateLimitedClient(client, RequestScheduler(bucket))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+"""
+基于 gRPC 状态码的重试策略
+
+原来的重试逻辑在 str(ex) 中匹配 "failed to connect"、"timeout" 等字符串，
+固定间隔后从头重新运行整个 main()。这里按 gRPC 状态码和 GoogleAdsFailure
+错误码判断是否可重试，使用带抖动的指数退避，优先采用服务器返回的重试
+延迟，并通过 RetryingClient 包装每一个服务调用，而不是整个流水线。
+"""
+
+import random
+import time
+
+from belk_search_ads_creator import log_message
+
+# 可重试的 gRPC 状态码
+RETRYABLE_STATUS_CODES = frozenset(
+    {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "INTERNAL"}
+)
+
+# 可重试的 GoogleAdsFailure 错误码，以 (错误类别, 错误名称) 表示
+RETRYABLE_ERROR_CODES = frozenset(
+    {
+        ("quota_error", "RESOURCE_EXHAUSTED"),
+        ("quota_error", "RESOURCE_TEMPORARILY_EXHAUSTED"),
+        ("internal_error", "INTERNAL_ERROR"),
+        ("internal_error", "TRANSIENT_ERROR"),
+        ("internal_error", "DEADLINE_EXCEEDED"),
+        ("database_error", "CONCURRENT_MODIFICATION"),
+    }
+)
+
+# 请求或响应超过 gRPC 消息大小上限时的错误描述（状态码同样是
+# RESOURCE_EXHAUSTED，但重试永远不会成功，也不是配额问题）
+MESSAGE_SIZE_ERROR_MARKERS = ("message larger than max",)
+
+# 服务方法中不发起请求的辅助方法前缀，不需要包装
+_LOCAL_METHOD_PREFIXES = ("parse_", "common_")
+_LOCAL_METHOD_SUFFIXES = ("_path",)
+# 流式方法（search_stream）的截止时间覆盖整个流，读取大账号可能远超单次
+# 调用的超时，不使用配置的 timeout
+_STREAMING_METHOD_SUFFIXES = ("_stream",)
+
+
+def status_code_name(exception):
+    """提取异常对应的 gRPC 状态码名称，无法识别时返回 None"""
+    # GoogleAdsException: ex.error 是原始的 grpc.Call
+    error = getattr(exception, "error", None)
+    if error is not None and callable(getattr(error, "code", None)):
+        return error.code().name
+    # grpc.RpcError
+    if callable(getattr(exception, "code", None)):
+        code = exception.code()
+        return getattr(code, "name", None)
+    # google.api_core.exceptions.GoogleAPICallError
+    grpc_status_code = getattr(exception, "grpc_status_code", None)
+    if grpc_status_code is not None:
+        return grpc_status_code.name
+    return None
+
+
+def status_details(exception):
+    """提取异常对应的 gRPC 错误描述，无法识别时返回空字符串"""
+    for call in (getattr(exception, "error", None), exception):
+        details = getattr(call, "details", None)
+        if callable(details):
+            return details() or ""
+    # google.api_core.exceptions.GoogleAPICallError
+    return getattr(exception, "message", None) or ""
+
+
+def is_message_size_error(exception):
+    """是否为超过 gRPC 消息大小上限的 RESOURCE_EXHAUSTED 错误"""
+    if status_code_name(exception) != "RESOURCE_EXHAUSTED":
+        return False
+    details = status_details(exception)
+    return any(marker in details for marker in MESSAGE_SIZE_ERROR_MARKERS)
+
+
+def failure_error_codes(exception):
+    """返回 GoogleAdsFailure 中的 (错误类别, 错误名称) 列表"""
+    failure = getattr(exception, "failure", None)
+    if failure is None:
+        return []
+    codes = []
+    for error in failure.errors:
+        error_code = error.error_code
+        category = type(error_code).pb(error_code).WhichOneof("error_code")
+        if category:
+            codes.append((category, getattr(error_code, category).name))
+    return codes
+
+
+def server_retry_delay(exception):
+    """读取服务器建议的重试延迟（秒），没有时返回 None"""
+    failure = getattr(exception, "failure", None)
+    if failure is not None:
+        for error in failure.errors:
+            retry_delay = error.details.quota_error_details.retry_delay
+            # proto-plus 将 Duration 转换为 timedelta，原生 protobuf 则保持 Duration
+            if hasattr(retry_delay, "total_seconds"):
+                seconds = retry_delay.total_seconds()
+            else:
+                seconds = retry_delay.seconds + retry_delay.nanos / 1e9
+            if seconds:
+                return seconds
+
+    # 标准的 google.rpc.RetryInfo 放在尾部元数据中。GoogleAdsException 的
+    # 原始调用在 ex.error；GAPIC 重新映射的 api_core 异常则在 ex.response
+    for call in (
+        getattr(exception, "error", None),
+        getattr(exception, "response", None),
+        exception,
+    ):
+        trailing_metadata = getattr(call, "trailing_metadata", None)
+        if not callable(trailing_metadata):
+            continue
+        for key, value in trailing_metadata() or ():
+            if key == "google.rpc.retryinfo-bin":
+                from google.rpc import error_details_pb2
+
+                retry_info = error_details_pb2.RetryInfo.FromString(value)
+                return (
+                    retry_info.retry_delay.seconds
+                    + retry_info.retry_delay.nanos / 1e9
+                )
+    return None
+
+
+def request_timeout(config):
+    """配置中的 timeout（毫秒）换算为 gRPC 调用的 timeout 参数（秒）"""
+    return config["timeout"] / 1000 if config.get("timeout") else None
+
+
+class RetryPolicy:
+    """
+    指数退避 + 全抖动的重试策略
+
+    Args:
+        max_attempts: 每个调用的最大尝试次数（包括第一次）
+        initial_delay: 首次重试的退避上限（秒）
+        max_delay: 单次退避的最大值（秒）
+        multiplier: 每次重试退避上限的增长倍数
+        sleep: 休眠函数，便于替换
+    """
+
+    def __init__(
+        self, max_attempts=4, initial_delay=1.0, max_delay=60.0,
+        multiplier=2.0, sleep=time.sleep
+    ):
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.sleep = sleep
+
+    def is_retryable(self, exception):
+        """根据 gRPC 状态码或 GoogleAdsFailure 错误码判断是否可重试"""
+        if is_message_size_error(exception):
+            return False
+        if status_code_name(exception) in RETRYABLE_STATUS_CODES:
+            return True
+        return any(
+            code in RETRYABLE_ERROR_CODES
+            for code in failure_error_codes(exception)
+        )
+
+    def backoff(self, attempt, exception=None):
+        """第 attempt 次重试前的等待时间；服务器给出延迟时以其为下限"""
+        ceiling = min(
+            self.max_delay, self.initial_delay * self.multiplier ** attempt
+        )
+        delay = random.uniform(0, ceiling)
+        if exception is not None:
+            suggested = server_retry_delay(exception)
+            if suggested is not None:
+                delay = max(delay, suggested)
+        return delay
+
+    def call(self, fn, *args, description=None, **kwargs):
+        """执行 fn，遇到可重试的错误时退避后重试"""
+        description = description or getattr(fn, "__name__", "调用")
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.max_attempts or not self.is_retryable(e):
+                    raise
+                delay = self.backoff(attempt - 1, e)
+                log_message(
+                    f"{description} 失败（{status_code_name(e) or type(e).__name__}），"
+                    f"{delay:.1f} 秒后进行第 {attempt} 次重试",
+                    "WARNING",
+                )
+                self.sleep(delay)
+
+
+class _RetryingService:
+    """服务客户端包装器：每个发起请求的方法都经过重试策略"""
+
+    def __init__(self, service, policy, service_name, timeout=None):
+        self._service = service
+        self._policy = policy
+        self._service_name = service_name
+        self._timeout = timeout
+
+    def __getattr__(self, name):
+        attribute = getattr(self._service, name)
+        if (
+            not callable(attribute)
+            or name.startswith("_")
+            or name.startswith(_LOCAL_METHOD_PREFIXES)
+            or name.endswith(_LOCAL_METHOD_SUFFIXES)
+        ):
+            return attribute
+        timeout = (
+            None if name.endswith(_STREAMING_METHOD_SUFFIXES) else self._timeout
+        )
+
+        def call_with_retry(*args, **kwargs):
+            if timeout is not None:
+                # 每次尝试各自的 gRPC 截止时间，调用方显式传入时以调用方为准
+                kwargs.setdefault("timeout", timeout)
+            return self._policy.call(
+                attribute, *args,
+                description=f"{self._service_name}.{name}",
+                **kwargs,
+            )
+
+        return call_with_retry
+
+
+class RetryingClient:
+    """
+    GoogleAdsClient 包装器：get_service 返回的服务按调用粒度重试
+
+    timeout（秒，可选）作为每次服务调用的 gRPC timeout 参数，通常取配置中的
+    timeout 毫秒数 / 1000（见 request_timeout）；流式方法（search_stream）
+    不设截止时间。其余属性（get_type、enums、
+    copy_from 等）直接委托给原始客户端。
+    """
+
+    def __init__(self, client, policy, timeout=None):
+        self._client = client
+        self.retry_policy = policy
+        self.timeout = timeout
+
+    def get_service(self, name, *args, **kwargs):
+        return _RetryingService(
+            self._client.get_service(name, *args, **kwargs),
+            self.retry_policy,
+            name,
+            self.timeout,
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
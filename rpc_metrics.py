@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+"""
+逐个 RPC 的调用统计（gRPC 客户端拦截器）
+
+日志时间戳只精确到秒，看不出时间花在哪里：ad_creation_log.txt 中 20 多秒的
+停顿既可能是连接超时，也可能是很慢的 mutate。这里在 GoogleAdsClient 创建的
+每个 gRPC 通道上加一个拦截器，按服务方法（mutate_campaigns、
+mutate_ad_group_criteria、suggest_geo_target_constants 等）记录调用次数、
+操作数、请求/响应字节数、状态码，以及 HDR 式对数分桶的耗时直方图。
+
+进程退出时和收到 SIGUSR1 时写出两个文件：Prometheus 文本格式（可放在
+node_exporter 的 textfile 目录）和同名的 .json 汇总（每个方法的 p50/p90/
+p99/p999/最大耗时）。耗时超过 slow_rpc_seconds 的调用立即记一条警告日志。
+
+在 google-ads.yaml 或环境变量中配置（每个进程使用不同的文件）:
+    metrics_file: /tmp/googleads_rpc.prom   # GOOGLE_ADS_METRICS_FILE
+    slow_rpc_seconds: 10                    # GOOGLE_ADS_SLOW_RPC_SECONDS
+belk_search_ads_creator.py 也可以用 --metrics_file 指定。
+
+    kill -USR1 <pid>    # 不中断进程，立即写出当前统计
+"""
+
+import atexit
+import json
+import os
+import re
+import signal
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import grpc
+
+from belk_search_ads_creator import log_message
+from request_scheduler import OPERATION_FIELDS
+from retry_policy import status_code_name
+
+# 耗时超过该秒数的调用记一条警告日志
+DEFAULT_SLOW_RPC_SECONDS = 10.0
+
+# 直方图每个 2 的幂区间细分的桶数（2^7=128，相对误差不超过 1/64）
+SUB_BUCKET_BITS = 7
+
+# Prometheus 直方图的桶上限（秒）；内部直方图的精度更高，导出时合并到这些桶
+PROMETHEUS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300,
+)
+
+# JSON 汇总中列出的分位数
+SUMMARY_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99, "p999": 0.999}
+
+_METHOD_PATTERN = re.compile(r"^/(?:.*\.)?([^./]+)/([^/]+)$")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+class LatencyHistogram:
+    """
+    HDR 式耗时直方图（微秒为单位的对数-线性分桶）
+
+    小于 2^SUB_BUCKET_BITS 微秒的值每微秒一个桶；更大的值在每个 2 的幂区间内
+    再均分成 2^(SUB_BUCKET_BITS-1) 个桶，因此无论是 1 毫秒还是 60 秒，分位数
+    的相对误差都不超过 1/2^(SUB_BUCKET_BITS-1)，内存只与实际出现的桶数有关。
+    """
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        self._sub_bucket_bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self.counts = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self._sub_bucket_bits)
+        return shift * self._half + (value >> shift)
+
+    def _bounds(self, index):
+        """桶覆盖的整数区间 [lower, upper)"""
+        if index < 2 * self._half:
+            return index, index + 1
+        shift = index // self._half - 1
+        mantissa = index - shift * self._half
+        return mantissa << shift, (mantissa + 1) << shift
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value
+        self.max_us = max(self.max_us, value)
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+
+    def buckets(self):
+        """按值从小到大返回 (桶内最大值微秒, 计数)"""
+        for index in sorted(self.counts):
+            yield min(self._bounds(index)[1] - 1, self.max_us), self.counts[index]
+
+    def value_at_quantile(self, quantile):
+        """返回分位数对应的耗时（秒），按桶内最大值计算，不会低估"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(quantile * self.count + 0.5))
+        seen = 0
+        for highest, count in self.buckets():
+            seen += count
+            if seen >= rank:
+                return highest / 1_000_000
+        return self.max_us / 1_000_000
+
+    def cumulative_counts(self, bounds):
+        """每个上限（秒）以内的累计调用数，用于导出 Prometheus 直方图"""
+        cumulative = []
+        buckets = list(self.buckets())
+        position = seen = 0
+        for bound in bounds:
+            while position < len(buckets) and buckets[position][0] <= bound * 1_000_000:
+                seen += buckets[position][1]
+                position += 1
+            cumulative.append(seen)
+        return cumulative
+
+
+class MethodStats:
+    """一个服务方法的累计统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.operations = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.codes = Counter()
+        self.latency = LatencyHistogram()
+
+
+def parse_method(full_method):
+    """
+    将 gRPC 方法路径拆成 (服务名, 方法名)
+
+    例如 /google.ads.googleads.v19.services.CampaignService/MutateCampaigns
+    → ("CampaignService", "mutate_campaigns")，与 Python 客户端的方法名一致。
+    """
+    match = _METHOD_PATTERN.match(full_method or "")
+    if not match:
+        return "unknown", full_method or "unknown"
+    service, method = match.groups()
+    return service, _CAMEL_BOUNDARY.sub("_", method).lower()
+
+
+def message_size(message):
+    """protobuf 消息序列化后的字节数（同时支持 proto-plus 和原生消息）"""
+    if message is None:
+        return 0
+    byte_size = getattr(message, "ByteSize", None)
+    if byte_size is None:
+        # proto-plus 消息：取底层的原生消息
+        return type(message).pb(message).ByteSize()
+    return byte_size()
+
+
+def count_request_operations(request):
+    """请求中的操作个数，不是 mutate 请求时为 0"""
+    for field in OPERATION_FIELDS:
+        operations = getattr(request, field, None)
+        if operations is not None:
+            return len(operations)
+    return 0
+
+
+def _write_atomic(path, text):
+    """先写临时文件再重命名，采集方不会读到写了一半的文件"""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(
+        f'{name}="{_label_value(value)}"' for name, value in labels.items()
+    ) + "}"
+
+
+class RpcMetrics:
+    """
+    线程安全的逐方法 RPC 统计
+
+    Args:
+        slow_rpc_seconds: 耗时超过该秒数的调用记警告日志，None 表示不记录
+    """
+
+    def __init__(self, slow_rpc_seconds=DEFAULT_SLOW_RPC_SECONDS):
+        self.slow_rpc_seconds = slow_rpc_seconds
+        self.started_at = time.time()
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, full_method, code, elapsed, operations=0, request_bytes=0,
+        response_bytes=0,
+    ):
+        """记录一次调用；code 为 gRPC 状态码名称"""
+        key = parse_method(full_method)
+        with self._lock:
+            stats = self._methods.get(key)
+            if stats is None:
+                stats = self._methods[key] = MethodStats()
+            stats.calls += 1
+            stats.operations += operations
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            stats.codes[code] += 1
+            stats.latency.record(elapsed)
+        if self.slow_rpc_seconds is not None and elapsed >= self.slow_rpc_seconds:
+            log_message(
+                f"慢调用: {key[0]}.{key[1]} 耗时 {elapsed:.1f} 秒，状态 {code}",
+                "WARNING",
+                service=key[0],
+                method=key[1],
+                status=code,
+                elapsed=round(elapsed, 3),
+            )
+
+    def summary(self):
+        """JSON 汇总：每个方法的计数、字节数、状态码和耗时分位数（毫秒）"""
+        with self._lock:
+            methods = {}
+            for (service, method), stats in sorted(self._methods.items()):
+                latency = stats.latency
+                methods[f"{service}.{method}"] = {
+                    "calls": stats.calls,
+                    "operations": stats.operations,
+                    "request_bytes": stats.request_bytes,
+                    "response_bytes": stats.response_bytes,
+                    "codes": dict(stats.codes),
+                    "latency_ms": {
+                        **{
+                            label: round(latency.value_at_quantile(quantile) * 1000, 3)
+                            for label, quantile in SUMMARY_QUANTILES.items()
+                        },
+                        "mean": round(latency.total_us / latency.count / 1000, 3),
+                        "min": round((latency.min_us or 0) / 1000, 3),
+                        "max": round(latency.max_us / 1000, 3),
+                        "total": round(latency.total_us / 1000, 3),
+                    },
+                }
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "calls": sum(item["calls"] for item in methods.values()),
+            "methods": methods,
+        }
+
+    def prometheus_text(self):
+        """Prometheus 文本格式（textfile collector 可直接读取）"""
+        families = [
+            ("googleads_rpc_calls_total", "counter", "按状态码统计的 RPC 调用次数"),
+            ("googleads_rpc_operations_total", "counter", "mutate 请求中的操作数"),
+            ("googleads_rpc_request_bytes_total", "counter", "请求消息的序列化字节数"),
+            ("googleads_rpc_response_bytes_total", "counter", "响应消息的序列化字节数"),
+            ("googleads_rpc_latency_seconds", "histogram", "RPC 耗时（秒）"),
+        ]
+        samples = {name: [] for name, _, _ in families}
+        with self._lock:
+            for (service, method), stats in sorted(self._methods.items()):
+                labels = {"service": service, "method": method}
+                for code, calls in sorted(stats.codes.items()):
+                    samples["googleads_rpc_calls_total"].append(
+                        f"googleads_rpc_calls_total{_labels(**labels, code=code)} {calls}"
+                    )
+                for name, value in (
+                    ("googleads_rpc_operations_total", stats.operations),
+                    ("googleads_rpc_request_bytes_total", stats.request_bytes),
+                    ("googleads_rpc_response_bytes_total", stats.response_bytes),
+                ):
+                    samples[name].append(f"{name}{_labels(**labels)} {value}")
+                histogram = samples["googleads_rpc_latency_seconds"]
+                latency = stats.latency
+                for bound, cumulative in zip(
+                    PROMETHEUS_BUCKETS, latency.cumulative_counts(PROMETHEUS_BUCKETS)
+                ):
+                    histogram.append(
+                        "googleads_rpc_latency_seconds_bucket"
+                        f"{_labels(**labels, le=bound)} {cumulative}"
+                    )
+                histogram.append(
+                    "googleads_rpc_latency_seconds_bucket"
+                    f"{_labels(**labels, le='+Inf')} {latency.count}"
+                )
+                histogram.append(
+                    "googleads_rpc_latency_seconds_sum"
+                    f"{_labels(**labels)} {latency.total_us / 1_000_000}"
+                )
+                histogram.append(
+                    "googleads_rpc_latency_seconds_count"
+                    f"{_labels(**labels)} {latency.count}"
+                )
+        lines = []
+        for name, metric_type, help_text in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples[name])
+        return "\n".join(lines) + "\n"
+
+    def dump(self, metrics_file):
+        """写出 Prometheus 文本文件和同名的 .json 汇总，返回 JSON 文件路径"""
+        directory = os.path.dirname(os.path.abspath(metrics_file))
+        os.makedirs(directory, exist_ok=True)
+        json_file = os.path.splitext(metrics_file)[0] + ".json"
+        _write_atomic(metrics_file, self.prometheus_text())
+        _write_atomic(
+            json_file, json.dumps(self.summary(), ensure_ascii=False, indent=2)
+        )
+        return json_file
+
+    def dump_on_exit(self, metrics_file, signum=getattr(signal, "SIGUSR1", None)):
+        """进程退出时写出统计；在主线程调用时同时注册 signum 信号立即写出"""
+
+        def dump():
+            try:
+                json_file = self.dump(metrics_file)
+            except OSError as e:
+                log_message(f"写出 RPC 统计失败: {e}", "ERROR")
+                return
+            log_message(f"RPC 统计已写出到 {metrics_file} 和 {json_file}")
+
+        atexit.register(dump)
+        if signum is not None and threading.current_thread() is threading.main_thread():
+            # 信号处理函数在主线程中执行，主线程可能正持有统计锁，另开线程写出
+            signal.signal(
+                signum,
+                lambda *_: threading.Thread(target=dump, daemon=True).start(),
+            )
+
+
+class _MeasuredStream:
+    """服务端流式响应的包装器：流结束或出错时记录整个流的耗时和字节数"""
+
+    def __init__(self, call, finish):
+        self._call = call
+        self._finish = finish
+        self._response_bytes = 0
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            message = next(self._call)
+        except StopIteration:
+            self._complete("OK")
+            raise
+        except Exception as e:
+            self._complete(status_code_name(e) or type(e).__name__)
+            raise
+        self._response_bytes += message_size(message)
+        return message
+
+    def _complete(self, code):
+        if not self._done:
+            self._done = True
+            self._finish(code, self._response_bytes)
+
+    def __getattr__(self, name):
+        return getattr(self._call, name)
+
+
+class MetricsInterceptor(
+    grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor
+):
+    """
+    记录每次调用的 gRPC 客户端拦截器
+
+    放在拦截器链最外层，耗时包括库自带的元数据、日志和异常拦截器，但不包括
+    调用之前的速率限制等待和重试之间的退避（每次重试单独记录）。流式调用
+    （search_stream）的耗时从发起到读完最后一个响应。
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        started = time.perf_counter()
+        operations = count_request_operations(request)
+        request_bytes = message_size(request)
+        try:
+            response = continuation(client_call_details, request)
+            # 阻塞调用时 continuation 返回前调用已经完成
+            exception = response.exception()
+        except Exception as e:
+            exception, response = e, None
+        code = "OK"
+        response_bytes = 0
+        if exception is not None:
+            code = status_code_name(exception) or type(exception).__name__
+        else:
+            response_bytes = message_size(response.result())
+        self.metrics.record(
+            client_call_details.method,
+            code,
+            time.perf_counter() - started,
+            operations,
+            request_bytes,
+            response_bytes,
+        )
+        if response is None:
+            raise exception
+        return response
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        started = time.perf_counter()
+        request_bytes = message_size(request)
+
+        def finish(code, response_bytes):
+            self.metrics.record(
+                client_call_details.method,
+                code,
+                time.perf_counter() - started,
+                0,
+                request_bytes,
+                response_bytes,
+            )
+
+        try:
+            call = continuation(client_call_details, request)
+        except Exception as e:
+            finish(status_code_name(e) or type(e).__name__, 0)
+            raise
+        return _MeasuredStream(call, finish)
+
+
+class InstrumentedClient:
+    """
+    GoogleAdsClient 包装器：get_service 创建的通道都带上统计拦截器
+
+    必须直接包装 GoogleAdsClient 或 multi_customer.SharedServiceClient（在
+    RateLimitedClient 之内），拦截器通过 get_service 的 interceptors 参数
+    传入。其余属性直接委托给原始客户端。
+    """
+
+    def __init__(self, client, interceptor):
+        self._client = client
+        self.interceptor = interceptor
+
+    def get_service(self, name, *args, **kwargs):
+        kwargs["interceptors"] = [self.interceptor] + list(
+            kwargs.get("interceptors") or []
+        )
+        return self._client.get_service(name, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrumented(client, config):
+    """
+    按配置为客户端加上逐 RPC 统计；没有配置 metrics_file 时原样返回
+
+    Args:
+        client: GoogleAdsClient
+        config: ads_config.load_config() 返回的配置字典
+    """
+    metrics_file = config.get("metrics_file")
+    if not metrics_file:
+        return client
+    metrics = RpcMetrics(config.get("slow_rpc_seconds", DEFAULT_SLOW_RPC_SECONDS))
+    metrics.dump_on_exit(metrics_file)
+    log_message(
+        f"记录逐 RPC 统计，退出时（或收到 SIGUSR1 时）写出到 {metrics_file}"
+    )
+    return InstrumentedClient(client, MetricsInterceptor(metrics))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+可恢复的创建步骤日志
+
+将每个已完成的流水线步骤及其返回的资源名称持久化到 SQLite，按运行 ID
+和客户ID区分。重试或使用 --resume <run_id> 重新运行时，已完成的步骤直接
+返回记录的资源名称，只重新发送剩余的操作，避免留下孤立的预算/广告系列
+或重复创建。
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from belk_search_ads_creator import log_message
+
+
+class RunJournal:
+    """
+    按 (run_id, customer_id, step) 记录已完成步骤的 SQLite 日志
+
+    Args:
+        path: SQLite 数据库文件路径
+        run_id: 要恢复的运行 ID；不提供时生成新的运行 ID
+    """
+
+    def __init__(self, path, run_id=None):
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        # 多账号模式下多个线程共享同一个连接，由锁串行化访问
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS completed_steps ("
+                " run_id TEXT NOT NULL,"
+                " customer_id TEXT NOT NULL,"
+                " step TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " completed_at TEXT NOT NULL,"
+                " PRIMARY KEY (run_id, customer_id, step))"
+            )
+
+    def get(self, customer_id, step):
+        """返回已完成步骤记录的结果；步骤未完成时返回 None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM completed_steps"
+                " WHERE run_id = ? AND customer_id = ? AND step = ?",
+                (self.run_id, _normalize(customer_id), step),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record(self, customer_id, step, result):
+        """记录已完成的步骤及其结果（资源名称或资源名称列表）"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completed_steps"
+                " (run_id, customer_id, step, result, completed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.run_id,
+                    _normalize(customer_id),
+                    step,
+                    json.dumps(result),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+
+    def run_step(self, customer_id, step, fn):
+        """步骤已完成时返回记录的结果，否则执行 fn() 并记录其结果"""
+        result = self.get(customer_id, step)
+        if result is not None:
+            log_message(f"跳过已完成的步骤 {step}（运行 {self.run_id}）")
+            return result
+        result = fn()
+        self.record(customer_id, step, result)
+        return result
+
+    def completed_steps(self, customer_id=None):
+        """列出本次运行已完成的步骤"""
+        query = (
+            "SELECT customer_id, step, completed_at FROM completed_steps"
+            " WHERE run_id = ?"
+        )
+        params = [self.run_id]
+        if customer_id is not None:
+            query += " AND customer_id = ?"
+            params.append(_normalize(customer_id))
+        with self._lock:
+            return self._connection.execute(
+                query + " ORDER BY completed_at, rowid", params
+            ).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+
+def _normalize(customer_id):
+    return customer_id.replace("-", "")
@@ -11,16 +11,15 @@ import argparse
 import json
 from datetime import datetime
 
+from ads_logging import get_logger
+
 # 日志文件路径
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(SCRIPT_DIR, "service_account_setup.log")
 
-def log_message(message):
-    """将消息记录到日志文件"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a") as f:
-        f.write(f"[{timestamp}] {message}\n")
-    print(message)
+def log_message(message, level="INFO", **fields):
+    """将消息记录到日志文件（由后台线程批量写入）"""
+    get_logger(LOG_FILE).log(message, level, **fields)
 
 def setup_service_account(key_file_path, developer_token=None, customer_id="5250507413"):
     """设置服务账号配置"""
@@ -105,6 +104,20 @@ login_timezone: "America/New_York"
         log_message(f"创建配置文件时出错: {str(e)}")
         return False
 
+def verify_service_account(key_file_path):
+    """通过共享令牌缓存换取一次访问令牌，验证密钥可用并预热缓存"""
+    try:
+        from google.auth.transport.requests import Request
+        from token_cache import cached_credentials
+
+        credentials = cached_credentials({"json_key_file_path": key_file_path})
+        credentials.refresh(Request())
+        log_message(f"成功获取访问令牌，有效期至 {credentials.expiry} (UTC)")
+        return True
+    except Exception as e:
+        log_message(f"获取访问令牌失败: {str(e)}")
+        return False
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Google Ads API 服务账号设置助手")
     parser.add_argument(
@@ -124,6 +137,11 @@ if __name__ == "__main__":
         default="525-050-7413",
         help="Google Ads 客户 ID"
     )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="创建配置后换取一次访问令牌，验证密钥并写入共享令牌缓存"
+    )
     
     args = parser.parse_args()
     
@@ -131,4 +149,5 @@ if __name__ == "__main__":
     with open(LOG_FILE, "w") as f:
         f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始服务账号设置日志\n")
         
-    setup_service_account(args.key_file, args.developer_token, args.customer_id)
+    if setup_service_account(args.key_file, args.developer_token, args.customer_id) and args.verify:
+        verify_service_account(args.key_file)
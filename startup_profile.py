@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+命令行启动耗时分析
+
+在新的解释器中以 python -X importtime 导入 belk_search_ads_creator 以及
+子命令用到的模块（见 belk_search_ads_creator.COMMAND_MODULES），解析每个
+模块的自身耗时和累计耗时，按模块和顶层包汇总。只导入、不执行命令，不需要
+网络和凭据。
+
+用法:
+    python belk_search_ads_creator.py --profile_startup mock
+    python startup_profile.py validate --top 30
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import NamedTuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ImportRecord(NamedTuple):
+    """-X importtime 的一行：模块、自身耗时、累计耗时（微秒）、嵌套深度"""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output):
+    """解析 -X importtime 写到标准错误的输出"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 表头行
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        records.append(ImportRecord(
+            stripped,
+            int(fields[0]),
+            int(fields[1]),
+            (len(name) - len(stripped) - 1) // 2,
+        ))
+    return records
+
+
+def command_import_code(command):
+    """在子进程中导入子命令用到的模块的代码"""
+    code = "import belk_search_ads_creator"
+    if command:
+        code += f"; belk_search_ads_creator.import_command_modules({command!r})"
+    return code
+
+
+def run_import(code, importtime=False, python=None):
+    """
+    在新的解释器中执行导入代码
+
+    Returns:
+        (墙钟耗时秒数, 标准错误输出)
+    """
+    command = [python or sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    started = time.perf_counter()
+    result = subprocess.run(
+        command + ["-c", code], cwd=SCRIPT_DIR, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(f"导入失败: {result.stderr.strip().splitlines()[-1]}")
+    return elapsed, result.stderr
+
+
+def profile_command(command, top=20, python=None):
+    """
+    分析子命令的启动导入耗时
+
+    Args:
+        command: 子命令名称（None 表示只导入 belk_search_ads_creator）
+        top: 列出耗时最多的模块和包的个数
+        python: 解释器路径（可选，默认当前解释器）
+
+    Returns:
+        报告文本行列表
+    """
+    elapsed, output = run_import(command_import_code(command), True, python)
+    records = parse_importtime(output)
+    total_us = sum(record.cumulative_us for record in records if record.depth == 0)
+    packages = defaultdict(int)
+    for record in records:
+        packages[record.module.split(".")[0]] += record.self_us
+
+    lines = [
+        f"子命令 {command or '(仅主模块)'}：导入 {len(records)} 个模块共 "
+        f"{total_us / 1000:.1f} 毫秒，进程总耗时 {elapsed * 1000:.1f} 毫秒",
+        "按顶层包（自身耗时合计）:",
+    ]
+    for package, self_us in sorted(
+        packages.items(), key=lambda item: item[1], reverse=True
+    )[:top]:
+        lines.append(f"  {self_us / 1000:9.1f} 毫秒  {package}")
+    lines.append("按模块（累计耗时）:")
+    for record in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:top]:
+        lines.append(
+            f"  {record.cumulative_us / 1000:9.1f} 毫秒  "
+            f"（自身 {record.self_us / 1000:.1f}）  {record.module}"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    from belk_search_ads_creator import COMMANDS
+
+    parser = argparse.ArgumentParser(description="按模块分析命令行子命令的启动导入耗时")
+    parser.add_argument("command", nargs="?", choices=COMMANDS, help="子命令（默认只导入主模块）")
+    parser.add_argument("--top", type=int, default=20, help="列出耗时最多的模块个数")
+    args = parser.parse_args()
+
+    for report_line in profile_command(args.command, args.top):
+        print(report_line)
@@ -0,0 +1,718 @@
+#!/usr/bin/env python
+"""
+期望状态差异引擎：只提交把账号变成规格文件所描述状态所需的最少操作
+
+把广告系列结构当作代码管理：规格文件（campaign_spec.py）描述期望的预算、
+广告系列、广告组、响应式搜索广告、关键词和地理定位。这里先用每种实体
+一个 GAQL 查询读取账号中这些广告系列的当前状态，再用
+belk_search_ads_creator.py 中的 build_* 构建器生成期望的资源，逐个比较:
+
+- 缺失的实体 → create（新父实体使用负数临时资源名称，子实体在同一批中引用）
+- 受管字段不同 → update，update_mask 只包含变化的字段
+- 受管广告系列中多余的广告组、广告、关键词和地理定位 → remove
+
+所有操作按依赖顺序排列，通过 GoogleAdsService.Mutate 分块提交；不超过
+一块时整个同步是一次原子请求。300 个广告组的同一条标题改动只产生 300 个
+广告 update，一两个请求即可完成，而不是重建整个结构。
+
+不在规格文件中的广告系列不受影响，预算和广告系列从不删除。状态（暂停/
+启用）不是受管字段，在界面中启用的广告系列不会被改回暂停。
+
+用法:
+    python state_diff.py campaign_spec_example.yaml -c 1234567890 --dry_run
+    python state_diff.py campaign_spec_example.yaml -c 1234567890
+"""
+
+import argparse
+import os
+import sys
+from operator import attrgetter, itemgetter
+
+from google.protobuf import field_mask_pb2
+
+from belk_search_ads_creator import (
+    build_ad_group_ad_operation,
+    build_ad_group_operation,
+    build_campaign_budget_operation,
+    build_campaign_operation,
+    build_geo_targeting_operations,
+    build_keyword_operations,
+    log_message,
+    resolve_geo_target_constants,
+)
+from ad_validator import filter_campaign_specs
+from bulk_creator import MAX_OPERATIONS_PER_REQUEST, iter_operation_chunks
+from entity_index import entity_key
+from keyword_expansion import iter_catalog_keyword_operations
+from operation_factory import get_operation_factory, to_pb
+
+# 比较和更新的字段；其余字段（状态、出价策略等）只在创建时设置
+MANAGED_FIELDS = {
+    "campaign_budget": ("amount_micros",),
+    "campaign": (
+        "campaign_budget",
+        "network_settings.target_google_search",
+        "network_settings.target_search_network",
+        "network_settings.target_content_network",
+        "network_settings.target_partner_search_network",
+    ),
+    "ad_group": ("cpc_bid_micros",),
+    # 相对于 Ad；通过 AdService 就地更新，广告ID和效果数据保持不变
+    "ad": (
+        "final_urls",
+        "responsive_search_ad.headlines",
+        "responsive_search_ad.descriptions",
+        "responsive_search_ad.path1",
+        "responsive_search_ad.path2",
+    ),
+}
+
+# 实体类型 → (MutateOperation 中的字段, 操作类型)
+OPERATION_TYPES = {
+    "campaign_budget": ("campaign_budget_operation", "CampaignBudgetOperation"),
+    "campaign": ("campaign_operation", "CampaignOperation"),
+    "ad_group": ("ad_group_operation", "AdGroupOperation"),
+    "ad_group_ad": ("ad_group_ad_operation", "AdGroupAdOperation"),
+    "ad": ("ad_operation", "AdOperation"),
+    "keyword": ("ad_group_criterion_operation", "AdGroupCriterionOperation"),
+    "geo_target": ("campaign_criterion_operation", "CampaignCriterionOperation"),
+}
+
+# 日志和计划摘要中的实体名称
+ENTITY_LABELS = {
+    "campaign_budget": "预算",
+    "campaign": "广告系列",
+    "ad_group": "广告组",
+    "ad_group_ad": "广告",
+    "ad": "广告内容",
+    "keyword": "关键词",
+    "geo_target": "地理定位",
+}
+ACTION_LABELS = {"create": "创建", "update": "更新", "remove": "删除"}
+
+
+def gaql_string(value):
+    """把字符串转换为 GAQL 字符串字面量"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def gaql_in(values):
+    """把字符串列表转换为 GAQL IN 列表，例如 ("a", "b")"""
+    return "(" + ", ".join(gaql_string(value) for value in values) + ")"
+
+
+def _comparable(message, path):
+    """返回字段值的可比较形式；文本资产只比较文本和固定位置，忽略只读字段"""
+    value = attrgetter(path)(message)
+    if isinstance(value, (str, bytes, int, float, bool)):
+        return value
+    if hasattr(value, "DESCRIPTOR"):
+        return value.SerializeToString(deterministic=True)
+    return tuple(
+        (item.text, item.pinned_field) if hasattr(item, "pinned_field") else item
+        for item in value
+    )
+
+
+def changed_fields(entity_type, desired, current):
+    """返回期望资源与当前资源不同的受管字段路径"""
+    return [
+        path
+        for path in MANAGED_FIELDS[entity_type]
+        if _comparable(desired, path) != _comparable(current, path)
+    ]
+
+
+class CurrentState:
+    """
+    账号中受管广告系列的当前状态（原生 protobuf 资源）
+
+    Attributes:
+        budgets: {预算名称: CampaignBudget}
+        campaigns: {广告系列名称: Campaign}
+        ad_groups: {(广告系列资源名称, 广告组名称): AdGroup}
+        ads: {广告组资源名称: [AdGroupAd, ...]}，按广告ID排序
+        keywords: {广告组资源名称: {关键词键: 资源名称}}
+        geo_targets: {广告系列资源名称: {地理定位键: 资源名称}}
+    """
+
+    def __init__(self):
+        self.budgets = {}
+        self.campaigns = {}
+        self.ad_groups = {}
+        self.ads = {}
+        self.keywords = {}
+        self.geo_targets = {}
+        self.queries = 0
+
+
+def _search(client, customer_id, query):
+    """执行 search_stream，逐行返回原生 protobuf GoogleAdsRow"""
+    googleads_service = client.get_service("GoogleAdsService")
+    for batch in googleads_service.search_stream(
+        customer_id=customer_id, query=query
+    ):
+        yield from to_pb(batch).results
+
+
+def fetch_current_state(client, customer_id, campaign_names, budget_names):
+    """
+    读取受管广告系列及其下级实体的当前状态，每种实体一个 GAQL 查询
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID（不带破折号）
+        campaign_names: 规格文件中的广告系列名称
+        budget_names: 规格文件中的预算名称
+    """
+    state = CurrentState()
+    campaigns = gaql_in(campaign_names)
+    queries = {
+        "campaign_budget": (
+            "SELECT campaign_budget.resource_name, campaign_budget.name,"
+            " campaign_budget.amount_micros FROM campaign_budget"
+            f" WHERE campaign_budget.name IN {gaql_in(budget_names)}"
+            " AND campaign_budget.status != 'REMOVED'"
+        ),
+        "campaign": (
+            "SELECT campaign.resource_name, campaign.name, campaign.campaign_budget, "
+            + ", ".join(
+                f"campaign.{path}" for path in MANAGED_FIELDS["campaign"][1:]
+            )
+            + f" FROM campaign WHERE campaign.name IN {campaigns}"
+            " AND campaign.status != 'REMOVED'"
+        ),
+        "ad_group": (
+            "SELECT ad_group.resource_name, ad_group.name, ad_group.campaign,"
+            " ad_group.cpc_bid_micros FROM ad_group"
+            f" WHERE campaign.name IN {campaigns}"
+            " AND ad_group.status != 'REMOVED'"
+        ),
+        "ad_group_ad": (
+            "SELECT ad_group_ad.resource_name, ad_group_ad.ad_group,"
+            " ad_group_ad.ad.id, ad_group_ad.ad.resource_name, "
+            + ", ".join(f"ad_group_ad.ad.{path}" for path in MANAGED_FIELDS["ad"])
+            + f" FROM ad_group_ad WHERE campaign.name IN {campaigns}"
+            " AND ad_group_ad.status != 'REMOVED'"
+            " AND ad_group_ad.ad.type = RESPONSIVE_SEARCH_AD"
+        ),
+        "keyword": (
+            "SELECT ad_group_criterion.resource_name, ad_group_criterion.ad_group,"
+            " ad_group_criterion.keyword.text, ad_group_criterion.keyword.match_type"
+            f" FROM keyword_view WHERE campaign.name IN {campaigns}"
+            " AND ad_group_criterion.status != 'REMOVED'"
+        ),
+        "geo_target": (
+            "SELECT campaign_criterion.resource_name, campaign_criterion.campaign,"
+            " campaign_criterion.location.geo_target_constant"
+            f" FROM campaign_criterion WHERE campaign.name IN {campaigns}"
+            " AND campaign_criterion.type = LOCATION"
+            " AND campaign_criterion.status != 'REMOVED'"
+        ),
+    }
+
+    for row in _search(client, customer_id, queries["campaign_budget"]):
+        state.budgets[row.campaign_budget.name] = row.campaign_budget
+    for row in _search(client, customer_id, queries["campaign"]):
+        state.campaigns[row.campaign.name] = row.campaign
+    for row in _search(client, customer_id, queries["ad_group"]):
+        state.ad_groups[(row.ad_group.campaign, row.ad_group.name)] = row.ad_group
+    for row in _search(client, customer_id, queries["ad_group_ad"]):
+        state.ads.setdefault(row.ad_group_ad.ad_group, []).append(row.ad_group_ad)
+    for ads in state.ads.values():
+        ads.sort(key=lambda ad_group_ad: ad_group_ad.ad.id)
+    for row in _search(client, customer_id, queries["keyword"]):
+        criterion = row.ad_group_criterion
+        state.keywords.setdefault(criterion.ad_group, {})[
+            entity_key("keyword", criterion)
+        ] = criterion.resource_name
+    for row in _search(client, customer_id, queries["geo_target"]):
+        criterion = row.campaign_criterion
+        state.geo_targets.setdefault(criterion.campaign, {})[
+            entity_key("geo_target", criterion)
+        ] = criterion.resource_name
+    state.queries = len(queries)
+    log_message(
+        f"读取了当前状态: {len(state.campaigns)} 个广告系列, "
+        f"{len(state.ad_groups)} 个广告组, "
+        f"{sum(len(ads) for ads in state.ads.values())} 个广告, "
+        f"{sum(len(keywords) for keywords in state.keywords.values())} 个关键词, "
+        f"{sum(len(geo) for geo in state.geo_targets.values())} 个地理定位"
+    )
+    return state
+
+
+class StatePlan:
+    """
+    差异计算的结果：按依赖顺序排列的操作列表
+
+    创建和更新按层级（预算 → 广告系列 → 广告组 → 广告/关键词/地理定位）
+    排列，删除排在最后，子实体先于父实体。
+    """
+
+    def __init__(self):
+        self._changes = []
+        self._removes = []
+
+    def add(self, action, entity_type, operation, description):
+        change = (action, entity_type, operation, description)
+        if action == "remove":
+            self._removes.append(change)
+        else:
+            self._changes.append(change)
+
+    @property
+    def changes(self):
+        """[(动作, 实体类型, 原生 protobuf 操作, 描述), ...]，按提交顺序"""
+        return self._changes + self._removes[::-1]
+
+    def __len__(self):
+        return len(self._changes) + len(self._removes)
+
+    def counts(self):
+        """返回 {(实体类型, 动作): 数量}"""
+        counts = {}
+        for action, entity_type, _, _ in self.changes:
+            counts[(entity_type, action)] = counts.get((entity_type, action), 0) + 1
+        return counts
+
+    def report_lines(self):
+        """返回计划摘要的文本行"""
+        if not len(self):
+            return ["账号已与规格一致，无需任何操作"]
+        lines = [f"共 {len(self)} 个操作:"]
+        for (entity_type, action), count in sorted(self.counts().items()):
+            lines.append(
+                f"  {ACTION_LABELS[action]} {count} 个{ENTITY_LABELS[entity_type]}"
+            )
+        return lines
+
+
+def diff_state(
+    client, customer_id, campaign_specs, current, geo_target_constants,
+    customizer_attribute_name=None, remove_extra=True
+):
+    """
+    比较期望状态与当前状态，返回 StatePlan
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID（不带破折号）
+        campaign_specs: campaign_spec.load_campaign_specs() 返回的规格列表
+        current: fetch_current_state() 返回的当前状态
+        geo_target_constants: {位置名称: [地理目标常量资源名称, ...]}
+        customizer_attribute_name: 自定义属性名称（可选，决定默认描述）
+        remove_extra: 是否删除受管广告系列中多余的广告组、广告、关键词和地理定位
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    operation_factory = get_operation_factory(client)
+    plan = StatePlan()
+    temporary_ids = iter(range(-1, -(1 << 62), -1))
+    # 本次计划中新建的预算 {预算名称: 临时资源名称}，多个广告系列共用同名预算时
+    # 只创建一次，否则第二个创建操作会因 DUPLICATE_NAME 失败
+    created_budgets = {}
+
+    def update(entity_type, resource_name, desired, paths, description):
+        operation_field, operation_type = OPERATION_TYPES[entity_type]
+        operation = operation_factory.pb_type(operation_type)()
+        field_mask_pb2.FieldMask(paths=paths).MergeMessage(
+            desired, operation.update,
+            replace_message_field=True, replace_repeated_field=True,
+        )
+        operation.update.resource_name = resource_name
+        operation.update_mask.paths.extend(paths)
+        plan.add(
+            "update", entity_type, operation,
+            f"{description}（{', '.join(paths)}）",
+        )
+
+    def remove(entity_type, resource_name, description):
+        operation = operation_factory.pb_type(OPERATION_TYPES[entity_type][1])()
+        operation.remove = resource_name
+        plan.add("remove", entity_type, operation, description)
+
+    def sync_leaves(entity_type, operations, existing, description, allow_remove=True):
+        """关键词和地理定位只能创建或删除（文本、匹配类型、地点不可修改）"""
+        desired_keys = set()
+        for operation in operations:
+            key = entity_key(entity_type, operation.create)
+            if key in desired_keys:
+                continue
+            desired_keys.add(key)
+            if key not in existing:
+                plan.add("create", entity_type, operation, f"{description} {key[1:]}")
+        if remove_extra and allow_remove:
+            for key, resource_name in existing.items():
+                if key not in desired_keys:
+                    remove(entity_type, resource_name, f"{description} {key[1:]}")
+
+    for spec in campaign_specs:
+        # 预算
+        budget = current.budgets.get(spec["budget_name"])
+        desired_budget = to_pb(
+            build_campaign_budget_operation(
+                client,
+                googleads_service.campaign_budget_path(
+                    customer_id, next(temporary_ids)
+                ),
+                name=spec["budget_name"],
+                amount_micros=spec["budget_amount_micros"],
+            )
+        )
+        if budget is None and spec["budget_name"] in created_budgets:
+            budget_resource_name, amount_micros = created_budgets[spec["budget_name"]]
+            if amount_micros != spec["budget_amount_micros"]:
+                log_message(
+                    f"广告系列 {spec['name']} 的预算 {spec['budget_name']} 金额"
+                    f"与前面的规格不同，沿用 {amount_micros} micros",
+                    "WARNING",
+                )
+        elif budget is None:
+            plan.add(
+                "create", "campaign_budget", desired_budget,
+                f"预算 {spec['budget_name']}",
+            )
+            budget_resource_name = desired_budget.create.resource_name
+            created_budgets[spec["budget_name"]] = (
+                budget_resource_name, spec["budget_amount_micros"],
+            )
+        else:
+            budget_resource_name = budget.resource_name
+            paths = changed_fields("campaign_budget", desired_budget.create, budget)
+            if paths:
+                update(
+                    "campaign_budget", budget_resource_name,
+                    desired_budget.create, paths, f"预算 {spec['budget_name']}",
+                )
+
+        # 广告系列
+        campaign = current.campaigns.get(spec["name"])
+        desired_campaign = to_pb(
+            build_campaign_operation(
+                client, budget_resource_name,
+                googleads_service.campaign_path(customer_id, next(temporary_ids)),
+                name=spec["name"],
+            )
+        )
+        if campaign is None:
+            plan.add(
+                "create", "campaign", desired_campaign, f"广告系列 {spec['name']}"
+            )
+            campaign_resource_name = desired_campaign.create.resource_name
+        else:
+            campaign_resource_name = campaign.resource_name
+            paths = changed_fields("campaign", desired_campaign.create, campaign)
+            if paths:
+                update(
+                    "campaign", campaign_resource_name, desired_campaign.create,
+                    paths, f"广告系列 {spec['name']}",
+                )
+
+        # 广告组
+        desired_ad_group_names = set()
+        for ad_group_spec in spec["ad_groups"]:
+            label = f"{spec['name']} / {ad_group_spec['name']}"
+            desired_ad_group_names.add(ad_group_spec["name"])
+            ad_group = current.ad_groups.get(
+                (campaign_resource_name, ad_group_spec["name"])
+            )
+            desired_ad_group = to_pb(
+                build_ad_group_operation(
+                    client, campaign_resource_name,
+                    googleads_service.ad_group_path(customer_id, next(temporary_ids)),
+                    name=ad_group_spec["name"],
+                    cpc_bid_micros=ad_group_spec["cpc_bid_micros"],
+                )
+            )
+            if ad_group is None:
+                plan.add("create", "ad_group", desired_ad_group, f"广告组 {label}")
+                ad_group_resource_name = desired_ad_group.create.resource_name
+            else:
+                ad_group_resource_name = ad_group.resource_name
+                paths = changed_fields("ad_group", desired_ad_group.create, ad_group)
+                if paths:
+                    update(
+                        "ad_group", ad_group_resource_name,
+                        desired_ad_group.create, paths, f"广告组 {label}",
+                    )
+
+            # 广告：按顺序与广告组中现有的响应式搜索广告（按广告ID排序）对应
+            current_ads = current.ads.get(ad_group_resource_name, [])
+            for position, ad_spec in enumerate(ad_group_spec["ads"]):
+                desired_ad = to_pb(
+                    build_ad_group_ad_operation(
+                        client, ad_group_resource_name, customizer_attribute_name,
+                        headlines=ad_spec["headlines"],
+                        descriptions=ad_spec["descriptions"],
+                        final_url=ad_spec["final_url"],
+                        path1=ad_spec["path1"],
+                        path2=ad_spec["path2"],
+                    )
+                )
+                if position >= len(current_ads):
+                    plan.add(
+                        "create", "ad_group_ad", desired_ad,
+                        f"广告 {label} #{position + 1}",
+                    )
+                    continue
+                current_ad = current_ads[position].ad
+                paths = changed_fields("ad", desired_ad.create.ad, current_ad)
+                if paths:
+                    update(
+                        "ad", current_ad.resource_name, desired_ad.create.ad,
+                        paths, f"广告 {label} #{position + 1}",
+                    )
+            if remove_extra:
+                for position in range(len(ad_group_spec["ads"]), len(current_ads)):
+                    remove(
+                        "ad_group_ad", current_ads[position].resource_name,
+                        f"广告 {label} #{position + 1}",
+                    )
+
+            # 关键词（包括从商品目录扩展的关键词）
+            keyword_operations = []
+            if ad_group_spec["keywords"]:
+                keyword_operations.extend(
+                    build_keyword_operations(
+                        client, ad_group_resource_name, ad_group_spec["keywords"]
+                    )
+                )
+            if ad_group_spec.get("keyword_catalog"):
+                keyword_operations.extend(
+                    iter_catalog_keyword_operations(
+                        client, ad_group_resource_name,
+                        ad_group_spec["keyword_catalog"],
+                    )
+                )
+            sync_leaves(
+                "keyword", keyword_operations,
+                current.keywords.get(ad_group_resource_name, {}),
+                f"关键词 {label}",
+            )
+
+        # 受管广告系列中不在规格里的广告组（删除广告组即删除其下的广告和关键词）
+        if remove_extra and campaign is not None:
+            for (campaign_name, ad_group_name), ad_group in current.ad_groups.items():
+                if (
+                    campaign_name == campaign_resource_name
+                    and ad_group_name not in desired_ad_group_names
+                ):
+                    remove(
+                        "ad_group", ad_group.resource_name,
+                        f"广告组 {spec['name']} / {ad_group_name}",
+                    )
+
+        # 地理定位
+        resolved = []
+        unresolved = []
+        for name in spec["locations"]:
+            if name in geo_target_constants:
+                resolved.append(geo_target_constants[name][0])
+            else:
+                unresolved.append(name)
+                log_message(f"未找到位置 \"{name}\" 的地理目标常量，已跳过")
+        if unresolved and remove_extra:
+            # 无法确定期望的地理定位时不删除现有定位，以免误删仍需要的地区
+            log_message(
+                f"广告系列 {spec['name']} 有 {len(unresolved)} 个位置未解析，"
+                "本次不删除其现有地理定位",
+                "WARNING",
+            )
+        sync_leaves(
+            "geo_target",
+            build_geo_targeting_operations(client, campaign_resource_name, resolved),
+            current.geo_targets.get(campaign_resource_name, {}),
+            f"地理定位 {spec['name']}",
+            allow_remove=not unresolved,
+        )
+    return plan
+
+
+def _resolve_references(operation, temporary_names):
+    """把操作中对前面块里临时资源名称的引用替换为真实资源名称"""
+    if operation.WhichOneof("operation") != "create":
+        return
+    resource = operation.create
+    for field, value in resource.ListFields():
+        if isinstance(value, str) and value in temporary_names:
+            setattr(resource, field.name, temporary_names[value])
+
+
+def apply_plan(
+    client, customer_id, plan, chunk_size=MAX_OPERATIONS_PER_REQUEST
+):
+    """
+    通过 GoogleAdsService.Mutate 分块提交计划中的操作
+
+    临时资源名称只在同一个请求内有效；计划跨多个块时，后面块中对前面块
+    新建实体的引用在提交前替换为真实资源名称。
+
+    Returns:
+        {"requests": 请求数, "operations": 操作数}
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    operation_factory = get_operation_factory(client)
+    changes = plan.changes
+    temporary_names = {}
+    stats = {"requests": 0, "operations": 0}
+    start = 0
+    for chunk in iter_operation_chunks(
+        changes, chunk_size, operation_of=itemgetter(2)
+    ):
+        mutate_operations = []
+        for _, entity_type, operation, description in chunk:
+            _resolve_references(operation, temporary_names)
+            mutate_operations.append(
+                operation_factory.mutate_operation(
+                    OPERATION_TYPES[entity_type][0], operation
+                )
+            )
+        response = googleads_service.mutate(
+            request=operation_factory.mutate_request(
+                "MutateGoogleAdsRequest", customer_id, mutate_operations,
+                operations_field="mutate_operations",
+            )
+        )
+        for (action, _, operation, description), operation_response in zip(
+            chunk, to_pb(response).mutate_operation_responses
+        ):
+            result = getattr(
+                operation_response, operation_response.WhichOneof("response")
+            )
+            if action == "create" and operation.create.resource_name:
+                temporary_names[operation.create.resource_name] = result.resource_name
+            log_message(
+                f"{ACTION_LABELS[action]}了{description}", "DEBUG",
+                resource_name=result.resource_name,
+            )
+        stats["requests"] += 1
+        stats["operations"] += len(chunk)
+        start += len(chunk)
+        log_message(f"提交了 {len(chunk)} 个操作，累计 {start} 个")
+    return stats
+
+
+def sync_campaign_specs(
+    client, customer_id, campaign_specs, customizer_attribute_name=None,
+    chunk_size=MAX_OPERATIONS_PER_REQUEST, geo_resolver=None,
+    remove_extra=True, dry_run=False
+):
+    """
+    把账号中的受管广告系列同步为规格描述的状态
+
+    Args:
+        client: 初始化的GoogleAdsClient实例
+        customer_id: 客户ID
+        campaign_specs: campaign_spec.load_campaign_specs() 返回的规格列表
+        customizer_attribute_name: 自定义属性名称（可选，不存在时先创建）
+        chunk_size: 每个 Mutate 请求的最大操作数
+        geo_resolver: geo_target_cache.CachedGeoTargetResolver 实例（可选）
+        remove_extra: 是否删除受管广告系列中多余的子实体
+        dry_run: 只计算并记录计划，不提交
+
+    Returns:
+        (StatePlan, 提交统计字典；dry_run 时为 None)
+    """
+    customer_id = customer_id.replace("-", "")
+    campaign_specs = filter_campaign_specs(campaign_specs)
+    log_message(
+        f"开始同步客户 ID {customer_id} 的 {len(campaign_specs)} 个广告系列"
+    )
+    current = fetch_current_state(
+        client, customer_id,
+        [spec["name"] for spec in campaign_specs],
+        sorted({spec["budget_name"] for spec in campaign_specs}),
+    )
+    geo_target_constants = resolve_geo_target_constants(
+        client,
+        sorted({name for spec in campaign_specs for name in spec["locations"]}),
+        geo_resolver,
+    )
+    plan = diff_state(
+        client, customer_id, campaign_specs, current, geo_target_constants,
+        customizer_attribute_name, remove_extra,
+    )
+    for line in plan.report_lines():
+        log_message(line)
+    for action, _, _, description in plan.changes:
+        log_message(f"计划{ACTION_LABELS[action]}: {description}", "DEBUG")
+    if dry_run or not len(plan):
+        return plan, None
+
+    if customizer_attribute_name:
+        # 默认描述引用自定义属性，确保它存在并已链接到客户
+        from belk_search_ads_creator import (
+            create_customizer_attribute,
+            link_customizer_attribute_to_customer,
+        )
+        from entity_index import EntityIndex
+        entity_index = EntityIndex(client, customer_id)
+        link_customizer_attribute_to_customer(
+            client, customer_id,
+            create_customizer_attribute(
+                client, customer_id, customizer_attribute_name, entity_index
+            ),
+            entity_index,
+        )
+    stats = apply_plan(client, customer_id, plan, chunk_size)
+    log_message(
+        f"同步完成: {stats['operations']} 个操作，共 {stats['requests']} 个请求"
+    )
+    return plan, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="把账号中的广告系列同步为规格文件描述的状态，只提交差异"
+    )
+    parser.add_argument("spec", help="YAML/JSONL 广告系列规格文件")
+    parser.add_argument("-c", "--customer_id", default="278-639-3017", help="Google Ads客户ID")
+    parser.add_argument(
+        "-n", "--customizer_attribute_name", default="BelkSalePrice",
+        help="默认描述中使用的自定义属性名称",
+    )
+    parser.add_argument("--dry_run", action="store_true", help="只输出计划，不提交")
+    parser.add_argument(
+        "--keep_extra", action="store_true",
+        help="不删除受管广告系列中规格里没有的广告组、广告、关键词和地理定位",
+    )
+    parser.add_argument(
+        "--chunk_size", type=int, default=MAX_OPERATIONS_PER_REQUEST,
+        help="每个 Mutate 请求的最大操作数",
+    )
+    parser.add_argument("--retries", type=int, default=3, help="单个调用的最大重试次数")
+    parser.add_argument(
+        "--mock", action="store_true",
+        help="使用进程内替身客户端（空账号），用于检查计划",
+    )
+    args = parser.parse_args()
+
+    from campaign_spec import load_campaign_specs
+    campaign_specs = load_campaign_specs(args.spec)
+
+    if args.mock:
+        from fake_ads_client import FakeGoogleAdsClient
+        client = FakeGoogleAdsClient()
+    else:
+        from ads_config import build_client, load_config
+        from request_scheduler import rate_limited
+        from retry_policy import RetryingClient, RetryPolicy, request_timeout
+        from rpc_metrics import instrumented
+        yaml_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "google-ads.yaml"
+        )
+        config = load_config(yaml_path)
+        client = RetryingClient(
+            rate_limited(instrumented(build_client(config), config), config),
+            RetryPolicy(max_attempts=args.retries + 1),
+            request_timeout(config),
+        )
+    try:
+        sync_campaign_specs(
+            client, args.customer_id, campaign_specs,
+            args.customizer_attribute_name, args.chunk_size,
+            remove_extra=not args.keep_extra, dry_run=args.dry_run,
+        )
+    except Exception as e:
+        log_message(f"同步失败: {e}", "ERROR")
+        sys.exit(1)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+"""
+跨进程共享的访问令牌缓存
+
+GoogleAdsClient.load_from_storage / load_from_dict 在构建客户端时立即刷新
+凭据：服务账号（service_account_helper.py 生成的配置）每次都要签名 JWT
+换取访问令牌，OAuth 安装应用（auth_helper.py 获取的刷新令牌）每次都要
+用刷新令牌换取访问令牌。每小时数百个短暂的 cron 任务时，这次交换占据了
+启动时间的大部分。
+
+这里把访问令牌（不包括刷新令牌或私钥）及其到期时间保存在本地 JSON 文件
+中（权限 0600），按身份（服务账号邮箱 + 模拟用户，或 OAuth 客户端ID +
+刷新令牌摘要）区分。令牌剩余有效期不足 REFRESH_AHEAD 时提前刷新：持有
+文件锁（fcntl）的进程负责交换，等待锁的进程随后直接读取新令牌，因此每个
+身份每小时只交换一次。长时间运行的进程在令牌到期前自动换用新令牌。
+
+用法（查看或清空缓存）:
+    python token_cache.py --list
+    python token_cache.py --clear
+"""
+
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，退化为只在进程内加锁
+    fcntl = None
+
+from google.auth import credentials as auth_credentials
+
+from belk_search_ads_creator import SAVE_PATH, log_message
+
+# 默认的缓存文件
+DEFAULT_TOKEN_CACHE_FILE = os.path.join(SAVE_PATH, "token_cache.json")
+
+# 令牌剩余有效期不足该值时提前刷新（秒）
+REFRESH_AHEAD = 300
+
+# Google Ads API 的 OAuth 范围
+ADWORDS_SCOPES = ["https://www.googleapis.com/auth/adwords"]
+DEFAULT_TOKEN_URI = "https://accounts.google.com/o/oauth2/token"
+
+
+def _utcnow():
+    """google-auth 使用不带时区的 UTC 时间"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _to_timestamp(expiry):
+    return expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _from_timestamp(timestamp):
+    return datetime.datetime.fromtimestamp(
+        timestamp, datetime.timezone.utc
+    ).replace(tzinfo=None)
+
+
+class TokenCache:
+    """
+    保存在 JSON 文件中的访问令牌缓存，写入时持有文件锁
+
+    Args:
+        path: 缓存文件路径；锁文件为 path + ".lock"
+        refresh_ahead: 剩余有效期不足该秒数的令牌视为需要刷新
+    """
+
+    def __init__(self, path=DEFAULT_TOKEN_CACHE_FILE, refresh_ahead=REFRESH_AHEAD):
+        self.path = path
+        self.refresh_ahead = refresh_ahead
+        self._lock = threading.Lock()
+
+    def _read(self):
+        # 写入使用 os.replace，读取时不需要加锁
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".token_cache.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """进程内线程锁 + 跨进程文件锁"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _fresh(self, entry):
+        return entry is not None and entry["expiry"] - time.time() > self.refresh_ahead
+
+    def get(self, identity):
+        """返回 (令牌, 到期时间戳)；没有缓存或即将到期时返回 None"""
+        entry = self._read().get(identity)
+        return (entry["token"], entry["expiry"]) if self._fresh(entry) else None
+
+    def fetch(self, identity, exchange):
+        """
+        返回身份的有效令牌，必要时在文件锁内调用 exchange() 交换新令牌
+
+        Args:
+            identity: 缓存键
+            exchange: 返回 (令牌, 到期时间戳) 的函数
+
+        Returns:
+            (令牌, 到期时间戳)
+        """
+        cached = self.get(identity)
+        if cached is not None:
+            return cached
+        with self._locked():
+            # 等待锁期间其他进程可能已经刷新
+            cached = self.get(identity)
+            if cached is not None:
+                return cached
+            token, expiry = exchange()
+            self.store(identity, token, expiry, locked=True)
+        log_message(
+            f"交换了新的访问令牌（{identity.split(':', 1)[0]}），"
+            f"有效期至 {datetime.datetime.fromtimestamp(expiry):%H:%M:%S}"
+        )
+        return token, expiry
+
+    def store(self, identity, token, expiry, locked=False):
+        """写入一个令牌，同时清除已过期的条目"""
+        with contextlib.nullcontext() if locked else self._locked():
+            now = time.time()
+            entries = {
+                key: entry for key, entry in self._read().items()
+                if entry.get("expiry", 0) > now
+            }
+            entries[identity] = {"token": token, "expiry": expiry}
+            self._write(entries)
+
+    def entries(self):
+        """返回 {身份: 到期时间戳}"""
+        return {key: entry["expiry"] for key, entry in self._read().items()}
+
+    def clear(self):
+        with self._locked():
+            self._write({})
+
+
+class CachedCredentials(auth_credentials.Credentials):
+    """
+    通过 TokenCache 获取访问令牌的凭据包装器
+
+    google-auth 在发送请求前检查 expired，过期时调用 refresh()；这里提前
+    REFRESH_AHEAD 秒视为过期，refresh() 先读取共享缓存，只有缓存中也没有
+    有效令牌时才由底层凭据交换。
+
+    Args:
+        credentials: 未刷新的 google.oauth2 凭据（服务账号或安装应用）
+        cache: TokenCache 实例
+        identity: 缓存键
+        http_proxy: 交换令牌时使用的代理（可选）
+    """
+
+    def __init__(self, credentials, cache, identity, http_proxy=None):
+        super().__init__()
+        self._credentials = credentials
+        self._cache = cache
+        self._identity = identity
+        self._http_proxy = http_proxy
+
+    @property
+    def expired(self):
+        if self.expiry is None:
+            return False
+        return _utcnow() >= self.expiry - datetime.timedelta(
+            seconds=self._cache.refresh_ahead
+        )
+
+    def _exchange(self, request):
+        if self._http_proxy:
+            from google.auth.transport.requests import Request
+            from requests import Session
+
+            session = Session()
+            session.proxies.update({"http": self._http_proxy, "https": self._http_proxy})
+            request = Request(session=session)
+        self._credentials.refresh(request)
+        return self._credentials.token, _to_timestamp(self._credentials.expiry)
+
+    def refresh(self, request):
+        token, expiry = self._cache.fetch(
+            self._identity, lambda: self._exchange(request)
+        )
+        self.token = token
+        self.expiry = _from_timestamp(expiry)
+
+
+def service_account_identity(credentials):
+    """服务账号的缓存键：邮箱 + 模拟用户"""
+    subject = getattr(credentials, "_subject", None) or ""
+    return f"service_account:{credentials.service_account_email}:{subject}"
+
+
+def installed_app_identity(client_id, refresh_token):
+    """OAuth 安装应用的缓存键：客户端ID + 刷新令牌摘要（不保存刷新令牌本身）"""
+    digest = hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()[:16]
+    return f"oauth:{client_id}:{digest}"
+
+
+def cached_credentials(config, cache=None):
+    """
+    根据客户端配置创建使用共享缓存的凭据（不立即交换令牌）
+
+    Args:
+        config: 包含 client_id/client_secret/refresh_token 或
+            json_key_file_path/impersonated_email 的配置字典
+        cache: TokenCache 实例（可选，默认使用 DEFAULT_TOKEN_CACHE_FILE）
+    """
+    cache = cache or TokenCache()
+    if all(config.get(key) for key in ("client_id", "client_secret", "refresh_token")):
+        from google.oauth2.credentials import Credentials
+
+        credentials = Credentials(
+            None,
+            client_id=config["client_id"],
+            client_secret=config["client_secret"],
+            refresh_token=config["refresh_token"],
+            token_uri=DEFAULT_TOKEN_URI,
+        )
+        identity = installed_app_identity(config["client_id"], config["refresh_token"])
+    elif config.get("json_key_file_path"):
+        from google.oauth2.service_account import Credentials
+
+        credentials = Credentials.from_service_account_file(
+            config["json_key_file_path"],
+            subject=config.get("impersonated_email"),
+            scopes=ADWORDS_SCOPES,
+        )
+        identity = service_account_identity(credentials)
+    else:
+        raise ValueError(
+            "配置中缺少 OAuth 凭据：需要 client_id/client_secret/refresh_token "
+            "或 json_key_file_path"
+        )
+    return CachedCredentials(credentials, cache, identity, config.get("http_proxy"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查看或清空共享的访问令牌缓存")
+    parser.add_argument(
+        "--token_cache_file", default=DEFAULT_TOKEN_CACHE_FILE, help="缓存文件路径"
+    )
+    parser.add_argument("--list", action="store_true", help="列出缓存的身份和剩余有效期")
+    parser.add_argument("--clear", action="store_true", help="清空缓存")
+    args = parser.parse_args()
+
+    token_cache = TokenCache(args.token_cache_file)
+    if args.clear:
+        token_cache.clear()
+        print(f"已清空 {args.token_cache_file}")
+    else:
+        now = time.time()
+        for identity, expiry in sorted(token_cache.entries().items()):
+            print(f"{identity}  剩余 {max(0, expiry - now) / 60:.1f} 分钟")